@@ -0,0 +1,258 @@
+"""Time every converter and the feature serialization path on synthetic data.
+
+Each case runs at every scale: the best of --repeat timed runs gives the
+throughput, and one extra run under tracemalloc gives the peak traced
+memory. Results are written as JSON and can be compared with an earlier
+run to catch regressions.
+
+Usage:
+    python -m benchmarks.bench_converters [--scales 1,4,16] [--repeat 3] [--output results.json]
+    python -m benchmarks.bench_converters --compare baseline.json [--threshold 0.1]
+"""
+import argparse
+import contextlib
+import io
+import json
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from src.cities import RIYADH
+from src.config import Settings
+from src.converters.district_converter import DistrictConverter
+from src.converters.esri_polygon_converter import EsriPolygonConverter
+from src.converters.metro_converter import MetroConverter
+from src.converters.poi_converter import POIConverter
+from src.feature_writers import FORMATS
+from src.features import Folder
+from src.output_manager import OutputManager
+
+from .synthetic import make_districts, make_feature_set, make_pois, make_webmap
+
+# Base sizes at scale 1; every count below is multiplied by the scale
+BASE_SIZES = {
+    "metro_vertices": 500,
+    "pois": 2000,
+    "districts": 100,
+    "district_vertices": 400,
+    "neighborhoods": 100,
+    "neighborhood_vertices": 300,
+}
+
+
+def _output_manager(directory: Path, formats: Optional[List[str]] = None) -> OutputManager:
+    settings = Settings()
+    settings.FORCE_REBUILD = True
+    settings.WRITE_DELTAS = False
+    settings.OUTPUT_FORMATS = formats or ["kml"]
+    settings.SOURCE_OUTPUT_FORMATS = {}
+    output_manager = OutputManager(settings)
+    output_manager.base_dir = directory
+    return output_manager
+
+
+def _output_bytes(directory: Path) -> int:
+    """Bytes of every output file written, ignoring manifests"""
+    return sum(path.stat().st_size for path in directory.rglob("*") if path.is_file() and not path.name.startswith("."))
+
+
+# A case turns a scale into (setup result, features, vertices); its run function
+# takes the setup result and an OutputManager and performs one complete conversion
+Case = Tuple[Callable[[int], Tuple[Any, int, int]], Callable[[Any, OutputManager], Any], Optional[List[str]]]
+
+
+def _metro_setup(scale: int):
+    data = make_webmap(vertices=BASE_SIZES["metro_vertices"] * scale, stations=85 * scale)
+    layers = {layer["id"]: layer for layer in data["operationalLayers"]}
+    lines = layers["metrolines_110"]["featureCollection"]["layers"][0]["featureSet"]["features"]
+    stations = layers["stations_4748"]["featureCollection"]["layers"][0]["featureSet"]["features"]
+    vertices = sum(len(path) for feature in lines for path in feature["geometry"]["paths"])
+    return data, len(lines) + len(stations), vertices + len(stations)
+
+
+def _metro_run(data, output_manager):
+    converter = MetroConverter(output_manager)
+    return converter.convert_lines(data), converter.convert_stations(data)
+
+
+def _poi_setup(scale: int):
+    en, ar = make_pois(BASE_SIZES["pois"] * scale)
+    return (en, ar), len(en), len(en)
+
+
+def _poi_run(pois, output_manager):
+    return POIConverter(output_manager).convert(pois)
+
+
+def _district_setup(scale: int):
+    records = make_districts(BASE_SIZES["districts"] * scale, BASE_SIZES["district_vertices"])
+    selected = [record for record in records if (record["region_id"], record["city_id"]) == RIYADH.districts_key]
+    vertices = sum(len(ring) for record in selected for ring in record["boundaries"])
+    return records, len(selected), vertices
+
+
+def _district_run(records, output_manager):
+    return DistrictConverter(output_manager).convert(records)
+
+
+def _neighborhood_setup(scale: int):
+    feature_set = make_feature_set(BASE_SIZES["neighborhoods"] * scale, BASE_SIZES["neighborhood_vertices"])
+    vertices = sum(len(ring) for feature in feature_set["features"] for ring in feature["geometry"]["rings"])
+    return feature_set, len(feature_set["features"]), vertices
+
+
+def _neighborhood_run(feature_set, output_manager):
+    return EsriPolygonConverter(output_manager).convert(feature_set, "neighborhoods", "bench_neighborhoods",
+                                                        folder_name="Neighborhoods", name_field="NEIGHBORHENAME",
+                                                        style_field="MUNICIPALITYENAME")
+
+
+def _save_features_setup(scale: int):
+    """Prebuilt district polygons and POI points, so only serialization is timed"""
+    output_manager = _output_manager(Path(tempfile.gettempdir()))
+    districts = DistrictConverter(output_manager)
+    table = districts.to_table(districts.select_districts(
+        make_districts(BASE_SIZES["districts"] * scale, BASE_SIZES["district_vertices"], other_cities=0)))
+    pois = POIConverter(output_manager)
+    with contextlib.redirect_stdout(io.StringIO()):
+        poi_table, _ = pois._merge_pois(dict(zip(pois.locales, make_pois(BASE_SIZES["pois"] * scale))))
+        folders = [Folder(name="Districts", placemarks=list(districts._iter_placemarks(table)))]
+        folders += [folder._replace(placemarks=list(folder.placemarks)) for folder in pois._category_folders(poi_table)]
+    features = sum(len(folder.placemarks) for folder in folders)
+    return folders, features, int(table.ring_coords[-1]) + len(poi_table)
+
+
+def _save_features_run(folders, output_manager):
+    return output_manager.save_features(folders, "bench", "save_features")
+
+
+CASES: Dict[str, Case] = {
+    "metro": (_metro_setup, _metro_run, None),
+    "pois": (_poi_setup, _poi_run, None),
+    "districts": (_district_setup, _district_run, None),
+    "neighborhoods": (_neighborhood_setup, _neighborhood_run, None),
+    **{f"save_features[{fmt}]": (_save_features_setup, _save_features_run, [fmt]) for fmt in sorted(FORMATS)},
+}
+
+
+def run_case(name: str, scale: int, repeat: int) -> Dict[str, Any]:
+    setup, run, formats = CASES[name]
+    payload, features, vertices = setup(scale)
+
+    def once(trace: bool) -> Tuple[float, int, int]:
+        with tempfile.TemporaryDirectory() as directory:
+            output_manager = _output_manager(Path(directory), formats)
+            if trace:
+                tracemalloc.start()
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                run(payload, output_manager)
+            elapsed = time.perf_counter() - start
+            peak = 0
+            if trace:
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+            return elapsed, peak, _output_bytes(Path(directory))
+
+    seconds = min(once(False)[0] for _ in range(repeat))
+    _, peak, output_bytes = once(True)
+    return {
+        "case": name,
+        "scale": scale,
+        "features": features,
+        "vertices": vertices,
+        "seconds": round(seconds, 6),
+        "features_per_sec": round(features / seconds, 1),
+        "vertices_per_sec": round(vertices / seconds, 1),
+        "peak_traced_mb": round(peak / 2 ** 20, 3),
+        "output_bytes": output_bytes,
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: List[Dict[str, Any]], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """Print each case against the baseline; return the cases that regressed beyond the threshold"""
+    previous = {(row["case"], row["scale"]): row for row in baseline.get("results", [])}
+    regressions = []
+    print(f"\nCompared with {baseline.get('meta', {}).get('commit') or 'baseline'}:")
+    for row in results:
+        before = previous.get((row["case"], row["scale"]))
+        if before is None:
+            continue
+        time_ratio = row["seconds"] / before["seconds"] if before["seconds"] else 1.0
+        memory_ratio = row["peak_traced_mb"] / before["peak_traced_mb"] if before["peak_traced_mb"] else 1.0
+        regressed = time_ratio > 1 + threshold or memory_ratio > 1 + threshold
+        if regressed:
+            regressions.append(f"{row['case']} x{row['scale']}")
+        print(f"  {row['case']:<24} x{row['scale']:<4} time {time_ratio:6.2f}x  "
+              f"memory {memory_ratio:6.2f}x  bytes {row['output_bytes'] - before['output_bytes']:+d}"
+              f"{'  REGRESSION' if regressed else ''}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark converters and output serialization on synthetic data')
+    parser.add_argument('--scales', default='1,4,16', help='Comma-separated size multipliers')
+    parser.add_argument('--cases', default=','.join(CASES), help='Comma-separated cases to run')
+    parser.add_argument('--repeat', type=int, default=3, help='Timed runs per case (the best is kept)')
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    parser.add_argument('--compare', help='Earlier results JSON to compare against')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='Relative slowdown or memory growth reported as a regression')
+    args = parser.parse_args()
+
+    cases = [case for case in args.cases.split(',') if case]
+    unknown = [case for case in cases if case not in CASES]
+    if unknown:
+        parser.error(f"unknown cases: {', '.join(unknown)} (choose from {', '.join(CASES)})")
+    scales = [int(scale) for scale in args.scales.split(',') if scale]
+
+    results = []
+    print(f"{'case':<24} {'scale':>5} {'features':>9} {'seconds':>9} {'features/s':>12} "
+          f"{'vertices/s':>13} {'peak MB':>9} {'bytes':>12}")
+    for case in cases:
+        for scale in scales:
+            row = run_case(case, scale, args.repeat)
+            results.append(row)
+            print(f"{row['case']:<24} {row['scale']:>5} {row['features']:>9} {row['seconds']:>9.3f} "
+                  f"{row['features_per_sec']:>12,.0f} {row['vertices_per_sec']:>13,.0f} "
+                  f"{row['peak_traced_mb']:>9.1f} {row['output_bytes']:>12,}")
+
+    report = {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "repeat": args.repeat,
+            "base_sizes": BASE_SIZES,
+        },
+        "results": results,
+    }
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2), encoding="utf-8")
+        print(f"\nResults saved to: {args.output}")
+
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\nRegressions: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
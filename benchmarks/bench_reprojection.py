@@ -0,0 +1,68 @@
+"""Compare per-vertex pyproj calls with batched reprojection.
+
+Usage:
+    python -m benchmarks.bench_reprojection [--paths 200] [--vertices 1000]
+"""
+import argparse
+import random
+import time
+
+import pyproj
+
+from src.geometry import BatchReprojector
+
+
+def make_paths(path_count: int, vertex_count: int, seed: int = 42):
+    """Generate random-walk polylines in Web Mercator around Riyadh"""
+    rng = random.Random(seed)
+    paths = []
+    for _ in range(path_count):
+        x, y = 5205000.0 + rng.uniform(-2e4, 2e4), 2833000.0 + rng.uniform(-2e4, 2e4)
+        path = []
+        for _ in range(vertex_count):
+            x += rng.uniform(-50, 50)
+            y += rng.uniform(-50, 50)
+            path.append([x, y])
+        paths.append(path)
+    return paths
+
+
+def per_vertex(paths):
+    transformer = pyproj.Transformer.from_crs("EPSG:3857", "EPSG:4326", always_xy=True)
+    return [[transformer.transform(x, y) for x, y in path] for path in paths]
+
+
+def batch_pyproj(paths):
+    reprojector = BatchReprojector("EPSG:3857", "EPSG:4326")
+    reprojector.fast_path = False
+    return reprojector.transform_paths(paths)
+
+
+def batch_fast_path(paths):
+    return BatchReprojector("EPSG:3857", "EPSG:4326").transform_paths(paths)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark layer reprojection strategies')
+    parser.add_argument('--paths', type=int, default=200)
+    parser.add_argument('--vertices', type=int, default=1000)
+    args = parser.parse_args()
+
+    paths = make_paths(args.paths, args.vertices)
+    total = args.paths * args.vertices
+    print(f"{args.paths} paths x {args.vertices} vertices = {total} vertices")
+
+    baseline = None
+    for label, func in [("per-vertex pyproj", per_vertex),
+                        ("batched pyproj", batch_pyproj),
+                        ("batched numpy fast path", batch_fast_path)]:
+        start = time.perf_counter()
+        func(paths)
+        elapsed = time.perf_counter() - start
+        rate = total / elapsed
+        baseline = baseline or rate
+        print(f"{label:<26} {elapsed:8.3f}s  {rate:14,.0f} vertices/sec  ({rate / baseline:5.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""Measure CLI startup: interpreter launch plus the imports each subcommand needs.
+
+Every case runs in fresh interpreters. `help` and `import` only parse
+arguments or import src.main. The subcommand cases run offline against an
+empty cache, so their fetches fail at once and the time is almost all
+startup. Wall time is the best of --repeat runs; one extra run under
+`python -X importtime` gives the import time, the number of modules
+loaded and the packages that cost the most.
+
+Usage:
+    python -m benchmarks.bench_startup [--cases help,import,districts] [--repeat 5] [--output startup.json]
+    python -m benchmarks.bench_startup --compare baseline.json [--threshold 0.1]
+"""
+import argparse
+import json
+import os
+import platform
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+from .bench_converters import _git_commit
+
+ROOT = Path(__file__).resolve().parent.parent
+
+CASES = {
+    "help": ["-m", "src.main", "--help"],
+    "import": ["-c", "import src.main"],
+    "neighborhoods": ["-m", "src.main", "neighborhoods", "-q"],
+    "metro": ["-m", "src.main", "metro", "-q"],
+    "districts": ["-m", "src.main", "districts", "-q"],
+    "pois": ["-m", "src.main", "pois", "-q"],
+    "all": ["-m", "src.main", "all", "-q"],
+}
+
+# "import time: self [us] | cumulative | imported package", nested imports indented by two spaces a level
+IMPORT_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+def _run(args: List[str], directory: str, importtime: bool = False) -> Tuple[float, str]:
+    env = dict(os.environ, PYTHONPATH=str(ROOT), OFFLINE="true", CACHE_DIR=os.path.join(directory, "cache"),
+               NEIGHBORHOODS_SOURCE=str(ROOT / "data" / "riyadh_neightborhoods.json"))
+    command = [sys.executable] + (["-X", "importtime"] if importtime else []) + args
+    start = time.perf_counter()
+    completed = subprocess.run(command, cwd=directory, env=env, capture_output=True, text=True)
+    return time.perf_counter() - start, completed.stderr
+
+
+def parse_importtime(stderr: str, top: int = 5) -> Dict[str, Any]:
+    """Total import seconds, modules loaded and the packages with the most self time"""
+    total_us, modules, by_package = 0, 0, Counter()
+    for line in stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, indent, name = int(match[1]), int(match[2]), match[3], match[4]
+        modules += 1
+        by_package[name.split(".")[0]] += self_us
+        if len(indent) == 1:
+            total_us += cumulative_us
+    return {
+        "import_seconds": round(total_us / 1e6, 4),
+        "modules": modules,
+        "top_packages": {name: round(us / 1e6, 4) for name, us in by_package.most_common(top)},
+    }
+
+
+def run_case(name: str, repeat: int) -> Dict[str, Any]:
+    with tempfile.TemporaryDirectory() as directory:
+        # Warm the bytecode and OS file caches so every timed run starts the same way
+        _run(CASES[name], directory)
+        seconds = min(_run(CASES[name], directory)[0] for _ in range(repeat))
+        _, stderr = _run(CASES[name], directory, importtime=True)
+    return {"case": name, "seconds": round(seconds, 4), **parse_importtime(stderr)}
+
+
+def compare(results: List[Dict[str, Any]], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """Print each case against the baseline; return the cases that regressed beyond the threshold"""
+    previous = {row["case"]: row for row in baseline.get("results", [])}
+    regressions = []
+    print(f"\nCompared with {baseline.get('meta', {}).get('commit') or 'baseline'}:")
+    for row in results:
+        before = previous.get(row["case"])
+        if before is None:
+            continue
+        time_ratio = row["seconds"] / before["seconds"] if before["seconds"] else 1.0
+        import_ratio = row["import_seconds"] / before["import_seconds"] if before["import_seconds"] else 1.0
+        regressed = time_ratio > 1 + threshold
+        if regressed:
+            regressions.append(row["case"])
+        print(f"  {row['case']:<14} wall {time_ratio:6.2f}x  imports {import_ratio:6.2f}x  "
+              f"modules {row['modules'] - before['modules']:+d}{'  REGRESSION' if regressed else ''}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark CLI startup and per-subcommand import cost')
+    parser.add_argument('--cases', default=','.join(CASES), help='Comma-separated cases to run')
+    parser.add_argument('--repeat', type=int, default=5, help='Timed runs per case (the best is kept)')
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    parser.add_argument('--compare', help='Earlier results JSON to compare against')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='Relative slowdown of wall time reported as a regression')
+    args = parser.parse_args()
+
+    cases = [case for case in args.cases.split(',') if case]
+    unknown = [case for case in cases if case not in CASES]
+    if unknown:
+        parser.error(f"unknown cases: {', '.join(unknown)} (choose from {', '.join(CASES)})")
+
+    results = []
+    print(f"{'case':<14} {'wall s':>8} {'import s':>9} {'modules':>8}  top packages (self time)")
+    for case in cases:
+        row = run_case(case, args.repeat)
+        results.append(row)
+        packages = ", ".join(f"{name} {seconds * 1000:.0f}ms" for name, seconds in row["top_packages"].items())
+        print(f"{row['case']:<14} {row['seconds']:>8.3f} {row['import_seconds']:>9.3f} {row['modules']:>8}  {packages}")
+
+    report = {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2), encoding="utf-8")
+        print(f"\nResults saved to: {args.output}")
+
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\nRegressions: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
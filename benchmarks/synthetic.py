@@ -0,0 +1,164 @@
+"""Synthetic source payloads shaped like the real upstream data.
+
+Every generator is deterministic for a given seed, so results stay
+comparable across commits.
+"""
+import math
+import random
+from typing import Any, Dict, List, Tuple
+
+# Riyadh city centre, in degrees and in Web Mercator meters
+CENTER_LON, CENTER_LAT = 46.7, 24.7
+EARTH_RADIUS = 6378137.0
+
+
+def to_mercator(lon: float, lat: float) -> Tuple[float, float]:
+    x = math.radians(lon) * EARTH_RADIUS
+    y = math.log(math.tan(math.pi / 4 + math.radians(lat) / 2)) * EARTH_RADIUS
+    return x, y
+
+
+def _ring(rng: random.Random, lon: float, lat: float, radius: float, vertices: int,
+          clockwise: bool = False) -> List[List[float]]:
+    """Closed, jittered circle of (lon, lat) vertices around a centre"""
+    ring = []
+    for i in range(vertices - 1):
+        angle = 2 * math.pi * i / (vertices - 1)
+        if clockwise:
+            angle = -angle
+        r = radius * rng.uniform(0.85, 1.0)
+        ring.append([round(lon + r * math.cos(angle), 7), round(lat + r * math.sin(angle), 7)])
+    ring.append(list(ring[0]))
+    return ring
+
+
+def _random_walk(rng: random.Random, vertices: int, step: float = 0.002) -> List[Tuple[float, float]]:
+    lon = CENTER_LON + rng.uniform(-0.2, 0.2)
+    lat = CENTER_LAT + rng.uniform(-0.2, 0.2)
+    path = []
+    for _ in range(vertices):
+        lon += rng.uniform(-step, step)
+        lat += rng.uniform(-step, step)
+        path.append((lon, lat))
+    return path
+
+
+def make_webmap(lines: int = 6, paths_per_line: int = 2, vertices: int = 500, stations: int = 85,
+                seed: int = 1) -> Dict[str, Any]:
+    """ArcGIS webmap data with the metro lines and stations operational layers (Web Mercator)"""
+    rng = random.Random(seed)
+    line_features = []
+    for line in range(lines):
+        for _ in range(paths_per_line):
+            path = [list(to_mercator(lon, lat)) for lon, lat in _random_walk(rng, vertices)]
+            line_features.append({"attributes": {"Name": f"Line {line + 1}"},
+                                  "geometry": {"paths": [path]}})
+
+    station_features = []
+    for i in range(stations):
+        x, y = to_mercator(CENTER_LON + rng.uniform(-0.25, 0.25), CENTER_LAT + rng.uniform(-0.25, 0.25))
+        station_features.append({"attributes": {"Name": f"Station {i}", "Description": f"Line {i % 6 + 1}"},
+                                 "geometry": {"x": x, "y": y}})
+
+    def layer(layer_id: str, geometry_type: str, features: List[Dict[str, Any]]) -> Dict[str, Any]:
+        return {"id": layer_id, "featureCollection": {"layers": [
+            {"featureSet": {"geometryType": geometry_type, "features": features}}]}}
+
+    return {"operationalLayers": [
+        layer("metrolines_110", "esriGeometryPolyline", line_features),
+        layer("stations_4748", "esriGeometryPoint", station_features),
+    ]}
+
+
+def make_pois(count: int = 2000, categories: int = 12, seed: int = 2) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Visit Saudi POI lists in English and Arabic, joined by slugPOI"""
+    rng = random.Random(seed)
+    en, ar = [], []
+    for i in range(count):
+        slug = f"poi-{i}"
+        base = {
+            "id": i,
+            "slugPOI": slug,
+            "name": f"Place {i}",
+            "description": f"Description of place {i} & <surroundings>",
+            "latitude": CENTER_LAT + rng.uniform(-0.3, 0.3),
+            "longitude": CENTER_LON + rng.uniform(-0.3, 0.3),
+            "slugCategoryPOI": f"category-{i % categories}",
+            "slugCity": "riyadh",
+            "slugRegion": "riyadh",
+            "poiType": "city",
+            "address": f"{i} King Fahd Road",
+            "businessHours": "9:00-22:00",
+            "website": f"https://example.com/{slug}",
+            "bannerImage": [f"https://example.com/{slug}/banner.jpg"],
+            "rating": rng.choice([None, 3.5, 4.0, 4.5]),
+            "createdAt": f"2024-{rng.randint(1, 12):02d}-01T00:00:00Z",
+        }
+        en.append(base)
+        # A few POIs are only published in one locale
+        if rng.random() < 0.02:
+            continue
+        localized = dict(base, id=f"{i}-ar", name=f"مكان {i}", description=f"وصف المكان {i}",
+                         address=f"{i} طريق الملك فهد",
+                         bannerImage=[f"https://example.com/{slug}/banner-ar.jpg"])
+        if rng.random() < 0.05:
+            localized["latitude"] += 0.0001
+        ar.append(localized)
+    rng.shuffle(ar)
+    return en, ar
+
+
+def make_districts(count: int = 200, vertices: int = 400, other_cities: int = 4,
+                   seed: int = 3) -> List[Dict[str, Any]]:
+    """
+    districts.json records ([latitude, longitude] boundaries): `count` Riyadh
+    city districts plus `other_cities` times as many elsewhere in the kingdom
+    """
+    rng = random.Random(seed)
+    records = []
+    for i in range(count * (1 + other_cities)):
+        riyadh = i % (1 + other_cities) == 0
+        lon = CENTER_LON + rng.uniform(-0.3, 0.3)
+        lat = CENTER_LAT + rng.uniform(-0.3, 0.3)
+        rings = [_ring(rng, lon, lat, 0.01, vertices)]
+        if i % 10 == 0:
+            rings.append(_ring(rng, lon, lat, 0.002, max(vertices // 8, 4), clockwise=True))
+        records.append({
+            "district_id": i,
+            "city_id": 3 if riyadh else rng.choice([13, 18, 31]),
+            "region_id": 1 if riyadh else rng.choice([1, 2, 5]),
+            "name_ar": f"حي {i}",
+            "name_en": f"District {i}",
+            "boundaries": [[[lat_, lon_] for lon_, lat_ in ring] for ring in rings],
+        })
+    return records
+
+
+def make_feature_set(count: int = 200, vertices: int = 300, seed: int = 4) -> Dict[str, Any]:
+    """Esri JSON polygon FeatureSet shaped like data/riyadh_neightborhoods.json (clockwise outers, WGS84)"""
+    rng = random.Random(seed)
+    features = []
+    for i in range(count):
+        lon = CENTER_LON + rng.uniform(-0.3, 0.3)
+        lat = CENTER_LAT + rng.uniform(-0.3, 0.3)
+        rings = [_ring(rng, lon, lat, 0.01, vertices, clockwise=True)]
+        if i % 10 == 0:
+            rings.append(_ring(rng, lon, lat, 0.002, max(vertices // 8, 4)))
+        features.append({
+            "attributes": {
+                "OBJECTID": i,
+                "NEIGHBORHCODE": f"{i:03d}",
+                "NEIGHBORHANAME": f"حي {i}",
+                "NEIGHBORHENAME": f"NEIGHBORHOOD-{i}",
+                "MUNICIPALITYCODE": f"{i % 16:02d}",
+                "MUNICIPALITYENAME": f"MUNICIPALITY-{i % 16}",
+            },
+            "geometry": {"rings": rings},
+        })
+    return {
+        "displayFieldName": "NEIGHBORHANAME",
+        "geometryType": "esriGeometryPolygon",
+        "spatialReference": {"wkid": 4326, "latestWkid": 4326},
+        "fields": [{"name": name, "type": "esriFieldTypeString"} for name in features[0]["attributes"]] if features else [],
+        "features": features,
+    }
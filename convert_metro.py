@@ -1,6 +1,7 @@
 import json
 import simplekml
-import pyproj
+from src.converters.metro_converter import MetroConverter
+from src.geometry import BatchReprojector
 
 # Load the JSON file
 with open("data.json", "r") as file:
@@ -10,7 +11,10 @@ with open("data.json", "r") as file:
 kml = simplekml.Kml()
 
 # Projection: Convert from EPSG:3857 (Web Mercator) to WGS84 (EPSG:4326)
-transformer = pyproj.Transformer.from_crs("EPSG:3857", "EPSG:4326", always_xy=True)
+reprojector = BatchReprojector("EPSG:3857", "EPSG:4326")
+
+# One shared style per metro line, written once and referenced by every placemark of that line
+line_styles = {}
 
 # Process layers
 for layer in data["operationalLayers"]:
@@ -23,10 +27,8 @@ for layer in data["operationalLayers"]:
 
             if geometry_type == "esriGeometryPoint":  # Handle Stations (Points)
                 folder = kml.newfolder(name=f"{title} - Points")
-                for feature in features:
-                    x = feature["geometry"]["x"]
-                    y = feature["geometry"]["y"]
-                    lon, lat = transformer.transform(x, y)  # Convert coordinates
+                points = [(f["geometry"]["x"], f["geometry"]["y"]) for f in features]
+                for feature, (lon, lat) in zip(features, reprojector.transform_points(points)):  # Convert coordinates
                     name = feature["attributes"].get("Name", "Unknown Station")
 
                     # Add to KML
@@ -40,15 +42,19 @@ for layer in data["operationalLayers"]:
                     name = feature["attributes"].get("Name", "Unknown Line")
                     description = f"Metro Line: {name}"
 
+                    if name not in line_styles:
+                        style = simplekml.Style()
+                        style.linestyle.width = MetroConverter.LINE_WIDTH
+                        style.linestyle.color = MetroConverter.line_color(name)
+                        line_styles[name] = style
+
                     # Consolidate all paths into one LineString with multiple segments
                     multigeometry = folder.newmultigeometry(name=name)
                     multigeometry.description = description
+                    multigeometry.style = line_styles[name]
 
-                    for path in paths:
-                        coords = [transformer.transform(x, y) for x, y in path]
-                        line = multigeometry.newlinestring(coords=coords)
-                        line.style.linestyle.width = 2.5  # Set line style
-                        line.style.linestyle.color = simplekml.Color.red
+                    for coords in reprojector.transform_paths(paths):
+                        multigeometry.newlinestring(coords=coords)
 
 # Save the KML file
 kml.save("metro_lines_and_stations_2.kml")
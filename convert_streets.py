@@ -1,6 +1,6 @@
 import json
 import simplekml
-import pyproj
+from src.geometry import BatchReprojector
 
 # Load JSON file
 with open("riyadh_streets.json", "r") as file:
@@ -10,7 +10,7 @@ with open("riyadh_streets.json", "r") as file:
 kml = simplekml.Kml()
 
 # Projection: Convert from EPSG:3857 (Web Mercator) to WGS84 (EPSG:4326)
-transformer = pyproj.Transformer.from_crs("EPSG:3857", "EPSG:4326", always_xy=True)
+reprojector = BatchReprojector("EPSG:3857", "EPSG:4326")
 
 # Function to generate dummy line coordinates for the layers
 def create_dummy_lines(layer_extent):
@@ -33,7 +33,7 @@ def create_dummy_lines(layer_extent):
         (xmin, ymax),
         (xmin, ymin),
     ]
-    return [transformer.transform(x, y) for x, y in coords]
+    return reprojector.transform_paths([coords])[0]
 
 
 # Process Layers
@@ -0,0 +1,50 @@
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+
+class City(NamedTuple):
+    """One exported city: its Visit Saudi API codes and its ids in the districts dataset"""
+    slug: str
+    name: str
+    poi_city: str
+    poi_region: str
+    region_id: int
+    city_id: int
+
+    @property
+    def districts_key(self) -> Tuple[int, int]:
+        return self.region_id, self.city_id
+
+
+RIYADH = City(slug="riyadh", name="Riyadh", poi_city="RUH", poi_region="RUH", region_id=1, city_id=3)
+
+
+def parse_cities(entries: Iterable[Union[City, Dict[str, Any]]]) -> List[City]:
+    """Cities from settings entries (dicts with every City field), rejecting incomplete or duplicate ones"""
+    cities = []
+    for entry in entries:
+        if isinstance(entry, City):
+            cities.append(entry)
+            continue
+        missing = [field for field in City._fields if field not in entry]
+        if missing:
+            raise ValueError(f"City entry {entry} is missing {', '.join(missing)}")
+        cities.append(City(**{field: entry[field] for field in City._fields}))
+
+    slugs = [city.slug for city in cities]
+    duplicates = sorted({slug for slug in slugs if slugs.count(slug) > 1})
+    if duplicates:
+        raise ValueError(f"Duplicate city slugs: {', '.join(duplicates)}")
+    return cities
+
+
+def select_cities(cities: Sequence[City], names: Optional[Sequence[str]] = None) -> List[City]:
+    """Cities matching the given slugs or Visit Saudi city codes (all of them without names)"""
+    if not names:
+        return list(cities)
+    wanted = {name.lower() for name in names}
+    selected = [city for city in cities if city.slug.lower() in wanted or city.poi_city.lower() in wanted]
+    found = {name for city in selected for name in (city.slug.lower(), city.poi_city.lower())}
+    unknown = sorted(wanted - found)
+    if unknown:
+        raise ValueError(f"Unknown cities: {', '.join(unknown)}")
+    return selected
@@ -1,3 +1,5 @@
+from functools import lru_cache
+
 from pydantic_settings import BaseSettings
 from pydantic import Field
 
@@ -11,18 +13,197 @@ class Settings(BaseSettings):
         default="https://www.arcgis.com/sharing/rest/content/items",
         description="ArcGIS API base URL"
     )
+    NEIGHBORHOODS_SOURCE: str = Field(
+        default="data/riyadh_neightborhoods.json",
+        description="Esri JSON FeatureSet of neighborhood polygons (local path or URL)"
+    )
+    STREETS_SERVICE_URL: str = Field(
+        default="",
+        description="ArcGIS MapServer/FeatureServer URL for the street layers"
+    )
+    ARCGIS_QUERY_CONCURRENCY: int = Field(
+        default=4,
+        description="Maximum concurrent page requests per layer query"
+    )
+    
+    # HTTP client configuration
+    HTTP_MAX_CONNECTIONS: int = Field(
+        default=100,
+        description="Maximum open connections in the shared session pool"
+    )
+    HTTP_MAX_CONNECTIONS_PER_HOST: int = Field(
+        default=8,
+        description="Maximum open connections per host"
+    )
+    HTTP_DNS_CACHE_TTL: int = Field(
+        default=300,
+        description="Seconds to cache DNS lookups"
+    )
+    HTTP_TIMEOUT: float = Field(
+        default=120.0,
+        description="Total timeout in seconds for a single request"
+    )
+    HTTP_CONNECT_TIMEOUT: float = Field(
+        default=15.0,
+        description="Timeout in seconds for establishing a connection"
+    )
+    HTTP_RATE_LIMIT: float = Field(
+        default=10.0,
+        description="Requests per second allowed per host (0 disables rate limiting)"
+    )
+    HTTP_RATE_BURST: int = Field(
+        default=10,
+        description="Requests per host that may be sent back to back before the rate limit applies"
+    )
+    HTTP_HOST_RATE_LIMITS: dict = Field(
+        default={},
+        description="Per-host overrides of HTTP_RATE_LIMIT, e.g. {\"services.arcgis.com\": 4}"
+    )
+    HTTP_MAX_RETRIES: int = Field(
+        default=4,
+        description="Retries for connection errors, timeouts, 429 and 5xx responses"
+    )
+    HTTP_RETRY_BACKOFF: float = Field(
+        default=0.5,
+        description="Base delay in seconds for exponential backoff (full jitter) between retries"
+    )
+    HTTP_RETRY_MAX_DELAY: float = Field(
+        default=30.0,
+        description="Upper bound in seconds for a backoff delay or an honored Retry-After"
+    )
+    HTTP_CIRCUIT_FAILURES: int = Field(
+        default=5,
+        description="Consecutive failures after which a host's circuit opens (0 never opens it)"
+    )
+    HTTP_CIRCUIT_RESET: float = Field(
+        default=30.0,
+        description="Seconds an open circuit rejects requests before allowing a trial request"
+    )
+    
+    # HTTP response cache
+    CACHE_ENABLED: bool = Field(
+        default=True,
+        description="Cache GET responses on disk and revalidate with ETag/Last-Modified"
+    )
+    CACHE_DIR: str = Field(
+        default=".cache/http",
+        description="Directory for cached HTTP responses"
+    )
+    CACHE_TTL: float = Field(
+        default=3600,
+        description="Seconds a cached response is served without revalidation"
+    )
+    OFFLINE: bool = Field(
+        default=False,
+        description="Serve responses purely from the cache, never touching the network"
+    )
+    
+    # District boundary simplification
+    DISTRICT_SIMPLIFY_TOLERANCE: float = Field(
+        default=0.0,
+        description="Simplification tolerance in degrees for district boundaries (0 keeps every vertex); "
+                    "for visvalingam this is the minimum triangle area in square degrees"
+    )
+    DISTRICT_SIMPLIFY_METHOD: str = Field(
+        default="douglas-peucker",
+        description="Simplification algorithm: douglas-peucker or visvalingam"
+    )
+    DISTRICT_LOD_TOLERANCES: list = Field(
+        default=[],
+        description="Coarse-to-fine tolerances for multi-LOD output with KML Regions, e.g. [0.001, 0.0002]; "
+                    "a full-detail level is always added last"
+    )
     
     # Output configuration
     OUTPUT_DIR: str = Field(
         default="output",
         description="Directory for output files"
     )
+    OUTPUT_FORMATS: list = Field(
+        default=["kml"],
+        description="Formats written for every output: kml, kmz, kml-tiles, geojson, ndjson, columnar"
+    )
+    SOURCE_OUTPUT_FORMATS: dict = Field(
+        default={},
+        description="Per-source format overrides keyed by output folder, e.g. {\"metro\": [\"kml\", \"geojson\"]}"
+    )
+    COORDINATE_PRECISION: int = Field(
+        default=7,
+        description="Decimal places written for coordinates in KML/GeoJSON/NDJSON (7 is ~1 cm; -1 writes full precision)"
+    )
+    DEDUPE_VERTICES: bool = Field(
+        default=True,
+        description="Drop vertices identical to the previous one after rounding to COORDINATE_PRECISION"
+    )
+    FORCE_REBUILD: bool = Field(
+        default=False,
+        description="Rebuild outputs even when their source fingerprint is unchanged"
+    )
+    WRITE_DELTAS: bool = Field(
+        default=True,
+        description="Write per-feature delta KML/JSON against the previous run"
+    )
+    WRITE_NETWORKLINK_UPDATE: bool = Field(
+        default=False,
+        description="Also write a NetworkLinkControl Update document for each delta"
+    )
+    KML_SERIALIZE_WORKERS: int = Field(
+        default=0,
+        description="Processes rendering KML/KMZ placemark chunks in parallel (0 renders in the writing process)"
+    )
+    KML_SERIALIZE_CHUNK: int = Field(
+        default=500,
+        description="Placemarks per chunk handed to a KML serialization worker"
+    )
+    TILE_ZOOM: int = Field(
+        default=12,
+        description="Deepest XYZ zoom of kml-tiles output; points land at this level, lines and polygons "
+                    "in the deepest tile containing their bounding box"
+    )
+    TILE_MIN_LOD_PIXELS: int = Field(
+        default=128,
+        description="On-screen size in pixels at which a tile's NetworkLink Region activates"
+    )
+    
+    # Logging
+    LOG_LEVEL: str = Field(
+        default="info",
+        description="Logging level: debug (includes response payload dumps), info, warning or error"
+    )
+
+    # Watch mode
+    WATCH_SOURCES: list = Field(
+        default=["metro", "districts", "pois", "poi-context", "neighborhoods"],
+        description="Sources kept current by `watch`: metro, districts, pois, poi-context, neighborhoods, streets"
+    )
+    WATCH_INTERVAL: float = Field(
+        default=3600,
+        description="Seconds between polls of a watched source"
+    )
+    WATCH_INTERVALS: dict = Field(
+        default={},
+        description="Per-source poll intervals in seconds, e.g. {\"pois\": 900, \"districts\": 86400}"
+    )
+    WATCH_STATUS_HOST: str = Field(
+        default="127.0.0.1",
+        description="Address the watch mode status endpoint listens on"
+    )
+    WATCH_STATUS_PORT: int = Field(
+        default=8765,
+        description="Port of the watch mode JSON status endpoint (0 disables it)"
+    )
     
     # Data source configurations
     DEFAULT_CITY: str = Field(
         default="RUH",
         description="Default city code"
     )
+    CITIES: list = Field(
+        default=[{"slug": "riyadh", "name": "Riyadh", "poi_city": "RUH", "poi_region": "RUH",
+                  "region_id": 1, "city_id": 3}],
+        description="Cities exported by batch mode: slug, name, Visit Saudi city/region codes "
+                    "(poi_city, poi_region) and districts dataset ids (region_id, city_id)"
+    )
     COORDINATE_SYSTEM: dict = Field(
         default={
             "source": "EPSG:3857",
@@ -32,4 +213,10 @@ class Settings(BaseSettings):
     )
     
     class Config:
-        env_file = ".env" 
\ No newline at end of file
+        env_file = ".env"
+
+
+@lru_cache(maxsize=None)
+def get_settings() -> Settings:
+    """The process-wide Settings, read from the environment and .env on first use"""
+    return Settings()
@@ -1,54 +1,167 @@
-import json
-import simplekml
-from typing import Dict, Any, List, Tuple
+import logging
+from collections import defaultdict
+from typing import Dict, Any, Iterator, List, Optional, Sequence, Tuple
+import numpy as np
+from ..cities import City, RIYADH
+from ..feature_table import FeatureTable, FeatureTableBuilder
+from ..features import Folder, Geometry, MultiGeometry, Placemark, Polygon, Region
+from ..geometry import simplify_ring_array
+from ..instrumentation import traced
+from ..styles import Style, StyleRegistry, kml_color
+
+log = logging.getLogger(__name__)
 
 class DistrictConverter:
-    def __init__(self, output_manager):
+    # Bump when the conversion logic changes so existing outputs are rebuilt
+    VERSION = 5
+    # On-screen size (pixels) at which the coarsest LOD hands over to the next one
+    LOD_BASE_PIXELS = 256
+    # districts.json has no municipality, so every district shares one outline/fill style
+    DISTRICT_STYLE = Style(line_color=kml_color("#1F77B4"), line_width=1.5, poly_color=kml_color("#1F77B4", 0x40))
+
+    def __init__(self, output_manager, city: City = RIYADH):
         self.output_manager = output_manager
+        self.city = city
+        self.output_name = f"{city.slug}_city_districts"
         self.source_url = "https://raw.githubusercontent.com/homaily/Saudi-Arabia-Regions-Cities-and-Districts/refs/heads/master/json/districts.json"
+        settings = getattr(output_manager, 'settings', None)
+        self.simplify_tolerance = getattr(settings, 'DISTRICT_SIMPLIFY_TOLERANCE', 0.0)
+        self.simplify_method = getattr(settings, 'DISTRICT_SIMPLIFY_METHOD', 'douglas-peucker')
+        self.lod_tolerances = list(getattr(settings, 'DISTRICT_LOD_TOLERANCES', None) or [])
+
+    @property
+    def district_filter(self) -> Dict[str, int]:
+        """This city's ids, pushed down into the streaming fetch so other districts are never decoded"""
+        return {"region_id": self.city.region_id, "city_id": self.city.city_id}
 
     async def fetch_districts(self, data_manager):
-        """Fetch districts data"""
+        """Fetch this city's districts, filtered while the response streams in"""
         try:
-            districts = await data_manager.fetch_districts()
+            districts = await data_manager.fetch_districts(self.district_filter)
             if not districts:
-                print("No districts data received")
+                log.warning("No districts data received")
                 return []
             return districts
         except Exception as e:
-            print(f"Error fetching districts: {e}")
+            log.error("Error fetching districts: %s", e)
             return []
 
-    def _format_coordinates(self, boundaries: List[List[List[float]]]) -> List[Tuple[float, float, float]]:
-        """Convert boundary coordinates to KML format
-        
-        Args:
-            boundaries: List of coordinate arrays
-            
-        Returns:
-            Flattened list of (longitude, latitude, altitude) tuples
-        """
-        # Flatten the coordinates and convert to (lon, lat, alt) tuples
-        return [(coord[1], coord[0], 0.0) for ring in boundaries for coord in ring]
+    @staticmethod
+    async def fetch_city_districts(data_manager, cities: Sequence[City]) -> Dict[Tuple[int, int], List[Dict[str, Any]]]:
+        """Fetch the districts dataset once for several cities and partition it by (region_id, city_id)"""
+        where = {"region_id": {city.region_id for city in cities}, "city_id": {city.city_id for city in cities}}
+        return partition_districts(await data_manager.fetch_districts(where), cities)
+
+    @traced("build")
+    def to_table(self, districts: List[Dict[str, Any]]) -> FeatureTable:
+        """Pack districts into a FeatureTable, classifying each district's rings into outers and holes"""
+        builder = FeatureTableBuilder()
+        for district in districts:
+            # Boundaries are [latitude, longitude] pairs
+            builder.add_rings(district["boundaries"],
+                              {k: v for k, v in district.items() if k != "boundaries"}, swap_xy=True)
+        return builder.build()
+
+    def select_districts(self, data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """This city's districts (matching its region_id and city_id)"""
+        return [d for d in data if (d.get("region_id"), d.get("city_id")) == self.city.districts_key]
+
+    def _lod_levels(self) -> List[Tuple[float, float, float]]:
+        """(tolerance, minLodPixels, maxLodPixels) from the coarsest level to full detail"""
+        levels = []
+        min_pixels = 0
+        for i, tolerance in enumerate(self.lod_tolerances):
+            max_pixels = self.LOD_BASE_PIXELS * 4 ** i
+            levels.append((tolerance, min_pixels, max_pixels))
+            min_pixels = max_pixels
+        levels.append((self.simplify_tolerance, min_pixels, -1))
+        return levels
+
+    def _region(self, geometry: Geometry, min_pixels: float, max_pixels: float) -> Region:
+        polygons = geometry.geometries if isinstance(geometry, MultiGeometry) else [geometry]
+        coords = np.concatenate([polygon.outer for polygon in polygons])
+        (west, south), (east, north) = coords.min(axis=0).tolist(), coords.max(axis=0).tolist()
+        return Region(north=north, south=south, east=east, west=west,
+                      min_lod_pixels=min_pixels, max_lod_pixels=max_pixels)
+
+    def _simplify(self, geometry: Geometry, tolerance: float) -> Geometry:
+        if isinstance(geometry, MultiGeometry):
+            return MultiGeometry(geometries=[self._simplify(part, tolerance) for part in geometry.geometries])
+        return Polygon(outer=simplify_ring_array(geometry.outer, tolerance, self.simplify_method),
+                       inner=tuple(simplify_ring_array(ring, tolerance, self.simplify_method)
+                                   for ring in geometry.inner))
+
+    def _iter_placemarks(self, table: FeatureTable, tolerance: float = 0.0,
+                         lod: Optional[Tuple[float, float]] = None, id_suffix: str = "",
+                         style_url: Optional[str] = None) -> Iterator[Placemark]:
+        """Yield one polygon placemark per district, optionally simplified and LOD-bounded"""
+        vertices_out = 0
+        names_en, names_ar = table.column("name_en"), table.column("name_ar")
+        city_ids, region_ids = table.column("city_id"), table.column("region_id")
+        for i in range(len(table)):
+            # Outer boundaries and holes were separated when the table was built
+            geometry = table.geometry(i)
+            if geometry is None:
+                continue
+            if tolerance > 0:
+                geometry = self._simplify(geometry, tolerance)
+                polygons = geometry.geometries if isinstance(geometry, MultiGeometry) else [geometry]
+                vertices_out += sum(len(ring) for polygon in polygons for ring in (polygon.outer, *polygon.inner))
+            yield Placemark(
+                name=names_en[i],
+                geometry=geometry,
+                description=f"Arabic Name: {names_ar[i]} | City ID: {city_ids[i]} | Region ID: {region_ids[i]}",
+                id=names_en[i] + id_suffix,
+                region=self._region(geometry, *lod) if lod else None,
+                style_url=style_url
+            )
+        if tolerance > 0:
+            log.info("  Simplified (tolerance %s): %d -> %d vertices", tolerance, int(table.ring_coords[-1]), vertices_out)
 
     def convert(self, data):
-        """Convert districts to KML without styling"""
+        """Convert districts to KML with one shared district style"""
         if not data:
-            print("No district data to convert")
+            log.warning("No district data to convert")
             return None
             
-        kml = simplekml.Kml()
-        riyadh_districts = [d for d in data if d["region_id"] == 1 and d["city_id"] == 3]
-        folder = kml.newfolder(name="Riyadh City Districts")
-        
-        for district in riyadh_districts:
-            boundaries = district["boundaries"]
-            
-            # Create polygon without styling
-            pol = folder.newpolygon(name=district["name_en"])
-            coordinates = self._format_coordinates(boundaries)
-            pol.outerboundaryis = coordinates
-            
-            pol.description = f"Arabic Name: {district['name_ar']} | City ID: {district['city_id']} | Region ID: {district['region_id']}"
+        city_districts = self.select_districts(data)
+
+        simplification = [self.simplify_tolerance, self.simplify_method, self.lod_tolerances]
+        fingerprint = self.output_manager.fingerprint([city_districts, simplification], self.VERSION)
+        if self.output_manager.is_current('districts', self.output_name, fingerprint):
+            log.info("%s districts unchanged, skipping export", self.city.name)
+            return self.output_manager.current_path('districts', self.output_name)
+
+        table = self.to_table(city_districts)
+        styles = StyleRegistry()
+        style_url = styles.add("district", self.city.slug, self.DISTRICT_STYLE)
+        folder_name = f"{self.city.name} City Districts"
+        if self.lod_tolerances:
+            # One folder per level; each placemark's Region/Lod decides when it is drawn
+            levels = self._lod_levels()
+            folders = []
+            for i, (tolerance, min_pixels, max_pixels) in enumerate(levels):
+                full_detail = i == len(levels) - 1
+                folders.append(Folder(
+                    name=folder_name if full_detail else f"{folder_name} (LOD {i})",
+                    placemarks=self._iter_placemarks(table, tolerance, (min_pixels, max_pixels),
+                                                     "" if full_detail else f":lod{i}", style_url)
+                ))
+        else:
+            folders = [Folder(name=folder_name,
+                              placemarks=self._iter_placemarks(table, self.simplify_tolerance,
+                                                               style_url=style_url))]
+
+        return self.output_manager.save_features(folders, 'districts', self.output_name, fingerprint, styles)
+
 
-        return self.output_manager.save_kml(kml, 'districts', 'riyadh_city_districts') 
\ No newline at end of file
+def partition_districts(records: List[Dict[str, Any]],
+                        cities: Sequence[City]) -> Dict[Tuple[int, int], List[Dict[str, Any]]]:
+    """Group district records by (region_id, city_id) in one pass, keeping only the given cities"""
+    wanted = {city.districts_key for city in cities}
+    groups: Dict[Tuple[int, int], List[Dict[str, Any]]] = defaultdict(list)
+    for record in records:
+        key = (record.get("region_id"), record.get("city_id"))
+        if key in wanted:
+            groups[key].append(record)
+    return groups
@@ -0,0 +1,102 @@
+import logging
+from typing import Any, Dict, Iterable, Iterator, Optional
+
+from ..feature_table import FeatureTable, FeatureTableBuilder
+from ..features import Folder, Placemark
+from ..geometry import BatchReprojector
+from ..instrumentation import traced
+from ..styles import Style, StyleRegistry, kml_color, palette_color
+
+log = logging.getLogger(__name__)
+
+
+class EsriPolygonConverter:
+    """Convert Esri JSON polygon FeatureSets (e.g. data/riyadh_neightborhoods.json) to KML.
+
+    Esri rings carry no explicit outer/hole structure: outer boundaries are
+    clockwise and holes counter-clockwise. Rings are classified by winding
+    order so holes and multipart features become proper KML polygons.
+    """
+
+    # Bump when the conversion logic changes so existing outputs are rebuilt
+    VERSION = 4
+
+    def __init__(self, output_manager):
+        self.output_manager = output_manager
+
+    def _reprojector(self, spatial_reference: Dict[str, Any]) -> Optional[BatchReprojector]:
+        wkid = spatial_reference.get('latestWkid') or spatial_reference.get('wkid') or 4326
+        return None if wkid == 4326 else BatchReprojector(f"EPSG:{wkid}", "EPSG:4326")
+
+    def _oid_field(self, feature_set: Dict[str, Any]) -> str:
+        for field in feature_set.get('fields', []):
+            if field.get('type') == 'esriFieldTypeOID':
+                return field['name']
+        return 'OBJECTID'
+
+    @traced("build")
+    def to_table(self, features: Iterable[Dict[str, Any]],
+                 reprojector: Optional[BatchReprojector] = None) -> FeatureTable:
+        """Pack polygon features into a FeatureTable and reproject every vertex in one batch"""
+        builder = FeatureTableBuilder()
+        for feature in features:
+            rings = (feature.get('geometry') or {}).get('rings')
+            if rings:
+                builder.add_rings(rings, feature.get('attributes'), outer_clockwise=True)
+        table = builder.build()
+        return table.reproject(reprojector) if reprojector is not None else table
+
+    def field_styles(self, table: FeatureTable, style_field: str) -> StyleRegistry:
+        """One shared outline/fill style per value of an attribute (e.g. the municipality), in sorted order"""
+        styles = StyleRegistry()
+        for i, value in enumerate(sorted(set(table.column(style_field)), key=str)):
+            color = palette_color(i)
+            styles.add(style_field.lower(), value,
+                       Style(line_color=kml_color(color), line_width=1.5, poly_color=kml_color(color, 0x59)))
+        return styles
+
+    def _iter_placemarks(self, table: FeatureTable, name_field: str, oid_field: str,
+                         styles: Optional[StyleRegistry] = None,
+                         style_field: Optional[str] = None) -> Iterator[Placemark]:
+        """Yield one placemark per feature that has at least one valid ring"""
+        count = 0
+        for i in range(len(table)):
+            geometry = table.geometry(i)
+            if geometry is None:
+                continue
+
+            attributes = table.row(i)
+            oid = attributes.get(oid_field)
+            count += 1
+            yield Placemark(
+                name=str(attributes.get(name_field) or oid),
+                geometry=geometry,
+                extended_data=attributes,
+                id=str(oid) if oid is not None else None,
+                style_url=styles.url(style_field.lower(), attributes.get(style_field)) if styles is not None else None
+            )
+        log.info("  Converted polygons: %d", count)
+
+    def convert(self, feature_set: Dict[str, Any], subdir: str, filename: str,
+                folder_name: str, name_field: Optional[str] = None, style_field: Optional[str] = None):
+        """
+        Convert an Esri polygon FeatureSet to a KML file with one folder,
+        with shared styles per `style_field` value when one is given
+        """
+        if feature_set.get('geometryType') != 'esriGeometryPolygon':
+            log.warning("Unsupported geometry type: %s", feature_set.get('geometryType'))
+            return None
+
+        fingerprint = self.output_manager.fingerprint([feature_set, name_field, style_field], self.VERSION)
+        if self.output_manager.is_current(subdir, filename, fingerprint):
+            log.info("%s unchanged, skipping export", folder_name)
+            return self.output_manager.current_path(subdir, filename)
+
+        name_field = name_field or feature_set.get('displayFieldName') or 'OBJECTID'
+        reprojector = self._reprojector(feature_set.get('spatialReference', {}))
+        table = self.to_table(feature_set.get('features', []), reprojector)
+        styles = self.field_styles(table, style_field) if style_field else None
+        placemarks = self._iter_placemarks(table, name_field, self._oid_field(feature_set), styles, style_field)
+
+        folders = [Folder(name=folder_name, placemarks=placemarks)]
+        return self.output_manager.save_features(folders, subdir, filename, fingerprint, styles)
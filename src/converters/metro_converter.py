@@ -1,71 +1,140 @@
-import simplekml
-import pyproj
-from typing import Dict, Any, Optional
+import logging
+from collections import defaultdict
+from typing import Dict, Any, Iterator, List, Optional
+from ..feature_table import FeatureTable, FeatureTableBuilder
+from ..features import Folder, Placemark
+from ..geometry import BatchReprojector
+from ..instrumentation import traced
+from ..styles import Style, StyleRegistry, kml_color
+
+log = logging.getLogger(__name__)
 
 class MetroConverter:
+    # Bump when the conversion logic changes so existing outputs are rebuilt
+    VERSION = 3
+
+    # Line name -> color (see README "Line Colors")
+    LINE_COLORS = {
+        "1": "#FF0000",  # Red
+        "2": "#0000FF",  # Blue
+        "3": "#FFA500",  # Orange
+        "4": "#FFFF00",  # Yellow
+        "5": "#008000",  # Green
+        "6": "#800080",  # Purple
+    }
+    DEFAULT_LINE_COLOR = "#808080"
+    LINE_WIDTH = 4.0
+    STATION_ICON = "https://maps.google.com/mapfiles/kml/shapes/rail.png"
+
     def __init__(self, output_manager):
         self.output_manager = output_manager
-        self.transformer = pyproj.Transformer.from_crs("EPSG:3857", "EPSG:4326", always_xy=True)
+        self.reprojector = BatchReprojector("EPSG:3857", "EPSG:4326")
         # Define the specific layer IDs we want
         self.METRO_LINES_ID = "metrolines_110"
         self.STATIONS_ID = "stations_4748"
 
-    def convert_lines(self, data: Dict[str, Any]) -> Optional[str]:
-        """Convert metro lines to KML - grouped by line number"""
-        kml = simplekml.Kml()
-        line_groups = {}
-        
-        # Find the metro lines layer
+    def _layer_fingerprint(self, data: Dict[str, Any], layer_id: str) -> str:
+        """Fingerprint only the layer an output is built from"""
+        layers = [layer for layer in data.get("operationalLayers", []) if layer.get("id") == layer_id]
+        return self.output_manager.fingerprint(layers, self.VERSION)
+
+    def _layer_features(self, data: Dict[str, Any], layer_id: str, geometry_type: str) -> Iterator[Dict[str, Any]]:
+        """Features of one operational layer's feature sets with the given geometry type"""
         for layer in data.get("operationalLayers", []):
-            if layer.get("id") != self.METRO_LINES_ID:
+            if layer.get("id") != layer_id:
                 continue
                 
             for feature_layer in layer["featureCollection"].get("layers", []):
-                if feature_layer["featureSet"]["geometryType"] != "esriGeometryPolyline":
+                if feature_layer["featureSet"]["geometryType"] != geometry_type:
                     continue
                 
-                for feature in feature_layer["featureSet"]["features"]:
-                    name = feature["attributes"].get("Name", "Unknown Line")
-                    if name not in line_groups:
-                        line_groups[name] = []
-                    line_groups[name].extend(feature["geometry"]["paths"])
-        
-        folder = kml.newfolder(name="Metro Lines")
-        
+                yield from feature_layer["featureSet"]["features"]
+
+    @classmethod
+    def line_color(cls, line_name: str) -> str:
+        """KML color of a metro line"""
+        return kml_color(cls.LINE_COLORS.get(str(line_name).strip(), cls.DEFAULT_LINE_COLOR))
+
+    def line_styles(self, line_names) -> StyleRegistry:
+        """One shared line style per metro line"""
+        styles = StyleRegistry()
+        for line_name in line_names:
+            styles.add("metro-line", line_name, Style(line_color=self.line_color(line_name), line_width=self.LINE_WIDTH))
+        return styles
+
+    def station_styles(self, station_names) -> StyleRegistry:
+        """One shared icon style per metro line; a station code starts with its line number (1A1, 2B2)"""
+        styles = StyleRegistry()
+        for name in station_names:
+            line_name = str(name)[:1]
+            styles.add("metro-station", line_name,
+                       Style(icon_href=self.STATION_ICON, icon_color=self.line_color(line_name), icon_scale=1.0))
+        return styles
+
+    @traced("build")
+    def lines_table(self, data: Dict[str, Any]) -> FeatureTable:
+        """One feature per line name holding all of its paths, reprojected in a single batch"""
+        line_groups: Dict[str, List[List[List[float]]]] = defaultdict(list)
+        for feature in self._layer_features(data, self.METRO_LINES_ID, "esriGeometryPolyline"):
+            line_groups[feature["attributes"].get("Name", "Unknown Line")].extend(feature["geometry"]["paths"])
+
+        builder = FeatureTableBuilder()
         for line_name, paths in line_groups.items():
-            multigeometry = folder.newmultigeometry(name=line_name)
-            multigeometry.description = f"Metro Line: {line_name}"
-            
-            for path in paths:
-                coords = [self.transformer.transform(x, y) for x, y in path]
-                multigeometry.newlinestring(coords=coords)
+            builder.add_paths(paths, {"Name": line_name})
+        return builder.build().reproject(self.reprojector)
+
+    @traced("build")
+    def stations_table(self, data: Dict[str, Any]) -> FeatureTable:
+        """Station points with their attributes, reprojected in a single batch"""
+        builder = FeatureTableBuilder()
+        for feature in self._layer_features(data, self.STATIONS_ID, "esriGeometryPoint"):
+            builder.add_point(feature["geometry"]["x"], feature["geometry"]["y"], feature["attributes"])
+        return builder.build().reproject(self.reprojector)
+
+    def convert_lines(self, data: Dict[str, Any]) -> Optional[str]:
+        """Convert metro lines to KML - grouped by line number"""
+        fingerprint = self._layer_fingerprint(data, self.METRO_LINES_ID)
+        if self.output_manager.is_current('metro', 'riyadh_metro_lines', fingerprint):
+            log.info("Metro lines unchanged, skipping export")
+            return self.output_manager.current_path('metro', 'riyadh_metro_lines')
+
+        table = self.lines_table(data)
+        styles = self.line_styles(table.column("Name"))
+        
+        def placemarks() -> Iterator[Placemark]:
+            for i, line_name in enumerate(table.column("Name")):
+                yield Placemark(
+                    name=line_name,
+                    geometry=table.geometry(i, multi=True),
+                    description=f"Metro Line: {line_name}",
+                    id=str(line_name),
+                    style_url=styles.url("metro-line", line_name)
+                )
         
-        return self.output_manager.save_kml(kml, 'metro', 'riyadh_metro_lines')
+        folders = [Folder(name="Metro Lines", placemarks=placemarks())]
+        return self.output_manager.save_features(folders, 'metro', 'riyadh_metro_lines', fingerprint, styles)
 
     def convert_stations(self, data: Dict[str, Any]) -> Optional[str]:
         """Convert metro stations to KML"""
-        kml = simplekml.Kml()
-        folder = kml.newfolder(name="Metro Stations")
+        fingerprint = self._layer_fingerprint(data, self.STATIONS_ID)
+        if self.output_manager.is_current('metro', 'riyadh_metro_stations', fingerprint):
+            log.info("Metro stations unchanged, skipping export")
+            return self.output_manager.current_path('metro', 'riyadh_metro_stations')
+
+        table = self.stations_table(data)
+        names = [name if name is not None else "Unknown Station" for name in table.column("Name")]
+        styles = self.station_styles(names)
         
-        # Find the stations layer
-        for layer in data.get("operationalLayers", []):
-            if layer.get("id") != self.STATIONS_ID:
-                continue
-                
-            for feature_layer in layer["featureCollection"].get("layers", []):
-                if feature_layer["featureSet"]["geometryType"] != "esriGeometryPoint":
-                    continue
-                
-                for feature in feature_layer["featureSet"]["features"]:
-                    x = feature["geometry"]["x"]
-                    y = feature["geometry"]["y"]
-                    lon, lat = self.transformer.transform(x, y)
-                    name = feature["attributes"].get("Name", "Unknown Station")
-                    
-                    pnt = folder.newpoint()
-                    pnt.name = name
-                    pnt.coords = [(lon, lat)]
-                    if feature["attributes"].get("Description"):
-                        pnt.description = feature["attributes"]["Description"]
+        def placemarks() -> Iterator[Placemark]:
+            descriptions = table.column("Description")
+            for i, name in enumerate(names):
+                yield Placemark(
+                    name=name,
+                    geometry=table.geometry(i),
+                    description=descriptions[i] or None,
+                    id=str(name),
+                    style_url=styles.url("metro-station", str(name)[:1])
+                )
         
-        return self.output_manager.save_kml(kml, 'metro', 'riyadh_metro_stations') 
\ No newline at end of file
+        folders = [Folder(name="Metro Stations", placemarks=placemarks())]
+        return self.output_manager.save_features(folders, 'metro', 'riyadh_metro_stations', fingerprint, styles)
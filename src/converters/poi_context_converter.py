@@ -0,0 +1,96 @@
+import logging
+from typing import Dict, Any, List, Optional, Tuple
+import numpy as np
+from .district_converter import DistrictConverter
+from .metro_converter import MetroConverter
+from .poi_converter import POIConverter
+from ..feature_table import FeatureTable
+from ..features import MultiGeometry
+from ..geometry import PointIndex, PolygonIndex
+
+log = logging.getLogger(__name__)
+
+class POIContextConverter(POIConverter):
+    """POIs tagged with the district containing them and their nearest metro station.
+
+    Districts and stations are indexed once (bounding-box prefiltered polygons,
+    grid-bucketed points) so tagging is vectorized over all POIs instead of
+    testing every POI against every district and station.
+    """
+
+    # Bump when the conversion logic changes so existing outputs are rebuilt
+    VERSION = 3
+    CONTEXT_FIELDS = ('district', 'district_ar', 'nearest_station', 'nearest_station_distance_m')
+
+    def __init__(self, output_manager, locales: Tuple[str, ...] = POIConverter.LOCALES):
+        super().__init__(output_manager, locales)
+        self.district_converter = DistrictConverter(output_manager)
+        self.metro_converter = MetroConverter(output_manager)
+
+    def _district_index(self, districts: FeatureTable) -> PolygonIndex:
+        polygons = []
+        for i in range(len(districts)):
+            geometry = districts.geometry(i)
+            parts = [] if geometry is None else (
+                geometry.geometries if isinstance(geometry, MultiGeometry) else [geometry])
+            polygons.append([(polygon.outer, polygon.inner) for polygon in parts])
+        return PolygonIndex(polygons)
+
+    def _annotate(self, pois: FeatureTable, districts: FeatureTable, stations: Optional[FeatureTable]):
+        """Add the context columns for every POI that has coordinates"""
+        lons, lats, located = pois.point_coords()
+        located_index = np.flatnonzero(located)
+        lons, lats = lons[located_index], lats[located_index]
+
+        if len(districts):
+            names_en, names_ar = districts.column('name_en'), districts.column('name_ar')
+            district_en, district_ar = [None] * len(pois), [None] * len(pois)
+            for i, index in zip(located_index.tolist(), self._district_index(districts).locate(lons, lats).tolist()):
+                if index >= 0:
+                    district_en[i], district_ar[i] = names_en[index], names_ar[index]
+            pois.set_column('district', district_en)
+            pois.set_column('district_ar', district_ar)
+
+        if stations is not None and len(stations):
+            station_lons, station_lats, _ = stations.point_coords()
+            names = stations.column('Name')
+            nearest, distance_m = [None] * len(pois), [None] * len(pois)
+            indices, distances = PointIndex(station_lons, station_lats).nearest_many(lons, lats)
+            for i, index, distance in zip(located_index.tolist(), indices.tolist(), distances.tolist()):
+                if index >= 0:
+                    nearest[i] = names[index] if names[index] is not None else "Unknown Station"
+                    distance_m[i] = round(distance)
+            pois.set_column('nearest_station', nearest)
+            pois.set_column('nearest_station_distance_m', distance_m)
+
+        tagged = sum(1 for name in pois.column('district') if name is not None)
+        log.info("  Context: %d/%d POIs inside a district", tagged, len(located_index))
+
+    def _build_extended_data(self, poi: Dict[str, Any]) -> Dict[str, str]:
+        extdata = super()._build_extended_data(poi)
+        for field in self.CONTEXT_FIELDS:
+            if poi.get(field) is not None:
+                extdata[field] = self._sanitize_text(str(poi[field]))
+        return extdata
+
+    def convert(self, pois_tuple: Tuple[List[Dict[str, Any]], ...], districts_data: List[Dict[str, Any]],
+                metro_data: Optional[Dict[str, Any]]):
+        """Convert POIs to KML grouped by category, with district and nearest-station context"""
+        pois_by_locale = dict(zip(self.locales, pois_tuple))
+        districts = self.district_converter.select_districts(districts_data or [])
+
+        fingerprint = self.output_manager.fingerprint([
+            pois_by_locale, list(self.locales), districts,
+            self.metro_converter._layer_fingerprint(metro_data or {}, self.metro_converter.STATIONS_ID)
+        ], self.VERSION)
+        if self.output_manager.is_current('pois', 'riyadh_city_pois_with_context', fingerprint):
+            log.info("POI context unchanged, skipping export")
+            return self.output_manager.current_path('pois', 'riyadh_city_pois_with_context')
+
+        table, _ = self._merge_pois(pois_by_locale)
+        stations = self.metro_converter.stations_table(metro_data) if metro_data else None
+        self._annotate(table, self.district_converter.to_table(districts), stations)
+
+        styles = self.category_styles(table)
+        return self.output_manager.save_features(self._category_folders(table, styles),
+                                                 'pois', 'riyadh_city_pois_with_context', fingerprint, styles)
@@ -1,218 +1,284 @@
+import asyncio
 import json
-import simplekml
+import logging
 from collections import defaultdict, Counter
-from typing import Dict, Any, List, Tuple
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+from ..cities import City, RIYADH
+from ..feature_table import FeatureTable, FeatureTableBuilder
+from ..features import Folder, Placemark
+from ..instrumentation import traced
+from ..styles import Style, StyleRegistry, kml_color, palette_color
+
+log = logging.getLogger(__name__)
+
+class MergeReport:
+    """Structured result of merging POI locales, written as JSON instead of printed"""
+
+    def __init__(self, primary: str, locales: Tuple[str, ...]):
+        self.primary = primary
+        self.locales = locales
+        self.totals: Dict[str, int] = {}
+        self.missing_slug: Counter = Counter()
+        self.unmatched: Dict[str, List[str]] = defaultdict(list)
+        self.field_differences: Dict[str, Counter] = defaultdict(Counter)
+        self.different_ids: Dict[str, set] = defaultdict(set)
+        self.merged = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        secondary = [locale for locale in self.locales if locale != self.primary]
+        return {
+            'primary_locale': self.primary,
+            'totals': self.totals,
+            'merged': self.merged,
+            'missing_slug': dict(self.missing_slug),
+            'unmatched': {locale: len(self.unmatched[locale]) for locale in secondary},
+            'unmatched_ids': {locale: self.unmatched[locale] for locale in secondary},
+            'pois_with_differences': {locale: len(self.different_ids[locale]) for locale in secondary},
+            'field_differences': {locale: dict(self.field_differences[locale].most_common()) for locale in secondary},
+            'different_ids': {locale: sorted(self.different_ids[locale]) for locale in secondary},
+        }
+
+    def summary(self) -> str:
+        parts = [f"{self.merged} POIs merged"]
+        for locale in self.locales:
+            if locale == self.primary:
+                continue
+            parts.append(f"{locale}: {len(self.unmatched[locale])} unmatched, "
+                         f"{len(self.different_ids[locale])} with field differences")
+        if self.missing_slug:
+            parts.append(f"missing slugPOI: {dict(self.missing_slug)}")
+        return " | ".join(parts)
+
 
 class POIConverter:
-    def __init__(self, output_manager):
+    # Bump when the conversion logic changes so existing outputs are rebuilt
+    VERSION = 4
+
+    # The first locale is the base record; the others are joined onto it by slugPOI
+    LOCALES = ('en', 'ar')
+    SOURCE_URL = ("https://map.visitsaudi.com/api/pointsOfInterest?cities={city}&regions={region}"
+                  "&locale={locale}&type=city,experiences&categories=")
+    CATEGORY_ICON = "https://maps.google.com/mapfiles/kml/shapes/placemark_circle.png"
+
+    # Fields merged explicitly, so they are not reported as locale differences
+    MERGED_FIELDS = frozenset(['name', 'description', 'address', 'businessHours', 'id', 'createdAt',
+                               'latitude', 'longitude', 'website', 'bannerImage', 'e60Image'])
+    IMAGE_FIELDS = ('bannerImage', 'e60Image')
+
+    def __init__(self, output_manager, locales: Tuple[str, ...] = LOCALES, city: City = RIYADH):
         self.output_manager = output_manager
-        self.en_source_url = "https://map.visitsaudi.com/api/pointsOfInterest?cities=RUH&regions=RUH&locale=en&type=city,experiences&categories="
-        self.ar_source_url = "https://map.visitsaudi.com/api/pointsOfInterest?cities=RUH&regions=RUH&locale=ar&type=city,experiences&categories="
-
-    async def fetch_pois(self, data_manager) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
-        """Fetch POI data from Visit Saudi API in both English and Arabic"""
-        en_data = await data_manager.fetch_url(self.en_source_url)
-        ar_data = await data_manager.fetch_url(self.ar_source_url)
-        return en_data, ar_data
-
-    def _merge_pois(self, en_pois: List[Dict[str, Any]], ar_pois: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        """Merge English and Arabic POI data"""
-        merged_pois = []
-        
-        # Create map of Arabic POIs using slugPOI
-        ar_poi_map = {}
-        for poi in ar_pois:
-            if 'slugPOI' not in poi:
-                print(f"Warning: Arabic POI missing slugPOI: {poi.get('name', 'NO_NAME')}")
-            else:
-                ar_poi_map[poi['slugPOI']] = poi
-        
-        if len(ar_poi_map) != len(ar_pois):
-            print(f"\nTotal Arabic POIs skipped due to missing slugPOI: {len(ar_pois) - len(ar_poi_map)}")
-        
-        differences_count = 0
-        different_ids = []
+        self.locales = tuple(locales)
+        self.city = city
+        self.source_urls = {
+            locale: self.SOURCE_URL.format(city=city.poi_city, region=city.poi_region, locale=locale)
+            for locale in self.locales
+        }
 
-        for en_poi in en_pois:
-            if 'slugPOI' not in en_poi:
-                print(f"Warning: English POI missing slugPOI: {en_poi.get('name', 'NO_NAME')}")
-                continue
-                
-            slug_poi = en_poi['slugPOI']
-            ar_poi = ar_poi_map.get(slug_poi)
-            
-            if not ar_poi:
-                print(f"Warning: No Arabic data found for POI {slug_poi}")
-                merged_pois.append(en_poi)
-                continue
+    async def fetch_pois(self, data_manager) -> Tuple[List[Dict[str, Any]], ...]:
+        """Fetch POI data from Visit Saudi API in every configured locale concurrently"""
+        return tuple(await asyncio.gather(
+            *(data_manager.fetch_url(self.source_urls[locale]) for locale in self.locales)
+        ))
 
-            # Create merged POI starting with English data
-            merged_poi = en_poi.copy()
-            
-            # Add Arabic name, description and address
-            merged_poi['name_ar'] = ar_poi['name']
-            merged_poi['description_ar'] = ar_poi['description']
-            if ar_poi.get('address'):
-                merged_poi['address_ar'] = ar_poi['address']
-
-            # Handle IDs
-            if 'id' in ar_poi:
-                merged_poi['id_ar'] = ar_poi['id']
-
-            # Handle coordinates if they differ
-            if ar_poi.get('latitude') != en_poi.get('latitude'):
-                merged_poi['latitude_ar'] = ar_poi.get('latitude')
-            if ar_poi.get('longitude') != en_poi.get('longitude'):
-                merged_poi['longitude_ar'] = ar_poi.get('longitude')
-
-            # Handle website if it differs
-            if ar_poi.get('website') != en_poi.get('website') and ar_poi.get('website'):
-                merged_poi['website_ar'] = ar_poi['website']
-
-            # Combine images if they differ
-            if ar_poi.get('bannerImage') != en_poi.get('bannerImage'):
-                merged_poi['bannerImage'] = list(set(en_poi.get('bannerImage', []) + ar_poi.get('bannerImage', [])))
-            if ar_poi.get('e60Image') != en_poi.get('e60Image'):
-                merged_poi['e60Image'] = list(set(en_poi.get('e60Image', []) + ar_poi.get('e60Image', [])))
-
-            # Handle createdAt dates
-            if 'createdAt' in ar_poi and 'createdAt' in en_poi:
-                ar_date = ar_poi.get('createdAt')
-                en_date = en_poi.get('createdAt')
-                if ar_date and en_date:
-                    merged_poi['createdAt'] = min(ar_date, en_date)
+    @traced("merge")
+    def _merge_pois(self, pois_by_locale: Dict[str, List[Dict[str, Any]]]) -> Tuple[FeatureTable, MergeReport]:
+        """
+        Join every secondary locale onto the primary one by slugPOI in a single
+        pass. Localized name/description/address/id are added as `<field>_<locale>`;
+        coordinates and website only when they differ; image lists are unioned
+        in order and createdAt keeps the earliest value. Records go straight
+        into a FeatureTable: the base record and its merged fields are written
+        as columns, never copied.
+        """
+        primary, *secondary = self.locales
+        report = MergeReport(primary, self.locales)
+        report.totals = {locale: len(pois_by_locale.get(locale) or []) for locale in self.locales}
+
+        # Index every secondary locale by slugPOI
+        indexes = {}
+        for locale in secondary:
+            index = {}
+            for poi in pois_by_locale.get(locale) or []:
+                slug = poi.get('slugPOI')
+                if slug is None:
+                    report.missing_slug[locale] += 1
                 else:
-                    merged_poi['createdAt'] = ar_date or en_date
-
-            # Check for differences in other fields (excluding handled fields)
-            for key, en_value in en_poi.items():
-                if key not in ['name', 'description', 'address', 'businessHours', 'id', 'createdAt',
-                             'latitude', 'longitude', 'website', 'bannerImage', 'e60Image']:
-                    ar_value = ar_poi.get(key)
-                    if en_value != ar_value:
-                        if differences_count == 0:
-                            print("\nDifferences found between English and Arabic data:")
-                        differences_count += 1
-                        if slug_poi not in different_ids:
-                            different_ids.append(slug_poi)
-                        print(f"POI {slug_poi}: Field '{key}' differs:")
-                        print(f"  EN: {en_value}")
-                        print(f"  AR: {ar_value}")
-
-            merged_pois.append(merged_poi)
-
-        print(f"\nTotal POIs with differences (excluding name/description/address/businessHours): {differences_count}")
-        if different_ids:
-            print(f"IDs with differences: {', '.join(different_ids)}")
-
-        return merged_pois
+                    index[slug] = poi
+            indexes[locale] = index
+
+        builder = FeatureTableBuilder()
+        for base_poi in pois_by_locale.get(primary) or []:
+            slug_poi = base_poi.get('slugPOI')
+            if slug_poi is None:
+                report.missing_slug[primary] += 1
+                continue
+
+            merged = {}
+            for locale in secondary:
+                other = indexes[locale].get(slug_poi)
+                if other is None:
+                    report.unmatched[locale].append(slug_poi)
+                    continue
+                self._merge_locale(merged, base_poi, other, locale, report)
+
+            # POIs without coordinates stay in the table (and the report) without geometry
+            lon, lat = base_poi.get('longitude'), base_poi.get('latitude')
+            builder.add_point(lon or None, lat or None, base_poi, merged)
+
+        report.merged = len(builder)
+        return builder.build(), report
+
+    def _merge_locale(self, merged: Dict[str, Any], base_poi: Dict[str, Any], other: Dict[str, Any],
+                      locale: str, report: MergeReport):
+        """Merge one secondary-locale record into `merged`, the fields overriding or extending base_poi"""
+        current = lambda field: merged[field] if field in merged else base_poi.get(field)
+
+        merged[f'name_{locale}'] = other.get('name')
+        merged[f'description_{locale}'] = other.get('description')
+        if other.get('address'):
+            merged[f'address_{locale}'] = other['address']
+        if 'id' in other:
+            merged[f'id_{locale}'] = other['id']
+
+        # Coordinates and website only when they differ
+        for field in ('latitude', 'longitude'):
+            if other.get(field) != base_poi.get(field):
+                merged[f'{field}_{locale}'] = other.get(field)
+        if other.get('website') and other.get('website') != base_poi.get('website'):
+            merged[f'website_{locale}'] = other['website']
+
+        # Union image lists, keeping first-seen order so output is deterministic
+        for field in self.IMAGE_FIELDS:
+            if other.get(field) != current(field):
+                merged[field] = list(dict.fromkeys((current(field) or []) + (other.get(field) or [])))
+
+        # Keep the earliest createdAt
+        if 'createdAt' in other and ('createdAt' in merged or 'createdAt' in base_poi):
+            dates = [d for d in (current('createdAt'), other['createdAt']) if d]
+            merged['createdAt'] = min(dates) if dates else (other['createdAt'] or current('createdAt'))
+
+        # Tally remaining differences per field
+        for key, value in base_poi.items():
+            if key not in self.MERGED_FIELDS and value != other.get(key):
+                report.field_differences[locale][key] += 1
+                report.different_ids[locale].add(base_poi['slugPOI'])
 
     def _sanitize_text(self, text: str) -> str:
-        """Sanitize text for XML/KML output"""
+        """Normalize text for KML output (XML escaping is done by the KML writer)"""
         if not text:
             return ""
-        # Replace problematic characters
-        return (str(text)
-                .replace('&', '&amp;')
-                .replace('<', '&lt;')
-                .replace('>', '&gt;')
-                .replace('"', '&quot;')
-                .replace("'", '&apos;')
-                .strip())
-
-    def convert(self, pois_tuple: Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]):
-        en_pois, ar_pois = pois_tuple
-        merged_pois = self._merge_pois(en_pois, ar_pois)
+        return str(text).strip()
+
+    def _build_description(self, poi: Dict[str, Any]) -> str:
+        description_parts = []
+        if poi.get('description'):
+            description_parts.append(poi['description'])
+        if poi.get('businessHours'):
+            description_parts.append(f"Hours: {poi['businessHours']}")
+        if poi.get('website'):
+            description_parts.append(f"Website: {poi['website']}")
+        return "\n\n".join(description_parts)
+
+    def _build_extended_data(self, poi: Dict[str, Any]) -> Dict[str, str]:
+        extdata = {}
         
-        kml = simplekml.Kml()
+        secondary = self.locales[1:]
+        localized = lambda field: [f"{field}_{locale}" for locale in secondary]
         
-        # Group POIs by category
-        grouped_pois = defaultdict(list)
-        for poi in merged_pois:
-            category = poi.get('slugCategoryPOI', 'Uncategorized')
-            grouped_pois[category].append(poi)
+        # Add regular fields, with localized variants for every secondary locale
+        fields = [
+            "slugGovernorate", "website", *localized("website"),
+            "slugPOI", "slugCity", "poiType", "slugCategoryPOI",
+            "active", "external", "featured", "slugRegion", "businessHours",
+            "rating", "publishedAt", "createdAt", "lastUpdatedAt", "videos",
+            *[f for locale in secondary for f in (f"name_{locale}", f"description_{locale}")],
+            "address", *localized("address"),
+            *[f for locale in secondary for f in (f"latitude_{locale}", f"longitude_{locale}")]
+        ]
         
-        if not grouped_pois:
-            print("No POIs to convert")
-            return self.output_manager.save_kml(kml, 'pois', 'riyadh_city_pois_by_category')
-            
-        # Create folders for each category
-        for category, category_pois in grouped_pois.items():
-            folder = kml.newfolder(name=category)
-            poi_count = 0
-            skipped_count = 0
+        # Add IDs if they exist
+        for id_field in ['id', *localized('id')]:
+            if id_field in poi:
+                extdata[id_field] = self._sanitize_text(str(poi[id_field]))
+        
+        for field in fields:
+            value = poi.get(field)
+            if value is not None:  # Include empty strings but exclude None
+                extdata[field] = self._sanitize_text(str(value))
+        
+        # Add image arrays as JSON strings
+        if poi.get('bannerImage'):
+            extdata['bannerImages'] = json.dumps(poi['bannerImage'])
+        if poi.get('e60Image'):
+            extdata['e60Images'] = json.dumps(poi['e60Image'])
+        
+        return extdata
+
+    def _iter_placemarks(self, table: FeatureTable, indices: List[int],
+                         style_url: Optional[str] = None) -> Iterator[Placemark]:
+        """Yield placemarks for one category, skipping POIs without coordinates"""
+        poi_count = 0
+        skipped_count = 0
+        
+        for i in indices:
+            geometry = table.geometry(i)
+            # Skip POIs without coordinates
+            if geometry is None:
+                skipped_count += 1
+                continue
             
-            for poi in category_pois:
-                # Skip POIs without coordinates
-                if not poi.get('latitude') or not poi.get('longitude'):
-                    skipped_count += 1
-                    continue
-                
-                # Create placemark
-                pnt = folder.newpoint(name=poi['name'])
-                pnt.coords = [(poi['longitude'], poi['latitude'])]
-                
-                # Build description
-                description_parts = []
-                if poi.get('description'):
-                    description_parts.append(poi['description'])
-                if poi.get('businessHours'):
-                    description_parts.append(f"Hours: {poi['businessHours']}")
-                if poi.get('website'):
-                    description_parts.append(f"Website: {poi['website']}")
-                    
-                pnt.description = "\n\n".join(description_parts)
-                
-                # Create ExtendedData element
-                extdata = pnt.extendeddata
-                
-                # Add regular fields
-                fields = [
-                    "slugGovernorate", "website", "website_ar",
-                    "slugPOI", "slugCity", "poiType", "slugCategoryPOI",
-                    "active", "external", "featured", "slugRegion", "businessHours",
-                    "rating", "publishedAt", "createdAt", "lastUpdatedAt", "videos",
-                    "name_ar", "description_ar", "address", "address_ar",
-                    "latitude_ar", "longitude_ar"  # Add Arabic coordinates
-                ]
-                
-                # Add IDs if they exist
-                if 'id' in poi:
-                    extdata.newdata(
-                        name='id',
-                        value=self._sanitize_text(str(poi['id']))
-                    )
-                if 'id_ar' in poi:
-                    extdata.newdata(
-                        name='id_ar',
-                        value=self._sanitize_text(str(poi['id_ar']))
-                    )
-                
-                for field in fields:
-                    value = poi.get(field)
-                    if value is not None:  # Include empty strings but exclude None
-                        extdata.newdata(
-                            name=field,
-                            value=self._sanitize_text(str(value))
-                        )
-                
-                # Add image arrays as JSON strings
-                if poi.get('bannerImage'):
-                    extdata.newdata(
-                        name='bannerImages',
-                        value=json.dumps(poi['bannerImage'])
-                    )
-                
-                if poi.get('e60Image'):
-                    extdata.newdata(
-                        name='e60Images',
-                        value=json.dumps(poi['e60Image'])
-                    )
-                
-                poi_count += 1
+            poi = table.row(i)
+            yield Placemark(
+                name=poi.get('name'),
+                geometry=geometry,
+                description=self._build_description(poi),
+                extended_data=self._build_extended_data(poi),
+                id=poi.get('slugPOI'),
+                style_url=style_url
+            )
+            poi_count += 1
+        
+        log.info("  Processed: %d", poi_count)
+        if skipped_count:
+            log.info("  Skipped (no coordinates): %d", skipped_count)
+
+    def category_styles(self, table: FeatureTable) -> StyleRegistry:
+        """One shared icon style per slugCategoryPOI, colored in sorted category order"""
+        styles = StyleRegistry()
+        categories = sorted(table.group_by('slugCategoryPOI', 'Uncategorized'), key=str)
+        for i, category in enumerate(categories):
+            styles.add("poi", category, Style(icon_href=self.CATEGORY_ICON,
+                                              icon_color=kml_color(palette_color(i)), icon_scale=1.0))
+        return styles
+
+    def _category_folders(self, table: FeatureTable, styles: Optional[StyleRegistry] = None) -> Iterator[Folder]:
+        """One folder of placemarks per slugCategoryPOI"""
+        grouped_pois = table.group_by('slugCategoryPOI', 'Uncategorized')
+        
+        if not grouped_pois:
+            log.warning("No POIs to convert")
             
-            print(f"  Processed: {poi_count}")
-            if skipped_count:
-                print(f"  Skipped (no coordinates): {skipped_count}")
+        return (
+            Folder(name=category, placemarks=self._iter_placemarks(
+                table, indices, styles.url("poi", category) if styles is not None else None))
+            for category, indices in grouped_pois.items()
+        )
 
-        return self.output_manager.save_kml(kml, 'pois', 'riyadh_city_pois_by_category') 
\ No newline at end of file
+    def convert(self, pois_tuple: Tuple[List[Dict[str, Any]], ...]):
+        """Convert POI lists (one per locale, in self.locales order) to KML grouped by category"""
+        pois_by_locale = dict(zip(self.locales, pois_tuple))
+
+        fingerprint = self.output_manager.fingerprint([pois_by_locale, list(self.locales)], self.VERSION)
+        output_name = f"{self.city.slug}_city_pois_by_category"
+        if self.output_manager.is_current('pois', output_name, fingerprint):
+            log.info("%s POIs unchanged, skipping export", self.city.name)
+            return self.output_manager.current_path('pois', output_name)
+
+        table, report = self._merge_pois(pois_by_locale)
+        log.info("Merge: %s", report.summary())
+        report_path = self.output_manager.save_json(report.to_dict(), 'pois', f"{self.city.slug}_city_pois_merge_report")
+        log.info("Merge report saved to: %s", report_path)
+        
+        styles = self.category_styles(table)
+        return self.output_manager.save_features(self._category_folders(table, styles),
+                                                 'pois', output_name, fingerprint, styles)
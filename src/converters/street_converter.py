@@ -0,0 +1,54 @@
+import logging
+from typing import Any, Dict, Optional
+from ..features import LineString, MultiGeometry, Placemark
+
+log = logging.getLogger(__name__)
+
+
+class StreetConverter:
+    def __init__(self, output_manager):
+        self.output_manager = output_manager
+
+    def _to_placemark(self, feature: Dict[str, Any], display_field: Optional[str]) -> Optional[Placemark]:
+        """Convert an Esri polyline feature (already in EPSG:4326) to a placemark"""
+        paths = (feature.get("geometry") or {}).get("paths")
+        if not paths:
+            return None
+
+        attributes = feature.get("attributes", {})
+        name = attributes.get(display_field) if display_field else None
+        if name is None:
+            name = f"OBJECTID {attributes.get('OBJECTID', '')}".strip()
+
+        return Placemark(
+            name=str(name),
+            geometry=MultiGeometry(geometries=[LineString(coords=path) for path in paths]),
+            extended_data={k: v for k, v in attributes.items() if v is not None}
+        )
+
+    async def convert(self, query) -> Optional[str]:
+        """Stream every polyline layer of a street service into one output, one folder per layer"""
+        service_info = await query.get_service_info()
+        layers = [l for l in service_info.get("layers", []) if l.get("geometryType") == "esriGeometryPolyline"]
+        if not layers:
+            log.warning("No polyline layers found in street service")
+            return None
+
+        with self.output_manager.open_writers('streets', 'riyadh_streets') as writer:
+            for layer in layers:
+                visibility = "Visible" if layer.get("defaultVisibility") else "Hidden"
+                writer.start_folder(layer["name"].strip(), f"Layer ID: {layer['id']}, Visibility: {visibility}")
+
+                layer_info = await query.get_layer_info(layer["id"])
+                display_field = layer_info.get("displayField")
+                count = 0
+                async for feature in query.iter_features(layer["id"]):
+                    placemark = self._to_placemark(feature, display_field)
+                    if placemark:
+                        writer.write_placemark(placemark)
+                        count += 1
+
+                writer.end_folder()
+                log.info("  Layer %s: %d features", layer['id'], count)
+
+        return writer.path
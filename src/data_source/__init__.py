@@ -1,4 +1,7 @@
 from .arcgis_resolver import ArcGISResolver
 from .data_source_manager import DataSourceManager
+from .feature_query import FeatureLayerQuery
+from .scheduler import CircuitBreaker, CircuitOpenError, RequestScheduler, TokenBucket
 
-__all__ = ['ArcGISResolver', 'DataSourceManager'] 
\ No newline at end of file
+__all__ = ['ArcGISResolver', 'CircuitBreaker', 'CircuitOpenError', 'DataSourceManager', 'FeatureLayerQuery',
+           'RequestScheduler', 'TokenBucket']
\ No newline at end of file
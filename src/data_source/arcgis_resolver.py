@@ -1,11 +1,26 @@
 import json
+import logging
+from contextlib import asynccontextmanager
 from typing import Optional
 import aiohttp
 from urllib.parse import urlparse, parse_qs
+from .feature_query import FeatureLayerQuery
+
+log = logging.getLogger(__name__)
 
 class ArcGISResolver:
-    def __init__(self):
+    def __init__(self, data_manager=None):
         self.base_url = "https://www.arcgis.com/sharing/rest/content/items"
+        self.data_manager = data_manager
+
+    @asynccontextmanager
+    async def _session(self):
+        """Use the data manager's pooled session, or a one-off session without one"""
+        if self.data_manager is not None:
+            yield self.data_manager.session
+        else:
+            async with aiohttp.ClientSession() as session:
+                yield session
     
     async def get_webmap_data(self, viewer_url: str) -> Optional[dict]:
         """
@@ -15,26 +30,36 @@ class ArcGISResolver:
         3. Fetch actual webmap data
         """
         try:
-            print(f"\nResolving webmap from viewer URL: {viewer_url}")
+            log.info("Resolving webmap from viewer URL: %s", viewer_url)
             
             app_id = self._extract_app_id(viewer_url)
-            print(f"Extracted app_id: {app_id}")
+            log.debug("Extracted app_id: %s", app_id)
             if not app_id:
                 raise ValueError("No appid found in viewer URL")
             
-            print(f"\nFetching metadata for app_id: {app_id}")
+            log.debug("Fetching metadata for app_id: %s", app_id)
             webmap_id = await self._get_webmap_id(app_id)
-            print(f"Retrieved webmap_id: {webmap_id}")
+            log.debug("Retrieved webmap_id: %s", webmap_id)
             if not webmap_id:
                 raise ValueError(f"No webmap id found for app {app_id}")
             
-            print(f"\nFetching webmap data for id: {webmap_id}")
+            log.info("Fetching webmap data for id: %s", webmap_id)
             return await self._fetch_webmap_data(webmap_id)
             
         except Exception as e:
-            print(f"Error resolving webmap data: {e}")
+            log.error("Error resolving webmap data: %s", e)
             return None
 
+    def feature_query(self, service_url: str, concurrency: int = 4) -> FeatureLayerQuery:
+        """
+        Query engine for FeatureServer/MapServer layers that have no inline
+        featureCollection (e.g. the Riyadh street layers)
+        """
+        if self.data_manager is None:
+            return FeatureLayerQuery(service_url, concurrency=concurrency)
+        return FeatureLayerQuery(service_url, concurrency=concurrency, session=self.data_manager.session,
+                                 scheduler=self.data_manager.scheduler)
+
     def _extract_app_id(self, url: str) -> Optional[str]:
         """Extract appid from ArcGIS viewer URL"""
         try:
@@ -42,47 +67,45 @@ class ArcGISResolver:
             params = parse_qs(parsed.query)
             return params.get('appid', [None])[0]
         except Exception as e:
-            print(f"Error extracting appid: {e}")
+            log.error("Error extracting appid: %s", e)
             return None
 
+    async def _get_json(self, url: str, params: dict) -> dict:
+        """GET JSON through the data manager's cache, or a one-off session without one"""
+        if self.data_manager is not None:
+            return await self.data_manager.fetch_json(url, params)
+        async with self._session() as session:
+            async with session.get(url, params=params) as response:
+                response.raise_for_status()
+                return await response.json()
+
     async def _get_webmap_id(self, app_id: str) -> Optional[str]:
         """Get webmap id from application metadata"""
-        async with aiohttp.ClientSession() as session:
-            url = f"{self.base_url}/{app_id}/data"
-            params = {'f': 'json'}
-            
-            try:
-                print(f"Requesting URL: {url}")
-                async with session.get(url, params=params) as response:
-                    print(f"Response status: {response.status}")
-                    if response.status == 200:
-                        data = await response.json()
-                        print(f"Response data: {json.dumps(data, indent=2)}")
-                        # Look for webmap ID in values.webmap
-                        webmap_id = data.get('values', {}).get('webmap')
-                        if webmap_id:
-                            print(f"Found webmap ID in values.webmap: {webmap_id}")
-                        return webmap_id
-                    else:
-                        print(f"Error fetching app metadata: {response.status}")
-                        return None
-            except Exception as e:
-                print(f"Error in webmap id request: {e}")
-                return None
+        url = f"{self.base_url}/{app_id}/data"
+        params = {'f': 'json'}
+        
+        try:
+            log.debug("Requesting URL: %s", url)
+            data = await self._get_json(url, params)
+            if log.isEnabledFor(logging.DEBUG):
+                # Pretty-printing the whole response is only worth it when it is shown
+                log.debug("Response data: %s", json.dumps(data, indent=2))
+            # Look for webmap ID in values.webmap
+            webmap_id = data.get('values', {}).get('webmap')
+            if webmap_id:
+                log.debug("Found webmap ID in values.webmap: %s", webmap_id)
+            return webmap_id
+        except Exception as e:
+            log.error("Error in webmap id request: %s", e)
+            return None
 
     async def _fetch_webmap_data(self, webmap_id: str) -> Optional[dict]:
         """Fetch the actual webmap data"""
-        async with aiohttp.ClientSession() as session:
-            url = f"{self.base_url}/{webmap_id}/data"
-            params = {'f': 'json'}
-            
-            try:
-                async with session.get(url, params=params) as response:
-                    if response.status == 200:
-                        return await response.json()
-                    else:
-                        print(f"Error fetching webmap data: {response.status}")
-                        return None
-            except Exception as e:
-                print(f"Error in webmap data request: {e}")
-                return None 
\ No newline at end of file
+        url = f"{self.base_url}/{webmap_id}/data"
+        params = {'f': 'json'}
+        
+        try:
+            return await self._get_json(url, params)
+        except Exception as e:
+            log.error("Error in webmap data request: %s", e)
+            return None
@@ -1,56 +1,281 @@
 import aiohttp
+import asyncio
 import json
-from typing import Dict, Any, List
+import logging
+import time
+from typing import Dict, Any, AsyncIterator, List, Optional
+from .http_cache import HTTPCache
+from .json_stream import iter_json_array
+from .scheduler import RequestScheduler
+from ..instrumentation import count, span
+
+log = logging.getLogger(__name__)
+
+try:
+    import brotli  # noqa: F401  (enables aiohttp's br decoding)
+    ACCEPT_ENCODING = "gzip, deflate, br"
+except ImportError:
+    ACCEPT_ENCODING = "gzip, deflate"
 
 class DataSourceManager:
+    """Owns one pooled aiohttp session shared by the resolver and all converters.
+
+    Use as an async context manager so the pool is closed when the run ends:
+
+        async with DataSourceManager(settings) as data_manager:
+            ...
+    """
+
     def __init__(self, settings):
         self.settings = settings
+        self._session: Optional[aiohttp.ClientSession] = None
+        self.cache = HTTPCache(settings.CACHE_DIR, settings.CACHE_TTL) if settings.CACHE_ENABLED else None
+        # Revalidate every cached response instead of serving entries younger than CACHE_TTL (watch mode)
+        self.revalidate = False
+        # One lock per cache key, so concurrent requests for a URL download it once
+        self._key_locks: Dict[str, asyncio.Lock] = {}
+        self.stats = {
+            "requests": 0, "connections_opened": 0, "connections_reused": 0,
+            "cache_hits": 0, "cache_revalidated": 0, "cache_misses": 0,
+            "records_scanned": 0, "records_decoded": 0,
+        }
+        self.scheduler = RequestScheduler(settings, self.stats)
+
+    async def __aenter__(self):
+        self._open_session()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    def _trace_config(self) -> aiohttp.TraceConfig:
+        trace_config = aiohttp.TraceConfig()
+
+        async def on_request_start(session, ctx, params):
+            self.stats["requests"] += 1
+
+        async def on_connection_create_end(session, ctx, params):
+            self.stats["connections_opened"] += 1
+
+        async def on_connection_reuseconn(session, ctx, params):
+            self.stats["connections_reused"] += 1
+
+        trace_config.on_request_start.append(on_request_start)
+        trace_config.on_connection_create_end.append(on_connection_create_end)
+        trace_config.on_connection_reuseconn.append(on_connection_reuseconn)
+        return trace_config
+
+    def _open_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.settings.HTTP_MAX_CONNECTIONS,
+                limit_per_host=self.settings.HTTP_MAX_CONNECTIONS_PER_HOST,
+                ttl_dns_cache=self.settings.HTTP_DNS_CACHE_TTL,
+            )
+            timeout = aiohttp.ClientTimeout(
+                total=self.settings.HTTP_TIMEOUT,
+                connect=self.settings.HTTP_CONNECT_TIMEOUT,
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=timeout,
+                headers={"Accept-Encoding": ACCEPT_ENCODING},
+                trace_configs=[self._trace_config()],
+            )
+        return self._session
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        """The shared session, opened on first use"""
+        return self._open_session()
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    def connection_summary(self) -> str:
+        summary = (f"HTTP requests: {self.stats['requests']}, "
+                   f"connections opened: {self.stats['connections_opened']}, "
+                   f"reused: {self.stats['connections_reused']}")
+        if self.cache is not None:
+            summary += (f" | cache hits: {self.stats['cache_hits']}, "
+                        f"revalidated: {self.stats['cache_revalidated']}, "
+                        f"misses: {self.stats['cache_misses']}")
+        summary += (f" | retries: {self.stats['retries']} "
+                    f"(Retry-After: {self.stats['retry_after_waits']}, gave up: {self.stats['gave_up']}), "
+                    f"throttle waits: {self.stats['throttle_waits']} "
+                    f"({self.stats['throttle_wait_seconds']:.2f}s), "
+                    f"circuit rejections: {self.stats['circuit_rejections']}")
+        return summary
+
+    def _key_lock(self, key: str) -> asyncio.Lock:
+        if key not in self._key_locks:
+            self._key_locks[key] = asyncio.Lock()
+        return self._key_locks[key]
+
+    def _serve_fresh(self, entry, requested_at: float) -> bool:
+        if entry.stored_at >= requested_at:
+            # Stored or revalidated by a concurrent request for the same key while this one waited
+            return True
+        return not self.revalidate and self.cache.is_fresh(entry)
+
+    async def fetch_bytes(self, url: str, params: Optional[Dict[str, Any]] = None) -> bytes:
+        """
+        GET a URL through the on-disk cache:
+        1. Serve fresh entries (younger than CACHE_TTL) without touching the network,
+           unless `revalidate` is set
+        2. In OFFLINE mode serve any cached entry, or fail if there is none
+        3. Otherwise revalidate with If-None-Match/If-Modified-Since and reuse the body on 304
+        4. Network attempts (including reading the body) are retried by the request scheduler
+        Requests for the same key wait for each other and reuse the entry the first one stored.
+        """
+        if self.cache is None:
+            async def attempt():
+                async with self.session.get(url, params=params) as response:
+                    response.raise_for_status()
+                    return await response.read()
+            with span("fetch", url=url):
+                body = await self.scheduler.call(url, attempt)
+            count("bytes_fetched", len(body))
+            return body
+
+        key = self.cache.key(url, params)
+        requested_at = time.time()
+        async with self._key_lock(key):
+            entry = self.cache.get(key)
+
+            if entry is not None and (self.settings.OFFLINE or self._serve_fresh(entry, requested_at)):
+                self.stats["cache_hits"] += 1
+                return entry.body
+            if self.settings.OFFLINE:
+                raise LookupError(f"Offline mode: no cached response for {url}")
+
+            headers = entry.conditional_headers() if entry is not None else {}
+
+            async def attempt():
+                async with self.session.get(url, params=params, headers=headers) as response:
+                    if response.status == 304 and entry is not None:
+                        return None
+                    response.raise_for_status()
+                    return response.headers.copy(), await response.read()
+
+            with span("fetch", url=url, cached=entry is not None):
+                result = await self.scheduler.call(url, attempt)
+            if result is None:
+                self.stats["cache_revalidated"] += 1
+                return self.cache.touch(key, url, entry).body
+
+            response_headers, body = result
+            count("bytes_fetched", len(body))
+            self.stats["cache_misses"] += 1
+            self.cache.put(key, url, body,
+                           etag=response_headers.get("ETag"),
+                           last_modified=response_headers.get("Last-Modified"))
+            return body
+
+    async def iter_bytes(self, url: str, params: Optional[Dict[str, Any]] = None,
+                         chunk_size: int = 1 << 16) -> AsyncIterator[bytes]:
+        """
+        Streaming counterpart of fetch_bytes with the same cache rules: cached
+        bodies are decompressed chunk by chunk, and downloaded bodies are
+        written to the cache as they arrive, so the whole body is never held.
+        A concurrent stream of the same key waits for the download and then
+        reads the cached body.
+        """
+        if self.cache is None:
+            async with self.scheduler.request(self.session, "GET", url, params=params) as response:
+                response.raise_for_status()
+                async for chunk in response.content.iter_chunked(chunk_size):
+                    count("bytes_fetched", len(chunk))
+                    yield chunk
+            return
+
+        key = self.cache.key(url, params)
+        requested_at = time.time()
+        async with self._key_lock(key):
+            entry = self.cache.get(key, load_body=False)
+
+            if entry is not None and (self.settings.OFFLINE or self._serve_fresh(entry, requested_at)):
+                self.stats["cache_hits"] += 1
+                for chunk in self.cache.iter_body(key, chunk_size):
+                    yield chunk
+                return
+            if self.settings.OFFLINE:
+                raise LookupError(f"Offline mode: no cached response for {url}")
+
+            headers = entry.conditional_headers() if entry is not None else {}
+            async with self.scheduler.request(self.session, "GET", url, params=params,
+                                              headers=headers) as response:
+                if response.status == 304 and entry is not None:
+                    self.stats["cache_revalidated"] += 1
+                    self.cache.touch(key, url, entry)
+                    for chunk in self.cache.iter_body(key, chunk_size):
+                        yield chunk
+                    return
+
+                response.raise_for_status()
+                self.stats["cache_misses"] += 1
+                with self.cache.writer(key, url, etag=response.headers.get("ETag"),
+                                       last_modified=response.headers.get("Last-Modified")) as body:
+                    async for chunk in response.content.iter_chunked(chunk_size):
+                        count("bytes_fetched", len(chunk))
+                        body.write(chunk)
+                        yield chunk
+
+    async def stream_json_array(self, url: str, where: Optional[Dict[str, Any]] = None,
+                                params: Optional[Dict[str, Any]] = None) -> AsyncIterator[Any]:
+        """
+        Yield the elements of a JSON array response as they are parsed. Records
+        not matching `where` (field == value) are skipped before being decoded.
+        """
+        async for record in iter_json_array(self.iter_bytes(url, params), where, self.stats):
+            yield record
+
+    async def fetch_json(self, url: str, params: Optional[Dict[str, Any]] = None) -> Any:
+        """GET a URL through the cache and decode it as JSON"""
+        body = await self.fetch_bytes(url, params)
+        with span("parse", url=url, bytes=len(body)):
+            return json.loads(body)
         
     async def fetch_pois(self, city: str = None) -> Dict[str, Any]:
-        async with aiohttp.ClientSession() as session:
-            params = {
-                "cities": city or self.settings.DEFAULT_CITY,
-                "locale": "en",
-                "type": "city,experiences",
-                "regions": "RUH",
-                "categories": ""
-            }
-            async with session.get(self.settings.VISIT_SAUDI_API, params=params) as response:
-                return await response.json()
+        params = {
+            "cities": city or self.settings.DEFAULT_CITY,
+            "locale": "en",
+            "type": "city,experiences",
+            "regions": "RUH",
+            "categories": ""
+        }
+        return await self.fetch_json(self.settings.VISIT_SAUDI_API, params)
                 
     async def fetch_arcgis_data(self, item_id: str) -> Dict[str, Any]:
         url = f"{self.settings.ARCGIS_API_BASE}/{item_id}/data"
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url, params={"f": "json"}) as response:
-                return await response.json()
+        return await self.fetch_json(url, {"f": "json"})
 
     async def fetch_url(self, url: str) -> Dict[str, Any]:
-        """Fetch JSON data from any URL"""
-        async with aiohttp.ClientSession() as session:
-            print("\nFetching URL:")
-            print(f"URL: {url}")
-            
-            async with session.get(url) as response:
-                print(f"Response status: {response.status}")
-                text = await response.text()
-                print(f"Response type: {type(text)}")
-                print(f"First 200 chars: {text[:200]}")
-                try:
-                    data = json.loads(text)
-                    print(f"Parsed data type: {type(data)}")
-                    if isinstance(data, dict):
-                        print(f"Keys: {data.keys()}")
-                    elif isinstance(data, list):
-                        print(f"List length: {len(data)}")
-                        if data:
-                            print(f"First item type: {type(data[0])}")
-                    return data
-                except json.JSONDecodeError as e:
-                    print(f"JSON decode error: {e}")
-                    return []
-
-    async def fetch_districts(self) -> List[Dict[str, Any]]:
-        """Fetch districts data from the source URL"""
+        """Fetch JSON data from any URL; a body that is not valid JSON gives an empty list"""
+        log.info("Fetching %s", url)
+        body = await self.fetch_bytes(url)
+        try:
+            with span("parse", url=url, bytes=len(body)):
+                data = json.loads(body)
+        except (json.JSONDecodeError, UnicodeDecodeError) as e:
+            log.error("JSON decode error for %s: %s", url, e)
+            return []
+
+        if log.isEnabledFor(logging.DEBUG):
+            # Only describe the payload when someone asked to see it
+            shape = f"{len(data)} items" if isinstance(data, list) else f"keys {list(data)[:20]}" if isinstance(data, dict) else ""
+            log.debug("%s: %d bytes, %s %s, starts %r", url, len(body), type(data).__name__, shape, body[:200])
+        return data
+
+    async def fetch_districts(self, where: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """Fetch districts data from the source URL, keeping only records matching `where`"""
         districts_url = "https://raw.githubusercontent.com/homaily/Saudi-Arabia-Regions-Cities-and-Districts/refs/heads/master/json/districts.json"
-        print(f"\nFetching districts from: {districts_url}")
-        return await self.fetch_url(districts_url) 
\ No newline at end of file
+        log.info("Fetching districts from %s", districts_url)
+        scanned = self.stats["records_scanned"]
+        # Download and parsing overlap, so the stream is one span
+        with span("fetch", url=districts_url, streamed=True):
+            districts = [district async for district in self.stream_json_array(districts_url, where)]
+        log.info("Kept %d of %d districts", len(districts), self.stats["records_scanned"] - scanned)
+        return districts
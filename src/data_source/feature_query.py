@@ -0,0 +1,175 @@
+import asyncio
+from collections import deque
+from typing import Any, AsyncIterator, Awaitable, Dict, Iterable, List, Optional
+
+import aiohttp
+
+from .scheduler import RequestScheduler
+
+
+class FeatureLayerQuery:
+    """Stream features from ArcGIS FeatureServer/MapServer layers.
+
+    Pages are requested with resultOffset/resultRecordCount, ordered by the
+    OBJECTID field, when the layer supports pagination, otherwise by OBJECTID chunks from returnIdsOnly.
+    Pages are fetched concurrently (bounded by a semaphore) but yielded in
+    order, and any page cut short by exceededTransferLimit is completed with
+    follow-up requests. With a scheduler, every request is rate limited and
+    retried on transient failures.
+    """
+
+    def __init__(self, service_url: str, concurrency: int = 4, page_size: Optional[int] = None,
+                 out_sr: Optional[int] = 4326, session: Optional[aiohttp.ClientSession] = None,
+                 scheduler: Optional[RequestScheduler] = None):
+        self.service_url = service_url.rstrip('/')
+        self.concurrency = concurrency
+        self.page_size = page_size
+        self.out_sr = out_sr
+        self.session = session
+        self.scheduler = scheduler
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._layer_info: Dict[int, Dict[str, Any]] = {}
+
+    async def _request(self, session: aiohttp.ClientSession, url: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        """POST a query (objectIds lists can exceed URL limits) and unwrap ArcGIS errors"""
+        async def attempt():
+            # Backoff sleeps happen outside the semaphore so they do not hold a slot
+            async with self._semaphore:
+                async with session.post(url, data=params) as response:
+                    response.raise_for_status()
+                    return await response.json(content_type=None)
+
+        data = await self.scheduler.call(url, attempt) if self.scheduler is not None else await attempt()
+        if 'error' in data:
+            error = data['error']
+            raise ValueError(f"ArcGIS query failed for {url}: {error.get('code')} {error.get('message')}")
+        return data
+
+    async def get_service_info(self, session: Optional[aiohttp.ClientSession] = None) -> Dict[str, Any]:
+        """Fetch the service description (layers, maxRecordCount, spatialReference)"""
+        if session is None and self.session is None:
+            async with aiohttp.ClientSession() as session:
+                return await self._request(session, self.service_url, {'f': 'json'})
+        return await self._request(session or self.session, self.service_url, {'f': 'json'})
+
+    async def get_layer_info(self, layer_id: int, session: Optional[aiohttp.ClientSession] = None) -> Dict[str, Any]:
+        """Fetch (and memoize) a layer description (displayField, maxRecordCount, capabilities)"""
+        if layer_id not in self._layer_info:
+            layer_url = f"{self.service_url}/{layer_id}"
+            if session is None and self.session is None:
+                async with aiohttp.ClientSession() as session:
+                    self._layer_info[layer_id] = await self._request(session, layer_url, {'f': 'json'})
+            else:
+                self._layer_info[layer_id] = await self._request(session or self.session, layer_url, {'f': 'json'})
+        return self._layer_info[layer_id]
+
+    @staticmethod
+    def _object_id_field(layer_info: Dict[str, Any]) -> str:
+        """Name of the layer's OBJECTID field, from objectIdField or the esriFieldTypeOID field"""
+        if layer_info.get('objectIdField'):
+            return layer_info['objectIdField']
+        for field in layer_info.get('fields') or []:
+            if field.get('type') == 'esriFieldTypeOID':
+                return field['name']
+        return 'OBJECTID'
+
+    def _query_params(self, where: str, out_fields: str) -> Dict[str, Any]:
+        params = {
+            'f': 'json',
+            'where': where,
+            'outFields': out_fields,
+            'returnGeometry': 'true',
+        }
+        if self.out_sr:
+            params['outSR'] = self.out_sr
+        return params
+
+    async def iter_features(self, layer_id: int, where: str = "1=1",
+                            out_fields: str = "*") -> AsyncIterator[Dict[str, Any]]:
+        """Yield every feature of a layer matching `where`, page by page"""
+        if self.session is not None:
+            async for feature in self._iter_features(self.session, layer_id, where, out_fields):
+                yield feature
+            return
+
+        async with aiohttp.ClientSession() as session:
+            async for feature in self._iter_features(session, layer_id, where, out_fields):
+                yield feature
+
+    async def _iter_features(self, session: aiohttp.ClientSession, layer_id: int, where: str,
+                             out_fields: str) -> AsyncIterator[Dict[str, Any]]:
+        query_url = f"{self.service_url}/{layer_id}/query"
+        layer_info = await self.get_layer_info(layer_id, session)
+
+        max_records = layer_info.get('maxRecordCount') or 1000
+        page_size = min(self.page_size or max_records, max_records)
+        base_params = self._query_params(where, out_fields)
+        supports_pagination = layer_info.get('advancedQueryCapabilities', {}).get('supportsPagination', False)
+
+        if supports_pagination:
+            count_data = await self._request(session, query_url, {**base_params, 'returnCountOnly': 'true'})
+            total = count_data.get('count', 0)
+            # Without an explicit order the server may sort each page differently, so offsets
+            # would skip or repeat rows
+            base_params = {**base_params, 'orderByFields': self._object_id_field(layer_info)}
+            pages = (
+                self._fetch_offset_page(session, query_url, base_params, offset, min(page_size, total - offset))
+                for offset in range(0, total, page_size)
+            )
+        else:
+            ids_data = await self._request(session, query_url, {**base_params, 'returnIdsOnly': 'true'})
+            id_field = ids_data.get('objectIdFieldName') or self._object_id_field(layer_info)
+            object_ids = sorted(ids_data.get('objectIds') or [])
+            pages = (
+                self._fetch_id_page(session, query_url, base_params, id_field, object_ids[i:i + page_size])
+                for i in range(0, len(object_ids), page_size)
+            )
+
+        async for page in self._ordered(pages):
+            for feature in page:
+                yield feature
+
+    async def _ordered(self, pages: Iterable[Awaitable[List[Dict[str, Any]]]]) -> AsyncIterator[List[Dict[str, Any]]]:
+        """Run page fetches concurrently within a bounded window, yielding results in order"""
+        window = deque()
+        try:
+            for page in pages:
+                window.append(asyncio.ensure_future(page))
+                if len(window) >= self.concurrency * 2:
+                    yield await window.popleft()
+            while window:
+                yield await window.popleft()
+        finally:
+            for task in window:
+                task.cancel()
+
+    async def _fetch_offset_page(self, session, query_url, base_params, offset, count) -> List[Dict[str, Any]]:
+        features = []
+        while len(features) < count:
+            data = await self._request(session, query_url, {
+                **base_params,
+                'resultOffset': offset + len(features),
+                'resultRecordCount': count - len(features),
+            })
+            batch = data.get('features', [])
+            features.extend(batch)
+            # The server may cap a page below resultRecordCount; keep going from where it stopped
+            if not batch or not data.get('exceededTransferLimit'):
+                break
+        return features
+
+    async def _fetch_id_page(self, session, query_url, base_params, id_field, object_ids) -> List[Dict[str, Any]]:
+        features = []
+        remaining = list(object_ids)
+        while remaining:
+            data = await self._request(session, query_url, {
+                **base_params,
+                'objectIds': ','.join(map(str, remaining)),
+            })
+            batch = data.get('features', [])
+            features.extend(batch)
+            if not batch or not data.get('exceededTransferLimit'):
+                break
+            returned = {f.get('attributes', {}).get(id_field) for f in batch}
+            remaining = [oid for oid in remaining if oid not in returned]
+        return features
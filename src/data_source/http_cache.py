@@ -0,0 +1,144 @@
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, Iterator, Optional
+from urllib.parse import urlencode
+
+
+class CacheEntry:
+    __slots__ = ("body", "etag", "last_modified", "stored_at")
+
+    def __init__(self, body: Optional[bytes], etag: Optional[str], last_modified: Optional[str], stored_at: float):
+        self.body = body
+        self.etag = etag
+        self.last_modified = last_modified
+        self.stored_at = stored_at
+
+    def age(self) -> float:
+        return time.time() - self.stored_at
+
+    def conditional_headers(self) -> Dict[str, str]:
+        """Headers for revalidating this entry with the origin server"""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class HTTPCache:
+    """Persistent response cache keyed by URL + query parameters.
+
+    Each entry is stored as a gzip-compressed body plus a small JSON
+    metadata file holding the validators (ETag/Last-Modified) and the time
+    the body was last confirmed fresh.
+    """
+
+    def __init__(self, cache_dir: str, ttl: float = 3600):
+        self.cache_dir = Path(cache_dir)
+        self.ttl = ttl
+
+    @staticmethod
+    def key(url: str, params: Optional[Dict[str, Any]] = None) -> str:
+        if params:
+            url = f"{url}?{urlencode(sorted(params.items()))}"
+        return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+    def _paths(self, key: str):
+        directory = self.cache_dir / key[:2]
+        return directory / f"{key}.json", directory / f"{key}.gz"
+
+    @staticmethod
+    def _temp_path(path: Path) -> Path:
+        """A new temporary file next to `path`, unique to the caller so concurrent writers never share one"""
+        fd, name = tempfile.mkstemp(dir=path.parent, prefix=f"{path.name}.", suffix=".tmp")
+        os.close(fd)
+        return Path(name)
+
+    def get(self, key: str, load_body: bool = True) -> Optional[CacheEntry]:
+        """Cached entry; without load_body its body is left on disk (read it with iter_body)"""
+        meta_path, body_path = self._paths(key)
+        try:
+            meta = json.loads(meta_path.read_text(encoding="utf-8"))
+            body = gzip.decompress(body_path.read_bytes()) if load_body else None
+        except (OSError, ValueError, EOFError):
+            return None
+        if body is None and not body_path.exists():
+            return None
+        return CacheEntry(body, meta.get("etag"), meta.get("last_modified"), meta.get("stored_at", 0))
+
+    def is_fresh(self, entry: CacheEntry) -> bool:
+        return entry.age() < self.ttl
+
+    def put(self, key: str, url: str, body: bytes, etag: Optional[str] = None,
+            last_modified: Optional[str] = None) -> CacheEntry:
+        meta_path, body_path = self._paths(key)
+        meta_path.parent.mkdir(parents=True, exist_ok=True)
+        entry = CacheEntry(body, etag, last_modified, time.time())
+
+        # Write body first and swap files in atomically so readers never see a partial entry
+        tmp_body = self._temp_path(body_path)
+        try:
+            tmp_body.write_bytes(gzip.compress(body, compresslevel=6))
+            os.replace(tmp_body, body_path)
+        except BaseException:
+            tmp_body.unlink(missing_ok=True)
+            raise
+        self._write_meta(meta_path, url, entry)
+        return entry
+
+    def iter_body(self, key: str, chunk_size: int = 1 << 16) -> Iterator[bytes]:
+        """Decompress a cached body chunk by chunk"""
+        _, body_path = self._paths(key)
+        with gzip.open(body_path, "rb") as fh:
+            while True:
+                chunk = fh.read(chunk_size)
+                if not chunk:
+                    return
+                yield chunk
+
+    @contextmanager
+    def writer(self, key: str, url: str, etag: Optional[str] = None,
+               last_modified: Optional[str] = None) -> Iterator[BinaryIO]:
+        """
+        Stream a body into the cache. The entry is only swapped in when the
+        block completes, so an interrupted download never replaces a good one.
+        """
+        meta_path, body_path = self._paths(key)
+        meta_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_body = self._temp_path(body_path)
+        try:
+            with gzip.open(tmp_body, "wb", compresslevel=6) as fh:
+                yield fh
+        except BaseException:
+            tmp_body.unlink(missing_ok=True)
+            raise
+        os.replace(tmp_body, body_path)
+        self._write_meta(meta_path, url, CacheEntry(None, etag, last_modified, time.time()))
+
+    def touch(self, key: str, url: str, entry: CacheEntry) -> CacheEntry:
+        """Mark an entry fresh again after a 304 Not Modified"""
+        entry.stored_at = time.time()
+        meta_path, _ = self._paths(key)
+        self._write_meta(meta_path, url, entry)
+        return entry
+
+    def _write_meta(self, meta_path: Path, url: str, entry: CacheEntry):
+        tmp_meta = self._temp_path(meta_path)
+        try:
+            tmp_meta.write_text(json.dumps({
+                "url": url,
+                "etag": entry.etag,
+                "last_modified": entry.last_modified,
+                "stored_at": entry.stored_at,
+            }), encoding="utf-8")
+            os.replace(tmp_meta, meta_path)
+        except BaseException:
+            tmp_meta.unlink(missing_ok=True)
+            raise
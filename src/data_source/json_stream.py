@@ -0,0 +1,227 @@
+import json
+import math
+import re
+from decimal import Decimal
+from typing import Any, AsyncIterable, AsyncIterator, Callable, Dict, List, Optional
+
+import numpy as np
+
+_STRING_END = re.compile(rb'(?:[^"\\]|\\.)*"', re.DOTALL)
+_WHITESPACE = b" \t\r\n"
+_DEPTH_STEP = np.zeros(256, dtype=np.int8)
+_DEPTH_STEP[list(b"[{")] = 1
+_DEPTH_STEP[list(b"]}")] = -1
+
+
+class JSONArrayScanner:
+    """Split a top-level JSON array into its raw elements as bytes arrive.
+
+    Only structure is tracked: strings are skipped with one regex match
+    each, and the runs between strings are skipped with bytes.count, or a
+    NumPy cumulative depth where they may close the current element, so
+    nested coordinate arrays cost a few C-level scans per element rather
+    than a Python step per character.
+    Elements are returned as raw bytes and never decoded here.
+    """
+
+    def __init__(self):
+        self.buffer = b""
+        self.pos = 0
+        self.depth = 0
+        self.started = False
+        self.finished = False
+        self.element_start: Optional[int] = None
+
+    def feed(self, data: bytes) -> List[bytes]:
+        """Consume a chunk and return every element completed by it"""
+        if self.finished:
+            if data.strip():
+                raise ValueError("Unexpected data after the end of the JSON array")
+            return []
+        self.buffer += data
+        elements: List[bytes] = []
+        buffer = self.buffer
+        pos = self.pos
+
+        if not self.started:
+            while pos < len(buffer) and buffer[pos] in _WHITESPACE:
+                pos += 1
+            if pos == len(buffer):
+                self._compact(pos)
+                return elements
+            if buffer[pos:pos + 1] != b"[":
+                raise ValueError("Expected a JSON array")
+            self.started = True
+            self.depth = 1
+            pos += 1
+            self.element_start = pos
+
+        while pos < len(buffer) and not self.finished:
+            quote = buffer.find(b'"', pos)
+            end = len(buffer) if quote < 0 else quote
+            if end > pos:
+                pos = self._scan_structure(buffer, pos, end, elements)
+                if self.finished:
+                    break
+            if quote < 0:
+                break
+
+            # String: find its closing quote, waiting for more data if it is split
+            match = _STRING_END.match(buffer, quote + 1)
+            if match is None:
+                pos = quote
+                break
+            pos = match.end()
+
+        self._compact(pos)
+        return elements
+
+    def _scan_structure(self, buffer: bytes, pos: int, end: int, elements: List[bytes]) -> int:
+        """Track nesting over a run that contains no strings"""
+        while pos < end:
+            if self.depth > 1:
+                segment = buffer[pos:end]
+                closers = segment.count(b"]") + segment.count(b"}")
+                if self.depth - closers > 1:
+                    # Cannot return to the top level inside this run: skip it in bulk
+                    self.depth += segment.count(b"[") + segment.count(b"{") - closers
+                    return end
+                levels = np.cumsum(_DEPTH_STEP[np.frombuffer(segment, dtype=np.uint8)]) + self.depth
+                top = np.flatnonzero(levels <= 1)
+                if not len(top):
+                    self.depth = int(levels[-1])
+                    return end
+                # The element's closing bracket: continue byte by byte at the top level
+                self.depth = 1
+                pos += int(top[0]) + 1
+                continue
+
+            char = buffer[pos]
+            if char in b"[{":
+                self.depth += 1
+            elif char in b"]}":
+                self.depth -= 1
+                if self.depth == 0:
+                    self._emit(buffer, pos, elements)
+                    self.finished = True
+                    return pos + 1
+            elif char == 0x2C and self.depth == 1:  # ','
+                self._emit(buffer, pos, elements)
+                self.element_start = pos + 1
+            pos += 1
+        return pos
+
+    def _emit(self, buffer: bytes, end: int, elements: List[bytes]):
+        raw = buffer[self.element_start:end].strip()
+        if raw:
+            elements.append(raw)
+
+    def _compact(self, pos: int):
+        """Drop bytes that belong to already emitted elements"""
+        keep_from = pos if self.element_start is None else min(pos, self.element_start)
+        if self.finished:
+            keep_from = pos
+        self.buffer = self.buffer[keep_from:]
+        self.pos = pos - keep_from
+        if self.element_start is not None:
+            self.element_start = max(self.element_start - keep_from, 0)
+
+    def close(self):
+        if self.started and not self.finished:
+            raise ValueError("Truncated JSON array")
+
+
+def _literal(value: Any) -> bytes:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _alternatives(value: Any) -> List[Any]:
+    """A filter value, or each of a set/list/tuple of accepted values"""
+    return list(value) if isinstance(value, (set, frozenset, list, tuple)) else [value]
+
+
+# Number spellings whose value cannot be told from the bytes cheaply: exponents, and literals
+# long enough that float rounding may make them equal to a shorter one
+_ANY_EXPONENT = rb"-?[0-9]+(?:\.[0-9]+)?[eE][-+]?[0-9]+"
+_ANY_LONG_NUMBER = rb"-?[0-9][0-9.]{15,}"
+# A string value containing an escape, which may spell the wanted string differently
+_ANY_ESCAPED_STRING = rb'"[^"\\]*\\'
+
+
+def _number_pattern(value: float) -> bytes:
+    """JSON number literals equal to `value`: its decimal digits plus any trailing fractional zeros"""
+    digits = format(Decimal(repr(abs(value))), "f")
+    whole, _, fraction = digits.partition(".")
+    fraction = fraction.rstrip("0")
+    sign = b"-?" if value == 0 else (b"-" if value < 0 else b"")
+    literal = sign + re.escape(whole.encode("ascii"))
+    literal += rb"\." + fraction.encode("ascii") + rb"0*" if fraction else rb"(?:\.0*)?"
+    # Numbers must not run on into a longer number (1 vs 10, 1 vs 1.5)
+    return b"(?:" + b"|".join([literal, _ANY_EXPONENT, _ANY_LONG_NUMBER]) + rb")(?![0-9.eE])"
+
+
+def _value_pattern(value: Any) -> bytes:
+    if isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value):
+        return _number_pattern(value)
+    if isinstance(value, str):
+        return re.escape(_literal(value)) + b"|" + _ANY_ESCAPED_STRING
+    return re.escape(_literal(value))
+
+
+def compile_prefilter(where: Dict[str, Any]) -> Callable[[bytes], bool]:
+    """
+    Cheap byte-level test that a raw record can match `where` (field ==
+    value, or field in values for a set, for every item). Numbers match in
+    any spelling that can equal the value (1, 1.0, 1e0), and strings also
+    when the record's value holds escapes. It may accept records whose match
+    is nested or spelled differently, so parsed records are verified again
+    with matches(); it never rejects a record matches() accepts, provided
+    field names are written without escapes.
+    """
+    patterns = []
+    for field, value in where.items():
+        alternatives = b"|".join(_value_pattern(alternative) for alternative in _alternatives(value))
+        patterns.append(re.compile(re.escape(_literal(field)) + rb"\s*:\s*(?:" + alternatives + b")"))
+    return lambda raw: all(pattern.search(raw) for pattern in patterns)
+
+
+def _equals(found: Any, wanted: Any) -> bool:
+    # true/false never stand in for 1/0, matching the prefilter
+    if isinstance(found, bool) or isinstance(wanted, bool):
+        return found is wanted
+    return found == wanted
+
+
+def matches(record: Any, where: Dict[str, Any]) -> bool:
+    """Exact check of a decoded record against `where`"""
+    return isinstance(record, dict) and all(
+        field in record and any(_equals(record[field], wanted) for wanted in _alternatives(value))
+        for field, value in where.items())
+
+
+async def iter_json_array(chunks: AsyncIterable[bytes], where: Optional[Dict[str, Any]] = None,
+                          stats: Optional[Dict[str, int]] = None) -> AsyncIterator[Any]:
+    """
+    Yield the elements of a top-level JSON array from a stream of byte
+    chunks. With `where` (field -> value, or a set of accepted values),
+    records are first checked against a byte-level prefilter, so
+    non-matching records are never decoded; candidates are decoded and
+    verified field by field.
+    """
+    scanner = JSONArrayScanner()
+    prefilter = compile_prefilter(where) if where else None
+    counts = stats if stats is not None else {}
+    counts.setdefault("records_scanned", 0)
+    counts.setdefault("records_decoded", 0)
+
+    async for chunk in chunks:
+        for raw in scanner.feed(chunk):
+            counts["records_scanned"] += 1
+            if prefilter is not None and not prefilter(raw):
+                continue
+            counts["records_decoded"] += 1
+            record = json.loads(raw)
+            if where and not matches(record, where):
+                continue
+            yield record
+    scanner.close()
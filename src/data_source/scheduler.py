@@ -0,0 +1,233 @@
+import asyncio
+import random
+import time
+from contextlib import asynccontextmanager
+from email.utils import parsedate_to_datetime
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional, TypeVar
+from urllib.parse import urlparse
+
+import aiohttp
+
+T = TypeVar("T")
+
+# Statuses worth retrying: throttled, or a transient server/gateway failure
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+class CircuitOpenError(aiohttp.ClientConnectionError):
+    """Raised without touching the network while a host's circuit is open"""
+
+
+class TokenBucket:
+    """Per-host request rate limit: `rate` requests per second with bursts up to `burst`.
+
+    Tokens are reserved up front (the balance may go negative), so concurrent
+    callers queue behind each other without a lock. A Retry-After from the
+    server defers every later request to the host, not just the throttled one.
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.capacity = max(burst, 1)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.not_before = 0.0
+
+    def _reserve(self) -> float:
+        """Take a token and return how long the caller must wait for it"""
+        now = time.monotonic()
+        wait = max(self.not_before - now, 0.0)
+        if self.rate <= 0:
+            return wait
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        if self.tokens < 0:
+            wait = max(wait, -self.tokens / self.rate)
+        return wait
+
+    async def acquire(self) -> float:
+        wait = self._reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+    def defer(self, seconds: float):
+        self.not_before = max(self.not_before, time.monotonic() + seconds)
+
+
+class CircuitBreaker:
+    """Stop calling a host after `threshold` consecutive failures.
+
+    The circuit stays open for `reset_timeout` seconds, then lets one trial
+    request through (half-open): success closes it, failure opens it again.
+    """
+
+    def __init__(self, threshold: int = 5, reset_timeout: float = 30.0):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.trial_running = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half-open" and not self.trial_running:
+            self.trial_running = True
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self.trial_running or (self.threshold > 0 and self.failures >= self.threshold):
+            self.opened_at = time.monotonic()
+        self.trial_running = False
+
+
+def retry_after_seconds(headers: Optional[Any]) -> Optional[float]:
+    """Parse a Retry-After header given either as seconds or as an HTTP date"""
+    value = headers.get("Retry-After") if headers else None
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class RequestScheduler:
+    """Rate-limited, retrying request execution shared by every upstream call.
+
+    Each attempt first waits for its host's token bucket and circuit
+    breaker. Retryable failures (connection errors, timeouts, truncated
+    bodies, 429 and 5xx) are retried with exponential backoff and full
+    jitter, or after the server's Retry-After when it sends one. Waits,
+    retries and rejections are counted in `stats`.
+    """
+
+    def __init__(self, settings, stats: Optional[Dict[str, float]] = None):
+        self.rate = settings.HTTP_RATE_LIMIT
+        self.burst = settings.HTTP_RATE_BURST
+        self.host_rates = dict(settings.HTTP_HOST_RATE_LIMITS or {})
+        self.max_retries = settings.HTTP_MAX_RETRIES
+        self.backoff = settings.HTTP_RETRY_BACKOFF
+        self.max_delay = settings.HTTP_RETRY_MAX_DELAY
+        self.circuit_threshold = settings.HTTP_CIRCUIT_FAILURES
+        self.circuit_reset = settings.HTTP_CIRCUIT_RESET
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self.stats = stats if stats is not None else {}
+        for name in ("retries", "retry_after_waits", "gave_up", "circuit_rejections",
+                     "throttle_waits", "throttle_wait_seconds"):
+            self.stats.setdefault(name, 0)
+
+    def bucket(self, host: str) -> TokenBucket:
+        if host not in self._buckets:
+            self._buckets[host] = TokenBucket(self.host_rates.get(host, self.rate), self.burst)
+        return self._buckets[host]
+
+    def breaker(self, host: str) -> CircuitBreaker:
+        if host not in self._breakers:
+            self._breakers[host] = CircuitBreaker(self.circuit_threshold, self.circuit_reset)
+        return self._breakers[host]
+
+    @staticmethod
+    def is_retryable(error: BaseException) -> bool:
+        if isinstance(error, CircuitOpenError):
+            return False
+        if isinstance(error, aiohttp.ClientResponseError):
+            return error.status in RETRY_STATUSES
+        return isinstance(error, (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError, asyncio.TimeoutError))
+
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_delay, self.backoff * 2 ** attempt))
+
+    async def call(self, url: str, attempt: Callable[[], Awaitable[T]]) -> T:
+        """
+        Run `attempt` (one complete request, including reading what it needs
+        from the body) until it succeeds, fails with a non-retryable error,
+        or runs out of retries
+        """
+        host = urlparse(url).netloc
+        bucket, breaker = self.bucket(host), self.breaker(host)
+
+        last_error: Optional[Exception] = None
+        for retry in range(self.max_retries + 1):
+            if not breaker.allow():
+                if last_error is not None:
+                    # This call's own failures opened the circuit: report what actually went wrong
+                    self.stats["gave_up"] += 1
+                    raise last_error
+                self.stats["circuit_rejections"] += 1
+                raise CircuitOpenError(f"Circuit open for {host} after {breaker.failures} consecutive failures")
+            waited = await bucket.acquire()
+            if waited > 0:
+                self.stats["throttle_waits"] += 1
+                self.stats["throttle_wait_seconds"] += waited
+
+            try:
+                result = await attempt()
+            except Exception as error:
+                if not self.is_retryable(error):
+                    # The host answered; a 404 or a bad payload is not an outage
+                    breaker.record_success()
+                    raise
+                breaker.record_failure()
+                last_error = error
+                if retry == self.max_retries:
+                    self.stats["gave_up"] += 1
+                    raise
+
+                self.stats["retries"] += 1
+                retry_after = retry_after_seconds(getattr(error, "headers", None))
+                if retry_after is not None:
+                    # Deferring the bucket holds back every request to this host
+                    self.stats["retry_after_waits"] += 1
+                    bucket.defer(min(retry_after, self.max_delay))
+                else:
+                    await asyncio.sleep(self._backoff(retry))
+                continue
+
+            breaker.record_success()
+            return result
+
+    @asynccontextmanager
+    async def request(self, session: aiohttp.ClientSession, method: str, url: str,
+                      **kwargs) -> AsyncIterator[aiohttp.ClientResponse]:
+        """
+        Open a response with retries up to its status line, for callers that
+        stream the body; failures while the body is consumed are not retried
+        """
+        async def attempt() -> aiohttp.ClientResponse:
+            response = await session.request(method, url, **kwargs)
+            if response.status in RETRY_STATUSES:
+                response.release()
+                raise aiohttp.ClientResponseError(response.request_info, response.history,
+                                                  status=response.status, message=response.reason or "",
+                                                  headers=response.headers)
+            return response
+
+        response = await self.call(url, attempt)
+        try:
+            yield response
+        finally:
+            response.release()
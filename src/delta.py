@@ -0,0 +1,66 @@
+import hashlib
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from .features import Placemark
+
+
+def _plain(value):
+    """Replace NumPy coordinate arrays with tuples so repr() shows every vertex"""
+    if hasattr(value, 'tolist'):
+        return [tuple(c) for c in value.tolist()] if getattr(value, 'ndim', 0) == 2 else value.tolist()
+    if isinstance(value, tuple) and hasattr(value, '_fields'):
+        return type(value)(*map(_plain, value))
+    if isinstance(value, (list, tuple)):
+        return type(value)(map(_plain, value))
+    return value
+
+
+def placemark_hash(placemark: Placemark) -> str:
+    """Content hash of a placemark's name, geometry, description and data"""
+    return hashlib.sha1(repr(_plain(placemark)).encode('utf-8')).hexdigest()
+
+
+class FeatureDiff:
+    """Track placemarks as they are written and diff them against the previous run.
+
+    Only the keys and hashes of every feature are kept, plus the added and
+    modified placemarks themselves, so tracking adds little to a streamed export.
+    """
+
+    def __init__(self, previous: Optional[Dict[str, str]] = None):
+        self.previous = previous
+        self.current: Dict[str, str] = {}
+        self.added: List[Placemark] = []
+        self.modified: List[Placemark] = []
+
+    def track(self, placemarks: Iterable[Placemark]) -> Iterator[Placemark]:
+        """Pass placemarks through unchanged while recording their hashes"""
+        for placemark in placemarks:
+            if placemark.id is not None:
+                digest = placemark_hash(placemark)
+                self.current[placemark.id] = digest
+                if self.previous is not None:
+                    previous_digest = self.previous.get(placemark.id)
+                    if previous_digest is None:
+                        self.added.append(placemark)
+                    elif previous_digest != digest:
+                        self.modified.append(placemark)
+            yield placemark
+
+    @property
+    def removed(self) -> List[str]:
+        if self.previous is None:
+            return []
+        return sorted(set(self.previous) - set(self.current))
+
+    @property
+    def has_baseline(self) -> bool:
+        return self.previous is not None
+
+    def summary(self) -> Dict[str, int]:
+        return {
+            'added': len(self.added),
+            'modified': len(self.modified),
+            'removed': len(self.removed),
+            'total': len(self.current),
+        }
@@ -0,0 +1,207 @@
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .features import Geometry, LineString, MultiGeometry, Point, Polygon
+from .geometry import classify_rings
+from .instrumentation import count, span
+
+PART_POINT, PART_LINE, PART_POLYGON = 1, 2, 3
+
+
+def _offsets(lengths: np.ndarray) -> np.ndarray:
+    offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    return offsets
+
+
+class FeatureTable:
+    """Array-backed features shared by the converters and writers.
+
+    Geometry is one flat (n, 2) float64 coordinate buffer plus three offset
+    arrays: feature -> parts, part -> rings, ring -> coordinates. Every part
+    has a type (point, line or polygon; a polygon's first ring is its outer
+    boundary). Attributes are columns: one list per field, None where a
+    feature does not have it. Geometries are handed out as NumPy views, so
+    no per-vertex tuples or per-feature dicts are kept.
+    """
+
+    __slots__ = ("coords", "feature_parts", "part_rings", "ring_coords", "part_types", "columns")
+
+    def __init__(self, coords: np.ndarray, feature_parts: np.ndarray, part_rings: np.ndarray,
+                 ring_coords: np.ndarray, part_types: np.ndarray, columns: Dict[str, List[Any]]):
+        self.coords = coords
+        self.feature_parts = feature_parts
+        self.part_rings = part_rings
+        self.ring_coords = ring_coords
+        self.part_types = part_types
+        self.columns = columns
+
+    def __len__(self) -> int:
+        return len(self.feature_parts) - 1
+
+    def column(self, name: str) -> List[Any]:
+        """Values of one attribute for every feature (None where missing)"""
+        return self.columns.get(name) or [None] * len(self)
+
+    def set_column(self, name: str, values: Iterable[Any]):
+        values = list(values)
+        if len(values) != len(self):
+            raise ValueError(f"Column {name} has {len(values)} values for {len(self)} features")
+        self.columns[name] = values
+
+    def row(self, index: int) -> Dict[str, Any]:
+        """Attributes of one feature, skipping missing (None) values"""
+        return {name: values[index] for name, values in self.columns.items() if values[index] is not None}
+
+    def _ring(self, ring: int) -> np.ndarray:
+        return self.coords[self.ring_coords[ring]:self.ring_coords[ring + 1]]
+
+    def geometry(self, index: int, multi: bool = False) -> Optional[Geometry]:
+        """
+        Feature-model geometry over views of the coordinate buffer; None for
+        features without one. Single parts are returned bare unless multi is set.
+        """
+        geometries = []
+        for part in range(self.feature_parts[index], self.feature_parts[index + 1]):
+            rings = range(self.part_rings[part], self.part_rings[part + 1])
+            part_type = self.part_types[part]
+            if part_type == PART_POINT:
+                lon, lat = self._ring(rings[0])[0].tolist()
+                geometries.append(Point(lon, lat))
+            elif part_type == PART_LINE:
+                geometries.append(LineString(coords=self._ring(rings[0])))
+            else:
+                geometries.append(Polygon(outer=self._ring(rings[0]),
+                                          inner=tuple(self._ring(ring) for ring in rings[1:])))
+        if not geometries:
+            return None
+        if len(geometries) == 1 and not multi:
+            return geometries[0]
+        return MultiGeometry(geometries=geometries)
+
+    def _feature_coord_bounds(self) -> Tuple[np.ndarray, np.ndarray]:
+        first_ring = self.part_rings[self.feature_parts]
+        return self.ring_coords[first_ring[:-1]], self.ring_coords[first_ring[1:]]
+
+    def point_coords(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(lons, lats, has_geometry) using each feature's first vertex; NaN where it has none"""
+        starts, ends = self._feature_coord_bounds()
+        present = ends > starts
+        lons = np.full(len(self), np.nan)
+        lats = np.full(len(self), np.nan)
+        lons[present] = self.coords[starts[present], 0]
+        lats[present] = self.coords[starts[present], 1]
+        return lons, lats, present
+
+    def reproject(self, reprojector) -> "FeatureTable":
+        """Reproject the whole coordinate buffer in one batch, in place"""
+        if len(self.coords):
+            with span("reproject", vertices=len(self.coords)):
+                lon, lat = reprojector.transform_arrays(self.coords[:, 0], self.coords[:, 1])
+                self.coords = np.column_stack([lon, lat])
+            count("vertices_reprojected", len(self.coords))
+        return self
+
+    def group_by(self, name: str, default: Any = None) -> Dict[Any, List[int]]:
+        """Feature indices per distinct value of a column, in first-seen order"""
+        groups: Dict[Any, List[int]] = defaultdict(list)
+        for index, value in enumerate(self.column(name)):
+            groups[default if value is None else value].append(index)
+        return groups
+
+
+class FeatureTableBuilder:
+    """Append features one at a time and pack them into a FeatureTable.
+
+    Ring coordinates are kept as arrays (point vertices as one flat float
+    buffer) until build(); attributes are collected sparsely per column
+    (row -> value), so adding a feature never copies its source record.
+    """
+
+    def __init__(self):
+        self._chunks: List[np.ndarray] = []
+        self._pending: List[float] = []  # x, y of point vertices not yet packed into a chunk
+        self._ring_lengths: List[int] = []
+        self._part_rings: List[int] = []
+        self._part_types: List[int] = []
+        self._feature_parts: List[int] = []
+        self._columns: Dict[str, Dict[int, Any]] = {}
+
+    def __len__(self) -> int:
+        return len(self._feature_parts)
+
+    def _flush(self):
+        if self._pending:
+            self._chunks.append(np.asarray(self._pending, dtype=np.float64).reshape(-1, 2))
+            self._pending = []
+
+    def _add_part(self, part_type: int, rings: Sequence[np.ndarray]):
+        self._flush()
+        self._part_types.append(part_type)
+        self._part_rings.append(len(rings))
+        self._chunks.extend(rings)
+        self._ring_lengths.extend(len(ring) for ring in rings)
+
+    def _finish(self, parts: int, *attribute_maps: Optional[Dict[str, Any]]):
+        row = len(self._feature_parts)
+        self._feature_parts.append(parts)
+        columns = self._columns
+        for attributes in attribute_maps:
+            if not attributes:
+                continue
+            # Later maps override earlier ones
+            for name, value in attributes.items():
+                column = columns.get(name)
+                if column is None:
+                    column = columns[name] = {}
+                column[row] = value
+
+    @staticmethod
+    def _array(coords: Sequence[Sequence[float]], swap_xy: bool = False) -> np.ndarray:
+        if not len(coords):
+            return np.zeros((0, 2))
+        array = np.asarray(coords, dtype=np.float64).reshape(len(coords), -1)[:, :2]
+        return array[:, ::-1] if swap_xy else array
+
+    def add_point(self, x: Optional[float], y: Optional[float], *attribute_maps: Optional[Dict[str, Any]]):
+        """Add a point feature; with x or y None the feature is kept without geometry"""
+        if x is None or y is None:
+            self._finish(0, *attribute_maps)
+            return
+        self._pending.append(float(x))
+        self._pending.append(float(y))
+        self._ring_lengths.append(1)
+        self._part_rings.append(1)
+        self._part_types.append(PART_POINT)
+        self._finish(1, *attribute_maps)
+
+    def add_paths(self, paths: Sequence[Sequence[Sequence[float]]], *attribute_maps: Optional[Dict[str, Any]]):
+        """Add a (multi)line feature, one line part per path"""
+        for path in paths:
+            self._add_part(PART_LINE, [self._array(path)])
+        self._finish(len(paths), *attribute_maps)
+
+    def add_rings(self, rings: Sequence[Sequence[Sequence[float]]], *attribute_maps: Optional[Dict[str, Any]],
+                  outer_clockwise: Optional[bool] = None, swap_xy: bool = False):
+        """Add a (multi)polygon feature, grouping raw rings into outers and holes by winding order"""
+        arrays = [self._array(ring, swap_xy) for ring in rings]
+        polygons = classify_rings(arrays, outer_clockwise)
+        for outer, holes in polygons:
+            self._add_part(PART_POLYGON, [arrays[outer]] + [arrays[h] for h in holes])
+        self._finish(len(polygons), *attribute_maps)
+
+    def build(self) -> FeatureTable:
+        self._flush()
+        rows = range(len(self._feature_parts))
+        count("features", len(self._feature_parts))
+        count("vertices", sum(self._ring_lengths))
+        return FeatureTable(
+            coords=np.concatenate(self._chunks) if self._chunks else np.zeros((0, 2)),
+            feature_parts=_offsets(np.asarray(self._feature_parts, dtype=np.int64)),
+            part_rings=_offsets(np.asarray(self._part_rings, dtype=np.int64)),
+            ring_coords=_offsets(np.asarray(self._ring_lengths, dtype=np.int64)),
+            part_types=np.asarray(self._part_types, dtype=np.uint8),
+            columns={name: list(map(column.get, rows)) for name, column in self._columns.items()},
+        )
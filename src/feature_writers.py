@@ -0,0 +1,486 @@
+import io
+import json
+import struct
+import zipfile
+from contextlib import contextmanager
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Sequence, TextIO, Tuple
+
+import numpy as np
+
+from .features import Folder, Geometry, LineString, MultiGeometry, Placemark, Point, Polygon
+from .geometry.quantize import quantize
+from .geometry.rings import ring_signed_areas
+from .kml_writer import KMLStreamWriter, TiledKMLWriter
+
+
+def _positions(coords: Sequence[Sequence[float]], precision: Optional[int] = None, dedupe: bool = False,
+               min_points: int = 2, clockwise: Optional[bool] = None) -> List[List[float]]:
+    # Altitudes are always 0.0 in our sources, so positions are written 2D
+    if precision is None and not dedupe and clockwise is None:
+        if isinstance(coords, np.ndarray):
+            return coords[:, :2].tolist()
+        return [[c[0], c[1]] for c in coords]
+    array = quantize(coords, precision, dedupe, min_points)[:, :2]
+    if clockwise is not None and len(array) > 2:
+        # Rewound after rounding, so the written ring is the one whose orientation is checked
+        area = ring_signed_areas(array, np.array([0, len(array)]))[0]
+        if area and (area < 0) != clockwise:
+            array = array[::-1]
+    return array.tolist()
+
+
+def geometry_to_geojson(geometry: Geometry, precision: Optional[int] = None, dedupe: bool = False) -> Dict[str, Any]:
+    """GeoJSON geometry object for a feature-model geometry, optionally rounded to `precision` decimals"""
+    if isinstance(geometry, Point):
+        if precision is not None:
+            return {"type": "Point", "coordinates": [round(geometry.lon, precision), round(geometry.lat, precision)]}
+        return {"type": "Point", "coordinates": [geometry.lon, geometry.lat]}
+    if isinstance(geometry, LineString):
+        return {"type": "LineString", "coordinates": _positions(geometry.coords, precision, dedupe)}
+    if isinstance(geometry, Polygon):
+        # RFC 7946 right-hand rule: exterior rings counter-clockwise, holes clockwise
+        # (Esri sources wind them the other way round)
+        return {"type": "Polygon", "coordinates": [
+            _positions(geometry.outer, precision, dedupe, 4, clockwise=False),
+            *(_positions(ring, precision, dedupe, 4, clockwise=True) for ring in geometry.inner),
+        ]}
+    if isinstance(geometry, MultiGeometry):
+        parts = [geometry_to_geojson(part, precision, dedupe) for part in geometry.geometries]
+        kinds = {part["type"] for part in parts}
+        if len(kinds) == 1 and kinds <= {"Point", "LineString", "Polygon"}:
+            return {"type": f"Multi{kinds.pop()}", "coordinates": [part["coordinates"] for part in parts]}
+        return {"type": "GeometryCollection", "geometries": parts}
+    raise TypeError(f"Unsupported geometry type: {type(geometry).__name__}")
+
+
+def placemark_properties(placemark: Placemark, folder: Optional[str]) -> Dict[str, Any]:
+    """Flat property dict for non-KML formats: name, description, folder, then ExtendedData"""
+    properties = {"name": placemark.name}
+    if placemark.description:
+        properties["description"] = placemark.description
+    if folder is not None:
+        properties["folder"] = folder
+    if placemark.extended_data:
+        properties.update(placemark.extended_data)
+    return properties
+
+
+def placemark_to_geojson(placemark: Placemark, folder: Optional[str] = None, precision: Optional[int] = None,
+                         dedupe: bool = False) -> Dict[str, Any]:
+    feature = {"type": "Feature"}
+    if placemark.id is not None:
+        feature["id"] = placemark.id
+    feature["geometry"] = geometry_to_geojson(placemark.geometry, precision, dedupe)
+    feature["properties"] = placemark_properties(placemark, folder)
+    return feature
+
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+class _FolderTracking:
+    """Folder bookkeeping shared by the flat (non-KML) writers; nested folder names are joined with '/'"""
+
+    def __init__(self):
+        self.folders: List[str] = []
+        self.placemark_count = 0
+        self.path = None
+
+    @property
+    def folder(self) -> Optional[str]:
+        return "/".join(self.folders) if self.folders else None
+
+    def start_folder(self, name: str, description: Optional[str] = None):
+        self.folders.append(name)
+
+    def end_folder(self):
+        self.folders.pop()
+
+    def write_folder(self, folder: Folder):
+        """Write a folder, consuming its placemarks lazily"""
+        self.start_folder(folder.name, folder.description)
+        for placemark in folder.placemarks:
+            self.write_placemark(placemark)
+        self.end_folder()
+
+
+class GeoJSONStreamWriter(_FolderTracking):
+    """Write a GeoJSON FeatureCollection one feature at a time"""
+
+    def __init__(self, fh: TextIO, precision: Optional[int] = None, dedupe_vertices: bool = False):
+        super().__init__()
+        self.fh = fh
+        self.precision = precision
+        self.dedupe_vertices = dedupe_vertices
+
+    def start_document(self, extended_data: Optional[Dict[str, Any]] = None, document_id: Optional[str] = None):
+        header = {"type": "FeatureCollection"}
+        if document_id:
+            header["name"] = document_id
+        if extended_data:
+            header["properties"] = extended_data
+        # Leave the features array open and stream into it
+        self.fh.write(_dumps(header)[:-1] + ',"features":[\n')
+
+    def end_document(self):
+        self.fh.write("\n]}\n")
+
+    def write_placemark(self, placemark: Placemark):
+        if self.placemark_count:
+            self.fh.write(",\n")
+        self.fh.write(_dumps(placemark_to_geojson(placemark, self.folder, self.precision, self.dedupe_vertices)))
+        self.placemark_count += 1
+
+
+class NDJSONStreamWriter(_FolderTracking):
+    """Write newline-delimited GeoJSON features (GeoJSON Text Sequences without RS)"""
+
+    def __init__(self, fh: TextIO, precision: Optional[int] = None, dedupe_vertices: bool = False):
+        super().__init__()
+        self.fh = fh
+        self.precision = precision
+        self.dedupe_vertices = dedupe_vertices
+
+    def start_document(self, extended_data: Optional[Dict[str, Any]] = None, document_id: Optional[str] = None):
+        pass
+
+    def end_document(self):
+        pass
+
+    def write_placemark(self, placemark: Placemark):
+        self.fh.write(_dumps(placemark_to_geojson(placemark, self.folder, self.precision, self.dedupe_vertices)))
+        self.fh.write("\n")
+        self.placemark_count += 1
+
+
+# Columnar binary layout ------------------------------------------------------
+
+COLUMNAR_MAGIC = b"RKCB"
+COLUMNAR_VERSION = 1
+PART_POINT, PART_LINE, PART_POLYGON = 1, 2, 3
+
+
+def hilbert_keys(xs: np.ndarray, ys: np.ndarray, order: int = 16) -> np.ndarray:
+    """Hilbert curve index of integer grid coordinates in [0, 2**order), vectorized"""
+    n = 1 << order
+    x = xs.astype(np.int64)
+    y = ys.astype(np.int64)
+    keys = np.zeros(len(x), dtype=np.int64)
+    s = n >> 1
+    while s > 0:
+        rx = ((x & s) > 0).astype(np.int64)
+        ry = ((y & s) > 0).astype(np.int64)
+        keys += s * s * ((3 * rx) ^ ry)
+        # Rotate the quadrant so the curve stays continuous
+        rotate = ry == 0
+        flip = rotate & (rx == 1)
+        x = np.where(flip, n - 1 - x, x)
+        y = np.where(flip, n - 1 - y, y)
+        x, y = np.where(rotate, y, x), np.where(rotate, x, y)
+        s >>= 1
+    return keys
+
+
+def _ranges(starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    """Concatenation of arange(start, end) for every pair, without a Python loop"""
+    lengths = ends - starts
+    if not len(lengths):
+        return np.zeros(0, dtype=np.int64)
+    shifts = starts - np.concatenate([[0], np.cumsum(lengths)[:-1]])
+    return np.arange(int(lengths.sum()), dtype=np.int64) + np.repeat(shifts, lengths)
+
+
+class ColumnarWriter(_FolderTracking):
+    """Compact binary columnar output with a spatial index up front.
+
+    Layout: magic, header length, JSON header (counts, extent, folder names,
+    property key names, column offsets/dtypes), then 8-byte aligned columns.
+    The first column is the per-feature bounding box table; features are
+    sorted along a Hilbert curve so a bbox query touches a few contiguous
+    ranges of every column. Properties are JSON arrays of values in key-list
+    order (nulls are dropped on read). Features are buffered until
+    end_document because the index must be written before the data.
+    """
+
+    def __init__(self, fh: BinaryIO):
+        super().__init__()
+        self.fh = fh
+        self.document: Dict[str, Any] = {}
+        self.folder_names: Dict[str, int] = {}
+        self.feature_folder: List[int] = []
+        self.feature_parts: List[int] = [0]
+        self.part_types: List[int] = []
+        self.part_rings: List[int] = [0]
+        self.ring_coords: List[int] = [0]
+        self.coords: List[np.ndarray] = []
+        self.property_keys: Dict[str, int] = {}
+        self.properties: List[bytes] = []
+        self.bboxes: List[Tuple[float, float, float, float]] = []
+
+    def start_document(self, extended_data: Optional[Dict[str, Any]] = None, document_id: Optional[str] = None):
+        self.document = {"name": document_id, "properties": extended_data or {}}
+
+    def _add_ring(self, coords: Sequence[Sequence[float]]) -> np.ndarray:
+        if isinstance(coords, np.ndarray):
+            ring = coords[:, :2].astype(np.float64, copy=False)
+        else:
+            ring = np.asarray([(c[0], c[1]) for c in coords], dtype=np.float64).reshape(-1, 2)
+        self.coords.append(ring)
+        self.ring_coords.append(self.ring_coords[-1] + len(ring))
+        return ring
+
+    def _add_geometry(self, geometry: Geometry, arrays: List[np.ndarray]):
+        if isinstance(geometry, MultiGeometry):
+            for part in geometry.geometries:
+                self._add_geometry(part, arrays)
+            return
+        if isinstance(geometry, Point):
+            self.part_types.append(PART_POINT)
+            arrays.append(self._add_ring([(geometry.lon, geometry.lat)]))
+            rings = 1
+        elif isinstance(geometry, LineString):
+            self.part_types.append(PART_LINE)
+            arrays.append(self._add_ring(geometry.coords))
+            rings = 1
+        elif isinstance(geometry, Polygon):
+            self.part_types.append(PART_POLYGON)
+            for ring in (geometry.outer, *geometry.inner):
+                arrays.append(self._add_ring(ring))
+            rings = 1 + len(geometry.inner)
+        else:
+            raise TypeError(f"Unsupported geometry type: {type(geometry).__name__}")
+        self.part_rings.append(self.part_rings[-1] + rings)
+
+    def write_placemark(self, placemark: Placemark):
+        arrays: List[np.ndarray] = []
+        self._add_geometry(placemark.geometry, arrays)
+        self.feature_parts.append(len(self.part_types))
+        stacked = np.concatenate(arrays) if arrays else np.zeros((0, 2))
+        if len(stacked):
+            (west, south), (east, north) = stacked.min(axis=0), stacked.max(axis=0)
+        else:
+            west = south = east = north = np.nan
+        self.bboxes.append((west, south, east, north))
+
+        folder = self.folder or ""
+        self.feature_folder.append(self.folder_names.setdefault(folder, len(self.folder_names)))
+        properties = placemark_properties(placemark, None)
+        if placemark.id is not None:
+            properties["id"] = placemark.id
+        # Values are stored positionally against the header's key list instead of repeating every key
+        values = []
+        for key, value in properties.items():
+            position = self.property_keys.setdefault(key, len(self.property_keys))
+            values.extend([None] * (position + 1 - len(values)))
+            values[position] = value
+        self.properties.append(_dumps(values).encode("utf-8"))
+        self.placemark_count += 1
+
+    def _order(self, bboxes: np.ndarray) -> np.ndarray:
+        """Feature order along a Hilbert curve through the bbox centres"""
+        if len(bboxes) < 2:
+            return np.arange(len(bboxes))
+        cx = np.nan_to_num((bboxes[:, 0] + bboxes[:, 2]) / 2)
+        cy = np.nan_to_num((bboxes[:, 1] + bboxes[:, 3]) / 2)
+        scale = (1 << 16) - 1
+        span_x = max(cx.max() - cx.min(), 1e-12)
+        span_y = max(cy.max() - cy.min(), 1e-12)
+        gx = ((cx - cx.min()) / span_x * scale).astype(np.int64)
+        gy = ((cy - cy.min()) / span_y * scale).astype(np.int64)
+        return np.argsort(hilbert_keys(gx, gy), kind="stable")
+
+    def end_document(self):
+        bboxes = np.asarray(self.bboxes, dtype=np.float64).reshape(-1, 4)
+        order = self._order(bboxes)
+
+        # Reorder the feature -> part -> ring -> coordinate hierarchy in one pass
+        feature_parts = np.asarray(self.feature_parts, dtype=np.int64)
+        part_rings = np.asarray(self.part_rings, dtype=np.int64)
+        ring_coords = np.asarray(self.ring_coords, dtype=np.int64)
+        coords = np.concatenate(self.coords) if self.coords else np.zeros((0, 2))
+        part_types = np.asarray(self.part_types, dtype=np.uint8)
+
+        part_index = _ranges(feature_parts[order], feature_parts[order + 1])
+        ring_index = _ranges(part_rings[part_index], part_rings[part_index + 1])
+        coord_index = _ranges(ring_coords[ring_index], ring_coords[ring_index + 1])
+
+        properties = [self.properties[i] for i in order]
+        columns = {
+            "bbox": bboxes[order],
+            "feature_folder": np.asarray(self.feature_folder, dtype=np.uint16)[order],
+            "feature_parts": np.concatenate([[0], np.cumsum(feature_parts[order + 1] - feature_parts[order])])
+                               .astype(np.uint32),
+            "part_type": part_types[part_index],
+            "part_rings": np.concatenate([[0], np.cumsum(part_rings[part_index + 1] - part_rings[part_index])])
+                            .astype(np.uint32),
+            "ring_coords": np.concatenate([[0], np.cumsum(ring_coords[ring_index + 1] - ring_coords[ring_index])])
+                             .astype(np.uint64),
+            "coords": coords[coord_index],
+            "properties_offsets": np.concatenate([[0], np.cumsum([len(p) for p in properties])]).astype(np.uint64),
+            "properties": np.frombuffer(b"".join(properties), dtype=np.uint8),
+        }
+
+        valid = bboxes[~np.isnan(bboxes).any(axis=1)]
+        header = {
+            "version": COLUMNAR_VERSION,
+            "count": len(order),
+            "extent": ([float(valid[:, 0].min()), float(valid[:, 1].min()),
+                        float(valid[:, 2].max()), float(valid[:, 3].max())] if len(valid) else None),
+            "document": self.document,
+            "folders": list(self.folder_names),
+            "property_keys": list(self.property_keys),
+            "columns": {},
+        }
+        # Column offsets depend on the header length, so lay them out relative to the data start
+        position = 0
+        for name, column in columns.items():
+            header["columns"][name] = {"offset": position, "dtype": column.dtype.str, "shape": list(column.shape)}
+            position += -(-column.nbytes // 8) * 8
+
+        header_bytes = _dumps(header).encode("utf-8")
+        header_bytes += b" " * (-(len(COLUMNAR_MAGIC) + 4 + len(header_bytes)) % 8)
+        self.fh.write(COLUMNAR_MAGIC + struct.pack("<I", len(header_bytes)) + header_bytes)
+        for column in columns.values():
+            data = np.ascontiguousarray(column).tobytes()
+            self.fh.write(data + b"\0" * (-len(data) % 8))
+
+
+def read_columnar(path, bbox: Optional[Sequence[float]] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Yield GeoJSON features from a columnar file, optionally only those whose
+    bounding box intersects bbox (west, south, east, north). Columns are
+    memory-mapped, so only the index and the matching features are read.
+    """
+    with open(path, "rb") as fh:
+        if fh.read(len(COLUMNAR_MAGIC)) != COLUMNAR_MAGIC:
+            raise ValueError(f"{path} is not a columnar feature file")
+        (header_length,) = struct.unpack("<I", fh.read(4))
+        header = json.loads(fh.read(header_length))
+    data_start = len(COLUMNAR_MAGIC) + 4 + header_length
+
+    def column(name):
+        spec = header["columns"][name]
+        count = int(np.prod(spec["shape"]))
+        if count == 0:
+            return np.zeros(spec["shape"], dtype=spec["dtype"])
+        return np.memmap(path, dtype=spec["dtype"], mode="r", offset=data_start + spec["offset"],
+                         shape=tuple(spec["shape"]))
+
+    bboxes = column("bbox")
+    if bbox is None:
+        selected = np.arange(header["count"])
+    else:
+        west, south, east, north = bbox
+        selected = np.flatnonzero((bboxes[:, 0] <= east) & (bboxes[:, 2] >= west)
+                                  & (bboxes[:, 1] <= north) & (bboxes[:, 3] >= south))
+
+    folders, keys = header["folders"], header["property_keys"]
+    feature_folder, feature_parts = column("feature_folder"), column("feature_parts")
+    part_type, part_rings, ring_coords = column("part_type"), column("part_rings"), column("ring_coords")
+    coords, properties_offsets, properties = column("coords"), column("properties_offsets"), column("properties")
+
+    def ring(r):
+        return coords[int(ring_coords[r]):int(ring_coords[r + 1])].tolist()
+
+    for i in selected.tolist():
+        geometries = []
+        for p in range(int(feature_parts[i]), int(feature_parts[i + 1])):
+            rings = range(int(part_rings[p]), int(part_rings[p + 1]))
+            if part_type[p] == PART_POINT:
+                geometries.append(Point(*ring(rings[0])[0]))
+            elif part_type[p] == PART_LINE:
+                geometries.append(LineString(coords=ring(rings[0])))
+            else:
+                outer, *inner = [ring(r) for r in rings]
+                geometries.append(Polygon(outer=outer, inner=tuple(inner)))
+        values = json.loads(bytes(properties[int(properties_offsets[i]):int(properties_offsets[i + 1])]))
+        props = {keys[k]: value for k, value in enumerate(values) if value is not None}
+        if folders[feature_folder[i]]:
+            props["folder"] = folders[feature_folder[i]]
+        feature = {"type": "Feature"}
+        if "id" in props:
+            feature["id"] = props.pop("id")
+        geometry = geometries[0] if len(geometries) == 1 else MultiGeometry(geometries=geometries)
+        feature["geometry"] = geometry_to_geojson(geometry)
+        feature["properties"] = props
+        yield feature
+
+
+# Format registry ---------------------------------------------------------------
+
+@contextmanager
+def _text_writer(fh: BinaryIO, writer_class, **options):
+    text = io.TextIOWrapper(fh, encoding="utf-8")
+    writer = writer_class(text, **options)
+    try:
+        yield writer
+    finally:
+        if hasattr(writer, "close"):
+            writer.close()
+        text.flush()
+        text.detach()
+
+
+@contextmanager
+def _kmz_writer(fh: BinaryIO, **options):
+    with zipfile.ZipFile(fh, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=9) as archive:
+        with archive.open("doc.kml", "w") as entry:
+            with _text_writer(entry, KMLStreamWriter, **options) as writer:
+                yield writer
+
+
+@contextmanager
+def _columnar_writer(fh: BinaryIO):
+    yield ColumnarWriter(fh)
+
+
+# Output format -> (file extension, context manager opening a writer on a binary file handle);
+# the text formats also take their writer's options (precision/dedupe_vertices, plus
+# workers/chunk_size for kml/kmz and tile_dir/zoom/min_lod_pixels for kml-tiles)
+FORMATS = {
+    "kml": (".kml", lambda fh, **options: _text_writer(fh, KMLStreamWriter, **options)),
+    "kmz": (".kmz", _kmz_writer),
+    "kml-tiles": ("_tiles.kml", lambda fh, **options: _text_writer(fh, TiledKMLWriter, **options)),
+    "geojson": (".geojson", lambda fh, **options: _text_writer(fh, GeoJSONStreamWriter, **options)),
+    "ndjson": (".ndjson", lambda fh, **options: _text_writer(fh, NDJSONStreamWriter, **options)),
+    "columnar": (".rkcb", _columnar_writer),
+}
+
+
+class MultiWriter:
+    """Fan one stream of folders/placemarks out to several format writers"""
+
+    def __init__(self, writers: Sequence[Any]):
+        self.writers = list(writers)
+
+    @property
+    def path(self):
+        return self.writers[0].path
+
+    @property
+    def paths(self):
+        return [writer.path for writer in self.writers]
+
+    @property
+    def placemark_count(self) -> int:
+        return self.writers[0].placemark_count
+
+    def start_folder(self, name: str, description: Optional[str] = None):
+        for writer in self.writers:
+            writer.start_folder(name, description)
+
+    def end_folder(self):
+        for writer in self.writers:
+            writer.end_folder()
+
+    def write_placemark(self, placemark: Placemark):
+        for writer in self.writers:
+            writer.write_placemark(placemark)
+
+    def write_folder(self, folder: Folder):
+        """Write a folder to every writer, consuming its placemarks lazily"""
+        self.start_folder(folder.name, folder.description)
+        for placemark in folder.placemarks:
+            self.write_placemark(placemark)
+        self.end_folder()
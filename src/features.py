@@ -0,0 +1,52 @@
+from typing import Any, Dict, Iterable, NamedTuple, Optional, Sequence, Tuple, Union
+
+Coordinate = Sequence[float]
+
+
+class Point(NamedTuple):
+    lon: float
+    lat: float
+
+
+class LineString(NamedTuple):
+    coords: Sequence[Coordinate]
+
+
+class Polygon(NamedTuple):
+    outer: Sequence[Coordinate]
+    inner: Tuple[Sequence[Coordinate], ...] = ()
+
+
+class MultiGeometry(NamedTuple):
+    geometries: Sequence[Union[Point, LineString, Polygon]]
+
+
+Geometry = Union[Point, LineString, Polygon, MultiGeometry]
+
+
+class Region(NamedTuple):
+    """KML <Region>: bounding box plus the on-screen size range the feature is shown at"""
+    north: float
+    south: float
+    east: float
+    west: float
+    min_lod_pixels: float = 0
+    max_lod_pixels: float = -1
+
+
+class Placemark(NamedTuple):
+    name: str
+    geometry: Geometry
+    description: Optional[str] = None
+    extended_data: Optional[Dict[str, Any]] = None
+    # Stable feature key (slugPOI, district name, station name); written as the KML id
+    id: Optional[str] = None
+    region: Optional[Region] = None
+    # Reference to a shared document-level style, e.g. "#metro-line-1"
+    style_url: Optional[str] = None
+
+
+class Folder(NamedTuple):
+    name: str
+    placemarks: Iterable[Placemark]
+    description: Optional[str] = None
@@ -0,0 +1,15 @@
+from .quantize import quantize
+from .reproject import BatchReprojector
+from .rings import classify_rings, point_in_ring, points_in_ring, ring_signed_areas
+from .simplify import douglas_peucker, simplify_ring_array, visvalingam
+from .spatial_index import PointIndex, PolygonIndex, haversine_m
+from .tiles import geometry_bounds, quadkey, tile_bounds, tile_for_bounds, tile_xy
+
+__all__ = [
+    'quantize',
+    'BatchReprojector',
+    'classify_rings', 'point_in_ring', 'points_in_ring', 'ring_signed_areas',
+    'douglas_peucker', 'simplify_ring_array', 'visvalingam',
+    'PointIndex', 'PolygonIndex', 'haversine_m',
+    'geometry_bounds', 'quadkey', 'tile_bounds', 'tile_for_bounds', 'tile_xy',
+]
@@ -0,0 +1,37 @@
+from itertools import chain
+from typing import Optional, Sequence
+
+import numpy as np
+
+
+def quantize(coords: Sequence[Sequence[float]], precision: Optional[int] = None,
+             dedupe: bool = False, min_points: int = 2) -> np.ndarray:
+    """
+    Round coordinates to `precision` decimal places (None keeps full
+    precision) and optionally drop vertices equal to the one before them
+    after rounding. De-duplication is skipped when it would leave fewer
+    than `min_points` vertices (2 for lines, 4 for closed rings).
+    """
+    array = None
+    if isinstance(coords, (list, tuple)) and coords and isinstance(coords[0], (list, tuple)):
+        # Flattening through fromiter is several times faster than asarray on
+        # lists of tuples; ragged input falls back to asarray
+        width = len(coords[0])
+        array = np.fromiter(chain.from_iterable(coords), np.float64)
+        array = array.reshape(len(coords), width) if array.size == len(coords) * width else None
+    if array is None:
+        array = np.asarray(coords, dtype=np.float64)
+    if not array.size:
+        return array.reshape(0, 2)
+    if array.ndim != 2:
+        array = array.reshape(len(array), -1)
+    if precision is not None:
+        array = np.round(array, precision)
+    if dedupe and len(array) > min_points:
+        changed = array[1:, 0] != array[:-1, 0]
+        for column in range(1, array.shape[1]):
+            changed |= array[1:, column] != array[:-1, column]
+        duplicates = len(changed) - np.count_nonzero(changed)
+        if duplicates and len(array) - duplicates >= min_points:
+            array = array[np.concatenate(([True], changed))]
+    return array
@@ -0,0 +1,77 @@
+import math
+from functools import lru_cache
+from itertools import chain
+from typing import Iterable, List, Sequence, Tuple
+
+import numpy as np
+
+EARTH_RADIUS = 6378137.0
+WEB_MERCATOR_CODES = {"EPSG:3857", "EPSG:900913", "EPSG:102100", "EPSG:102113"}
+WGS84_CODES = {"EPSG:4326", "CRS:84"}
+
+
+@lru_cache(maxsize=None)
+def _transformer(source: str, target: str):
+    """pyproj transformer for a CRS pair, built once per process (the CRS database lookup is the slow part)"""
+    import pyproj
+    return pyproj.Transformer.from_crs(source, target, always_xy=True)
+
+
+class BatchReprojector:
+    """Reproject whole layers in a single call instead of one call per vertex.
+
+    All paths of a layer are packed into one contiguous coordinate buffer,
+    transformed at once and sliced back per path. Web Mercator to WGS84 uses
+    a pure NumPy fast path; every other CRS pair goes through one
+    pyproj.Transformer.transform call.
+    """
+
+    def __init__(self, source: str = "EPSG:3857", target: str = "EPSG:4326"):
+        self.source = source.upper()
+        self.target = target.upper()
+        self.fast_path = self.source in WEB_MERCATOR_CODES and self.target in WGS84_CODES
+
+    @property
+    def transformer(self):
+        """pyproj transformer, only built when the fast path does not apply and shared by every reprojector"""
+        return _transformer(self.source, self.target)
+
+    def transform_arrays(self, xs: np.ndarray, ys: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Transform coordinate arrays, returning (lon, lat) arrays"""
+        xs = np.asarray(xs, dtype=np.float64)
+        ys = np.asarray(ys, dtype=np.float64)
+        if self.fast_path:
+            lon = np.degrees(xs / EARTH_RADIUS)
+            lat = np.degrees(2.0 * np.arctan(np.exp(ys / EARTH_RADIUS)) - math.pi / 2.0)
+            return lon, lat
+        lon, lat = self.transformer.transform(xs, ys)
+        return np.asarray(lon), np.asarray(lat)
+
+    def transform_points(self, points: Sequence[Sequence[float]]) -> List[Tuple[float, float]]:
+        """Transform a sequence of (x, y) points in one call"""
+        if not points:
+            return []
+        buffer = np.array([(p[0], p[1]) for p in points], dtype=np.float64)
+        lon, lat = self.transform_arrays(buffer[:, 0], buffer[:, 1])
+        return list(zip(lon.tolist(), lat.tolist()))
+
+    def transform_paths(self, paths: Iterable[Sequence[Sequence[float]]]) -> List[List[Tuple[float, float]]]:
+        """Transform many paths with a single transform call, preserving path boundaries"""
+        paths = list(paths)
+        lengths = [len(path) for path in paths]
+        total = sum(lengths)
+        if total == 0:
+            return [[] for _ in paths]
+
+        # Pack every vertex of every path into one flat (x, y) buffer
+        flat = np.fromiter(
+            chain.from_iterable((v[0], v[1]) for path in paths for v in path),
+            dtype=np.float64,
+            count=2 * total,
+        ).reshape(total, 2)
+        lon, lat = self.transform_arrays(flat[:, 0], flat[:, 1])
+        coords = list(zip(lon.tolist(), lat.tolist()))
+
+        # Slice the transformed buffer back into the original paths
+        offsets = np.concatenate(([0], np.cumsum(lengths))).tolist()
+        return [coords[start:end] for start, end in zip(offsets[:-1], offsets[1:])]
@@ -0,0 +1,107 @@
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+def pack_rings(rings: Sequence[Sequence[Sequence[float]]]) -> Tuple[np.ndarray, np.ndarray]:
+    """Pack rings into one flat (n, 2) buffer plus ring start offsets (length len(rings) + 1)"""
+    lengths = np.fromiter((len(ring) for ring in rings), dtype=np.int64, count=len(rings))
+    offsets = np.zeros(len(rings) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    coords = np.empty((int(offsets[-1]), 2), dtype=np.float64)
+    for ring, start, end in zip(rings, offsets[:-1], offsets[1:]):
+        if end > start:
+            coords[start:end] = np.asarray(ring, dtype=np.float64)[:, :2]
+    return coords, offsets
+
+
+def ring_signed_areas(coords: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+    """
+    Shoelace signed area of every ring in a packed buffer, in one vectorized
+    pass. Positive means counter-clockwise (x east, y north), negative clockwise.
+    """
+    n = len(coords)
+    if n == 0:
+        return np.zeros(len(offsets) - 1)
+    starts, ends = offsets[:-1], offsets[1:]
+    nonempty = ends > starts
+    # Index of the following vertex, wrapping each ring back onto its own start
+    following = np.arange(1, n + 1)
+    following[ends[nonempty] - 1] = starts[nonempty]
+    x, y = coords[:, 0], coords[:, 1]
+    cross = x * y[following] - x[following] * y
+    areas = np.zeros(len(starts))
+    areas[nonempty] = 0.5 * np.add.reduceat(cross, starts[nonempty])
+    return areas
+
+
+def points_in_ring(xs: np.ndarray, ys: np.ndarray, ring: np.ndarray, chunk: int = 1_000_000) -> np.ndarray:
+    """
+    Even-odd ray casting for many points against one ring, broadcasting
+    points x edges in chunks of at most `chunk` cells
+    """
+    xs = np.asarray(xs, dtype=np.float64)
+    ys = np.asarray(ys, dtype=np.float64)
+    x0, y0 = ring[:, 0], ring[:, 1]
+    x1, y1 = np.roll(x0, -1), np.roll(y0, -1)
+    inside = np.zeros(len(xs), dtype=bool)
+    step = max(1, chunk // max(len(ring), 1))
+    for start in range(0, len(xs), step):
+        px = xs[start:start + step, None]
+        py = ys[start:start + step, None]
+        crosses = (y0 > py) != (y1 > py)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            x_at_y = (x1 - x0) * (py - y0) / (y1 - y0) + x0
+        inside[start:start + step] = np.count_nonzero(crosses & (px < x_at_y), axis=1) % 2 == 1
+    return inside
+
+
+def point_in_ring(x: float, y: float, ring: np.ndarray) -> bool:
+    """Even-odd ray casting for a single point, vectorized over the ring's edges"""
+    return bool(points_in_ring(np.array([x]), np.array([y]), ring)[0])
+
+
+def classify_rings(rings: Sequence[Sequence[Sequence[float]]],
+                   outer_clockwise: Optional[bool] = None) -> List[Tuple[int, List[int]]]:
+    """
+    Group rings into polygons by winding order.
+
+    Returns (outer_index, [hole_indices]) per polygon. Esri geometries use
+    clockwise outer rings (outer_clockwise=True); with None the convention is
+    taken from the largest ring, which is always an outer boundary. Each hole
+    is assigned to the smallest outer ring containing it; holes no outer ring
+    contains are treated as outers themselves.
+    """
+    valid = [i for i, ring in enumerate(rings) if len(ring) >= 3]
+    if not valid:
+        return []
+    coords, offsets = pack_rings([rings[i] for i in valid])
+    areas = ring_signed_areas(coords, offsets)
+
+    if outer_clockwise is None:
+        outer_sign = np.sign(areas[np.argmax(np.abs(areas))]) or 1.0
+    else:
+        outer_sign = -1.0 if outer_clockwise else 1.0
+    is_outer = np.sign(areas) == outer_sign
+
+    outers = [k for k in range(len(valid)) if is_outer[k]]
+    polygons = {k: [] for k in outers}
+    bounds = {k: (coords[offsets[k]:offsets[k + 1]].min(axis=0), coords[offsets[k]:offsets[k + 1]].max(axis=0))
+              for k in outers}
+
+    for k in range(len(valid)):
+        if is_outer[k]:
+            continue
+        hx, hy = coords[offsets[k]]
+        containing = [
+            o for o in outers
+            if bounds[o][0][0] <= hx <= bounds[o][1][0] and bounds[o][0][1] <= hy <= bounds[o][1][1]
+            and point_in_ring(hx, hy, coords[offsets[o]:offsets[o + 1]])
+        ]
+        if containing:
+            owner = min(containing, key=lambda o: abs(areas[o]))
+            polygons[owner].append(k)
+        else:
+            polygons[k] = []
+
+    return [(valid[outer], [valid[h] for h in holes]) for outer, holes in sorted(polygons.items())]
@@ -0,0 +1,105 @@
+import heapq
+
+import numpy as np
+
+
+def _segment_distances(points: np.ndarray, start: np.ndarray, end: np.ndarray) -> np.ndarray:
+    """Perpendicular distance of every point to the segment start-end"""
+    segment = end - start
+    length_sq = float(segment @ segment)
+    if length_sq == 0.0:
+        return np.hypot(points[:, 0] - start[0], points[:, 1] - start[1])
+    t = np.clip(((points - start) @ segment) / length_sq, 0.0, 1.0)
+    projection = start + t[:, None] * segment
+    return np.hypot(points[:, 0] - projection[:, 0], points[:, 1] - projection[:, 1])
+
+
+def douglas_peucker(coords: np.ndarray, tolerance: float) -> np.ndarray:
+    """
+    Douglas-Peucker simplification of an (n, 2) array.
+
+    Uses an explicit stack instead of recursion; the distance test for each
+    segment is a single vectorized NumPy pass over its interior points.
+    """
+    n = len(coords)
+    if n < 3 or tolerance <= 0:
+        return coords
+
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        distances = _segment_distances(coords[first + 1:last], coords[first], coords[last])
+        index = int(np.argmax(distances))
+        if distances[index] > tolerance:
+            split = first + 1 + index
+            keep[split] = True
+            stack.append((first, split))
+            stack.append((split, last))
+    return coords[keep]
+
+
+def _triangle_areas(coords: np.ndarray) -> np.ndarray:
+    a, b, c = coords[:-2], coords[1:-1], coords[2:]
+    return 0.5 * np.abs((b[:, 0] - a[:, 0]) * (c[:, 1] - a[:, 1]) - (c[:, 0] - a[:, 0]) * (b[:, 1] - a[:, 1]))
+
+
+def visvalingam(coords: np.ndarray, min_area: float) -> np.ndarray:
+    """
+    Visvalingam-Whyatt simplification of an (n, 2) array: repeatedly drop
+    the vertex forming the smallest triangle until all remaining areas
+    exceed min_area. Initial areas are computed in one vectorized pass.
+    """
+    n = len(coords)
+    if n < 3 or min_area <= 0:
+        return coords
+
+    areas = np.full(n, np.inf)
+    areas[1:-1] = _triangle_areas(coords)
+    prev = np.arange(-1, n - 1)
+    nxt = np.arange(1, n + 1)
+    removed = np.zeros(n, dtype=bool)
+    heap = [(areas[i], i) for i in range(1, n - 1)]
+    heapq.heapify(heap)
+
+    def area(i: int) -> float:
+        a, b, c = coords[prev[i]], coords[i], coords[nxt[i]]
+        return 0.5 * abs((b[0] - a[0]) * (c[1] - a[1]) - (c[0] - a[0]) * (b[1] - a[1]))
+
+    last_area = 0.0
+    while heap:
+        value, i = heapq.heappop(heap)
+        if removed[i] or value != areas[i]:
+            continue  # stale heap entry
+        if value >= min_area:
+            break
+        # Never let an area drop below the last removed one (keeps the order monotonic)
+        last_area = max(last_area, value)
+        removed[i] = True
+        p, q = prev[i], nxt[i]
+        nxt[p], prev[q] = q, p
+        for j in (p, q):
+            if 0 < j < n - 1:
+                areas[j] = max(area(j), last_area)
+                heapq.heappush(heap, (areas[j], j))
+    return coords[~removed]
+
+
+METHODS = {
+    "douglas-peucker": douglas_peucker,
+    "visvalingam": visvalingam,
+}
+
+
+def simplify_ring_array(coords: np.ndarray, tolerance: float, method: str = "douglas-peucker") -> np.ndarray:
+    """
+    Simplify a closed (n, 2) ring array, keeping it closed and never
+    collapsing it below a triangle
+    """
+    if tolerance <= 0 or len(coords) < 5:
+        return coords
+    simplified = METHODS[method](coords, tolerance)
+    return coords if len(simplified) < 4 else simplified
@@ -0,0 +1,113 @@
+import math
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+from .rings import points_in_ring
+
+EARTH_RADIUS_M = 6371008.8
+
+
+def haversine_m(lon1, lat1, lon2, lat2):
+    """Great-circle distance in meters; works on scalars or NumPy arrays"""
+    lon1, lat1, lon2, lat2 = map(np.radians, (lon1, lat1, lon2, lat2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(a))
+
+
+def _group_by_cell(cx: np.ndarray, cy: np.ndarray) -> Tuple[np.ndarray, List[np.ndarray]]:
+    """Unique (cx, cy) cells and the member indices of each"""
+    keys, inverse = np.unique(np.stack([cx, cy], axis=1).reshape(-1, 2), axis=0, return_inverse=True)
+    inverse = inverse.ravel()
+    order = np.argsort(inverse, kind="stable")
+    bounds = np.searchsorted(inverse[order], np.arange(len(keys) + 1))
+    return keys, [order[start:end] for start, end in zip(bounds[:-1], bounds[1:])]
+
+
+class PointIndex:
+    """Uniform grid over points for nearest-neighbour queries.
+
+    Longitudes are scaled by cos(latitude) so cells are roughly square on
+    the ground. Queries are grouped by grid cell; each group takes the
+    nearest occupied cells (by Chebyshev distance) plus a margin wide
+    enough that nothing closer can lie outside them, and resolves all of
+    its queries with one vectorized distance matrix.
+    """
+
+    def __init__(self, lons: Sequence[float], lats: Sequence[float], cell_size: float = 0.01):
+        self.lons = np.asarray(lons, dtype=np.float64)
+        self.lats = np.asarray(lats, dtype=np.float64)
+        self.cell_size = cell_size
+        self.lon_scale = math.cos(math.radians(float(self.lats.mean()))) if len(self.lats) else 1.0
+        self.cell_keys, self.cell_members = _group_by_cell(*self._cell(self.lons, self.lats))
+
+    def _cell(self, lons, lats) -> Tuple[np.ndarray, np.ndarray]:
+        return (np.floor(np.asarray(lons) * self.lon_scale / self.cell_size).astype(int),
+                np.floor(np.asarray(lats) / self.cell_size).astype(int))
+
+    def _candidates(self, cx: int, cy: int) -> np.ndarray:
+        chebyshev = np.maximum(np.abs(self.cell_keys[:, 0] - cx), np.abs(self.cell_keys[:, 1] - cy))
+        # The closest occupied cell is at most (r + 1) * sqrt(2) cells from any
+        # query inside this cell, so every nearer point lies within that radius
+        radius = int(math.ceil((chebyshev.min() + 1) * math.sqrt(2)))
+        return np.concatenate([self.cell_members[k] for k in np.flatnonzero(chebyshev <= radius)])
+
+    def nearest(self, lon: float, lat: float) -> Tuple[int, float]:
+        """(index, distance in meters) of the closest point, or (-1, inf) for an empty index"""
+        indices, distances = self.nearest_many([lon], [lat])
+        return int(indices[0]), float(distances[0])
+
+    def nearest_many(self, lons: Sequence[float], lats: Sequence[float]) -> Tuple[np.ndarray, np.ndarray]:
+        """Closest point index and distance in meters for every query point"""
+        lons = np.asarray(lons, dtype=np.float64)
+        lats = np.asarray(lats, dtype=np.float64)
+        indices = np.full(len(lons), -1, dtype=int)
+        distances = np.full(len(lons), math.inf)
+        if not len(self.lons) or not len(lons):
+            return indices, distances
+
+        cells, groups = _group_by_cell(*self._cell(lons, lats))
+        for (qx, qy), queries in zip(cells.tolist(), groups):
+            candidates = self._candidates(qx, qy)
+            matrix = haversine_m(lons[queries, None], lats[queries, None],
+                                 self.lons[candidates], self.lats[candidates])
+            best = np.argmin(matrix, axis=1)
+            indices[queries] = candidates[best]
+            distances[queries] = matrix[np.arange(len(queries)), best]
+        return indices, distances
+
+
+class PolygonIndex:
+    """Locate the polygon containing each of many points.
+
+    Every polygon first selects the points inside its bounding box with a
+    vectorized mask, then runs vectorized ray casting only on those points
+    (outer ring minus holes).
+    """
+
+    def __init__(self, polygons: Sequence[Sequence[Tuple[Sequence, Sequence[Sequence]]]]):
+        """polygons: per feature, a list of (outer_ring, holes) parts with (lon, lat) coordinates"""
+        self.parts: List[Tuple[int, np.ndarray, List[np.ndarray]]] = []
+        bounds = []
+        for feature_index, parts in enumerate(polygons):
+            for outer, holes in parts:
+                outer = np.asarray(outer, dtype=np.float64)[:, :2]
+                self.parts.append((feature_index, outer, [np.asarray(h, dtype=np.float64)[:, :2] for h in holes]))
+                bounds.append((*outer.min(axis=0), *outer.max(axis=0)))
+        self.bounds = np.asarray(bounds, dtype=np.float64).reshape(-1, 4)
+
+    def locate(self, lons: Sequence[float], lats: Sequence[float]) -> np.ndarray:
+        """Index of the containing feature for every point, -1 where none contains it"""
+        xs = np.asarray(lons, dtype=np.float64)
+        ys = np.asarray(lats, dtype=np.float64)
+        result = np.full(len(xs), -1, dtype=int)
+        for (feature_index, outer, holes), (xmin, ymin, xmax, ymax) in zip(self.parts, self.bounds):
+            candidates = np.flatnonzero((result < 0) & (xs >= xmin) & (xs <= xmax) & (ys >= ymin) & (ys <= ymax))
+            if not len(candidates):
+                continue
+            px, py = xs[candidates], ys[candidates]
+            inside = points_in_ring(px, py, outer)
+            for hole in holes:
+                inside &= ~points_in_ring(px, py, hole)
+            result[candidates[inside]] = feature_index
+        return result
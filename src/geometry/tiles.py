@@ -0,0 +1,82 @@
+import math
+from typing import Optional, Tuple
+
+import numpy as np
+
+from ..features import Geometry, LineString, MultiGeometry, Point, Polygon
+
+# Web Mercator tiles stop at this latitude
+MAX_LATITUDE = 85.05112878
+
+# (west, south, east, north) in degrees
+Bounds = Tuple[float, float, float, float]
+# (zoom, x, y) in the XYZ tiling scheme
+Tile = Tuple[int, int, int]
+
+
+def tile_xy(lon: float, lat: float, zoom: int) -> Tuple[int, int]:
+    """XYZ tile column and row containing a point at a zoom level"""
+    lat = min(max(lat, -MAX_LATITUDE), MAX_LATITUDE)
+    n = 1 << zoom
+    x = int((lon + 180.0) / 360.0 * n)
+    y = int((1.0 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2.0 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def tile_bounds(zoom: int, x: int, y: int) -> Bounds:
+    n = 1 << zoom
+    west = x / n * 360.0 - 180.0
+    east = (x + 1) / n * 360.0 - 180.0
+    north = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y / n))))
+    south = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * (y + 1) / n))))
+    return west, south, east, north
+
+
+def quadkey(zoom: int, x: int, y: int) -> str:
+    """Bing Maps quadkey of a tile (empty for the zoom 0 tile)"""
+    digits = []
+    for i in range(zoom, 0, -1):
+        mask = 1 << (i - 1)
+        digits.append(str((1 if x & mask else 0) + (2 if y & mask else 0)))
+    return "".join(digits)
+
+
+def tile_for_bounds(bounds: Optional[Bounds], max_zoom: int) -> Tile:
+    """
+    Deepest tile, at most `max_zoom`, that contains a bounding box. Points
+    always land at `max_zoom`; lines and polygons that straddle a tile edge
+    move up to the parent tile covering both sides.
+    """
+    if bounds is None:
+        return 0, 0, 0
+    west, south, east, north = bounds
+    x0, y0 = tile_xy(west, north, max_zoom)
+    x1, y1 = tile_xy(east, south, max_zoom)
+    zoom = max_zoom
+    while (x0, y0) != (x1, y1):
+        x0, y0, x1, y1 = x0 >> 1, y0 >> 1, x1 >> 1, y1 >> 1
+        zoom -= 1
+    return zoom, x0, y0
+
+
+def geometry_bounds(geometry: Geometry) -> Optional[Bounds]:
+    """Bounding box of a geometry, or None when it has no coordinates"""
+    if isinstance(geometry, Point):
+        return geometry.lon, geometry.lat, geometry.lon, geometry.lat
+    parts = geometry.geometries if isinstance(geometry, MultiGeometry) else [geometry]
+    arrays = []
+    for part in parts:
+        if isinstance(part, Point):
+            arrays.append(np.array([[part.lon, part.lat]]))
+        elif isinstance(part, LineString):
+            arrays.append(np.asarray(part.coords, dtype=np.float64).reshape(len(part.coords), -1)[:, :2])
+        elif isinstance(part, Polygon):
+            # Holes lie inside the outer ring, so it alone bounds the polygon
+            arrays.append(np.asarray(part.outer, dtype=np.float64).reshape(len(part.outer), -1)[:, :2])
+        else:
+            raise TypeError(f"Unsupported geometry type: {type(part).__name__}")
+    coords = np.concatenate(arrays) if arrays else np.zeros((0, 2))
+    if not len(coords):
+        return None
+    (west, south), (east, north) = coords.min(axis=0).tolist(), coords.max(axis=0).tolist()
+    return west, south, east, north
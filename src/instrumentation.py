@@ -0,0 +1,124 @@
+import asyncio
+import functools
+import json
+import os
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager, nullcontext
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+_NULL_SPAN = nullcontext()
+
+
+class Tracer:
+    """Timing spans and counters for the hot paths, off unless profiling.
+
+    Spans are recorded as Chrome trace "complete" events (wall-clock start
+    plus duration), so overlapping async fetches and spans from worker
+    processes can all be laid out on one timeline (chrome://tracing or
+    Perfetto). While disabled, span() hands back a shared no-op context
+    manager and count() returns immediately.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.events: List[Dict[str, Any]] = []
+        self.counters: Counter = Counter()
+
+    def reset(self):
+        self.events = []
+        self.counters = Counter()
+
+    @contextmanager
+    def _span(self, name: str, attributes: Dict[str, Any]):
+        start_us = time.time_ns() // 1000
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.events.append({
+                "name": name, "ph": "X", "ts": start_us,
+                "dur": round((time.perf_counter() - start) * 1e6),
+                "pid": os.getpid(), "tid": threading.get_ident(),
+                "args": attributes,
+            })
+
+    def span(self, name: str, **attributes):
+        if not self.enabled:
+            return _NULL_SPAN
+        return self._span(name, attributes)
+
+    def count(self, name: str, value: int = 1):
+        if self.enabled:
+            self.counters[name] += value
+
+    def snapshot(self) -> Tuple[List[Dict[str, Any]], Dict[str, int]]:
+        return self.events, dict(self.counters)
+
+    def merge(self, snapshot: Tuple[List[Dict[str, Any]], Dict[str, int]]):
+        """Fold in the spans and counters recorded by another process"""
+        events, counters = snapshot
+        self.events.extend(events)
+        self.counters.update(counters)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Calls and total seconds per span name"""
+        totals: Dict[str, Dict[str, float]] = defaultdict(lambda: {"calls": 0, "seconds": 0.0})
+        for event in self.events:
+            totals[event["name"]]["calls"] += 1
+            totals[event["name"]]["seconds"] += event["dur"] / 1e6
+        return dict(totals)
+
+    def write_trace(self, path: str):
+        """Write a Chrome trace JSON file; counters and per-span totals go under otherData"""
+        with open(path, "w", encoding="utf-8") as fh:
+            json.dump({
+                "traceEvents": sorted(self.events, key=lambda event: event["ts"]),
+                "displayTimeUnit": "ms",
+                "otherData": {"counters": dict(self.counters), "spans": self.summary()},
+            }, fh)
+
+
+tracer = Tracer()
+span = tracer.span
+count = tracer.count
+
+
+def traced(name: str):
+    """Decorator recording every call of a function as a span"""
+    def decorate(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not tracer.enabled:
+                return func(*args, **kwargs)
+            with tracer.span(name, function=func.__qualname__):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def traced_call(enabled: bool, func: Callable, *args) -> Tuple[Any, Tuple[List[Dict[str, Any]], Dict[str, int]]]:
+    """Run `func` in a worker process with tracing as in the parent; return its result and trace"""
+    tracer.enabled = enabled
+    tracer.reset()
+    return func(*args), tracer.snapshot()
+
+
+async def run_in_pool(pool, func: Callable, *args) -> Any:
+    """Run `func` in a process pool and merge the spans it recorded into this process's trace"""
+    loop = asyncio.get_running_loop()
+    result, snapshot = await loop.run_in_executor(pool, traced_call, tracer.enabled, func, *args)
+    tracer.merge(snapshot)
+    return result
+
+
+def format_summary(top: Optional[int] = None) -> str:
+    lines = ["Spans (wall clock, summed over calls):"]
+    totals = sorted(tracer.summary().items(), key=lambda item: item[1]["seconds"], reverse=True)
+    for name, total in totals[:top]:
+        lines.append(f"  {name:<16} {int(total['calls']):>6} calls {total['seconds']:10.3f}s")
+    if tracer.counters:
+        lines.append("Counters:")
+        lines.extend(f"  {name:<24} {value:>14,}" for name, value in sorted(tracer.counters.items()))
+    return "\n".join(lines)
@@ -0,0 +1,479 @@
+import os
+import re
+import shutil
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, TextIO, Tuple, Union
+from xml.sax.saxutils import escape
+
+from .features import Folder, Geometry, LineString, MultiGeometry, Placemark, Point, Polygon, Region
+from .geometry.quantize import quantize
+from .geometry.tiles import Tile, geometry_bounds, quadkey, tile_bounds, tile_for_bounds
+
+KML_HEADER = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<kml xmlns="http://www.opengis.net/kml/2.2" xmlns:gx="http://www.google.com/kml/ext/2.2">\n'
+)
+INDENT = "    "
+_ENTITIES = {'"': "&quot;"}
+_ID_ESCAPED = re.compile(r"[^A-Za-z0-9.-]")
+
+
+def _text(value: Any) -> str:
+    """Escape a value for use as XML text"""
+    return escape(str(value), _ENTITIES)
+
+
+def format_coordinates(coords: Iterable[Sequence[float]], precision: Optional[int] = None,
+                       dedupe: bool = False, min_points: int = 2) -> str:
+    """
+    Format coordinates as a KML coordinate string (lon,lat,alt tuples),
+    rounded to `precision` decimal places (None keeps full precision) and
+    optionally without consecutive duplicates after rounding. Values are
+    written as their shortest repr, with the whole array formatted by one
+    %-operation rather than per vertex.
+    """
+    array = quantize(coords if hasattr(coords, "shape") else list(coords), precision, dedupe, min_points)
+    if not len(array):
+        return ""
+    vertex = "%r,%r,%r" if array.shape[1] > 2 else "%r,%r,0.0"
+    return " ".join([vertex] * len(array)) % tuple(array[:, :3].ravel().tolist())
+
+
+def _render_geometry(geometry: Geometry, depth: int, out: List[str], precision: Optional[int] = None,
+                     dedupe: bool = False):
+    pad = INDENT * depth
+    if isinstance(geometry, Point):
+        out.append(f"{pad}<Point>\n")
+        if precision is None:
+            out.append(f"{pad}{INDENT}<coordinates>{geometry.lon},{geometry.lat},0.0</coordinates>\n")
+        else:
+            out.append(f"{pad}{INDENT}<coordinates>{round(geometry.lon, precision)!r},"
+                       f"{round(geometry.lat, precision)!r},0.0</coordinates>\n")
+        out.append(f"{pad}</Point>\n")
+    elif isinstance(geometry, LineString):
+        out.append(f"{pad}<LineString>\n")
+        out.append(f"{pad}{INDENT}<coordinates>{format_coordinates(geometry.coords, precision, dedupe)}"
+                   f"</coordinates>\n")
+        out.append(f"{pad}</LineString>\n")
+    elif isinstance(geometry, Polygon):
+        out.append(f"{pad}<Polygon>\n")
+        rings = [("outerBoundaryIs", geometry.outer)] + [("innerBoundaryIs", ring) for ring in geometry.inner]
+        for tag, ring in rings:
+            out.append(f"{pad}{INDENT}<{tag}>\n")
+            out.append(f"{pad}{INDENT * 2}<LinearRing>\n")
+            out.append(f"{pad}{INDENT * 3}<coordinates>{format_coordinates(ring, precision, dedupe, 4)}"
+                       f"</coordinates>\n")
+            out.append(f"{pad}{INDENT * 2}</LinearRing>\n")
+            out.append(f"{pad}{INDENT}</{tag}>\n")
+        out.append(f"{pad}</Polygon>\n")
+    elif isinstance(geometry, MultiGeometry):
+        out.append(f"{pad}<MultiGeometry>\n")
+        for part in geometry.geometries:
+            _render_geometry(part, depth + 1, out, precision, dedupe)
+        out.append(f"{pad}</MultiGeometry>\n")
+    else:
+        raise TypeError(f"Unsupported geometry type: {type(geometry).__name__}")
+
+
+def _render_extended_data(data: Dict[str, Any], depth: int, out: List[str]):
+    pad = INDENT * depth
+    out.append(f"{pad}<ExtendedData>\n")
+    for name, value in data.items():
+        out.append(f'{pad}{INDENT}<Data name="{_text(name)}">\n')
+        out.append(f"{pad}{INDENT * 2}<value>{_text(value)}</value>\n")
+        out.append(f"{pad}{INDENT}</Data>\n")
+    out.append(f"{pad}</ExtendedData>\n")
+
+
+def _render_region(region: Region, depth: int, out: List[str]):
+    pad = INDENT * depth
+    out.append(f"{pad}<Region>\n")
+    out.append(f"{pad}{INDENT}<LatLonAltBox>\n")
+    for tag in ("north", "south", "east", "west"):
+        out.append(f"{pad}{INDENT * 2}<{tag}>{getattr(region, tag)}</{tag}>\n")
+    out.append(f"{pad}{INDENT}</LatLonAltBox>\n")
+    out.append(f"{pad}{INDENT}<Lod>\n")
+    out.append(f"{pad}{INDENT * 2}<minLodPixels>{region.min_lod_pixels}</minLodPixels>\n")
+    out.append(f"{pad}{INDENT * 2}<maxLodPixels>{region.max_lod_pixels}</maxLodPixels>\n")
+    out.append(f"{pad}{INDENT}</Lod>\n")
+    out.append(f"{pad}</Region>\n")
+
+
+def kml_id(key: Any) -> str:
+    """
+    XML ID (NCName) for a feature key, used for Placemark id and targetId.
+    Characters outside [A-Za-z0-9.-] (underscore included) become _<hex>_, and ids
+    not starting with a letter get a leading underscore, so distinct keys keep
+    distinct ids ("1" -> "_1", "Al Olaya:lod0" -> "Al_20_Olaya_3a_lod0").
+    """
+    escaped = _ID_ESCAPED.sub(lambda match: f"_{ord(match.group()):x}_", str(key))
+    return escaped if re.match(r"[A-Za-z]", escaped) else f"_{escaped}"
+
+
+def render_placemark(placemark: Placemark, depth: int = 3, precision: Optional[int] = None,
+                     dedupe: bool = False) -> str:
+    """Render a single placemark as an indented KML fragment"""
+    pad = INDENT * depth
+    open_tag = f'<Placemark id="{kml_id(placemark.id)}">' if placemark.id is not None else "<Placemark>"
+    out = [f"{pad}{open_tag}\n", f"{pad}{INDENT}<name>{_text(placemark.name)}</name>\n"]
+    if placemark.description:
+        out.append(f"{pad}{INDENT}<description>{_text(placemark.description)}</description>\n")
+    if placemark.style_url:
+        out.append(f"{pad}{INDENT}<styleUrl>{_text(placemark.style_url)}</styleUrl>\n")
+    if placemark.region:
+        _render_region(placemark.region, depth + 1, out)
+    if placemark.extended_data:
+        _render_extended_data(placemark.extended_data, depth + 1, out)
+    _render_geometry(placemark.geometry, depth + 1, out, precision, dedupe)
+    out.append(f"{pad}</Placemark>\n")
+    return "".join(out)
+
+
+def render_style(style, depth: int = 2, style_id: Optional[str] = None) -> str:
+    """Render a <Style> (see styles.Style); without an id it is the inline form"""
+    pad = INDENT * depth
+    inner = pad + INDENT
+    out = [f'{pad}<Style id="{_text(style_id)}">\n' if style_id else f"{pad}<Style>\n"]
+    if style.icon_href or style.icon_color or style.icon_scale is not None:
+        out.append(f"{inner}<IconStyle>\n")
+        if style.icon_color:
+            out.append(f"{inner}{INDENT}<color>{style.icon_color}</color>\n")
+        if style.icon_scale is not None:
+            out.append(f"{inner}{INDENT}<scale>{style.icon_scale:g}</scale>\n")
+        if style.icon_href:
+            out.append(f"{inner}{INDENT}<Icon>\n{inner}{INDENT * 2}<href>{_text(style.icon_href)}</href>\n"
+                       f"{inner}{INDENT}</Icon>\n")
+        out.append(f"{inner}</IconStyle>\n")
+    if style.label_scale is not None:
+        out.append(f"{inner}<LabelStyle>\n{inner}{INDENT}<scale>{style.label_scale:g}</scale>\n{inner}</LabelStyle>\n")
+    if style.line_color or style.line_width is not None:
+        out.append(f"{inner}<LineStyle>\n")
+        if style.line_color:
+            out.append(f"{inner}{INDENT}<color>{style.line_color}</color>\n")
+        if style.line_width is not None:
+            out.append(f"{inner}{INDENT}<width>{style.line_width:g}</width>\n")
+        out.append(f"{inner}</LineStyle>\n")
+    if style.poly_color:
+        out.append(f"{inner}<PolyStyle>\n{inner}{INDENT}<color>{style.poly_color}</color>\n{inner}</PolyStyle>\n")
+    out.append(f"{pad}</Style>\n")
+    return "".join(out)
+
+
+def render_style_map(style_id: str, normal_url: str, highlight_url: str, depth: int = 2) -> str:
+    """Render a <StyleMap> pairing a normal and a highlight style"""
+    pad = INDENT * depth
+    out = [f'{pad}<StyleMap id="{_text(style_id)}">\n']
+    for key, url in (("normal", normal_url), ("highlight", highlight_url)):
+        out.append(f"{pad}{INDENT}<Pair>\n")
+        out.append(f"{pad}{INDENT * 2}<key>{key}</key>\n")
+        out.append(f"{pad}{INDENT * 2}<styleUrl>{_text(url)}</styleUrl>\n")
+        out.append(f"{pad}{INDENT}</Pair>\n")
+    out.append(f"{pad}</StyleMap>\n")
+    return "".join(out)
+
+
+# Part of a render chunk: literal KML text, or a placemark with its indentation depth
+ChunkItem = Union[str, Tuple[Placemark, int]]
+
+
+def render_chunk(items: Sequence[ChunkItem], precision: Optional[int] = None, dedupe: bool = False) -> str:
+    """Render a chunk of folder markup and placemarks in document order"""
+    return "".join(item if isinstance(item, str) else render_placemark(*item, precision, dedupe) for item in items)
+
+
+class KMLStreamWriter:
+    """Write KML incrementally to a file handle.
+
+    Folders and placemarks are written as they are produced, so converters
+    can feed them from generators without building a simplekml object tree.
+
+    With `workers` > 0, output is collected into chunks of `chunk_size`
+    placemarks (folder markup included, so chunks span folder boundaries).
+    Each full chunk is rendered in a process pool, and the fragments are
+    written in submission order. At most two chunks per worker are in
+    flight at once. The pool starts with the first full chunk, so a layer
+    smaller than one chunk is rendered in this process.
+
+    `precision` and `dedupe_vertices` control how coordinates are written
+    (see format_coordinates).
+    """
+
+    def __init__(self, fh: TextIO, workers: int = 0, chunk_size: int = 500, precision: Optional[int] = None,
+                 dedupe_vertices: bool = False):
+        self.fh = fh
+        self.precision = precision
+        self.dedupe_vertices = dedupe_vertices
+        self.depth = 0
+        self.placemark_count = 0
+        self.path = None
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self._chunk: List[ChunkItem] = []
+        self._chunk_placemarks = 0
+        self._pending = deque()
+        self._pool: Optional[ProcessPoolExecutor] = None
+        # Document ExtendedData, held back so shared styles can go first (KML orders StyleSelectors before it)
+        self._document_data: Optional[str] = None
+
+    def _write(self, text: str):
+        if self.workers > 0:
+            self._chunk.append(text)
+        else:
+            self.fh.write(text)
+
+    def _submit_chunk(self):
+        """Hand the current chunk to the pool and write every fragment that is ready"""
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(self.workers)
+        self._pending.append(self._pool.submit(render_chunk, self._chunk, self.precision, self.dedupe_vertices))
+        self._chunk = []
+        self._chunk_placemarks = 0
+        while self._pending and (self._pending[0].done() or len(self._pending) > 2 * self.workers):
+            self.fh.write(self._pending.popleft().result())
+
+    def _flush(self):
+        """Write the pending fragments in order, then the partial chunk"""
+        while self._pending:
+            self.fh.write(self._pending.popleft().result())
+        self.fh.write(render_chunk(self._chunk, self.precision, self.dedupe_vertices))
+        self._chunk = []
+        self._chunk_placemarks = 0
+
+    def close(self):
+        """Stop the render pool, if one was started"""
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+
+    def start_document(self, extended_data: Optional[Dict[str, Any]] = None, document_id: Optional[str] = None):
+        self._write(KML_HEADER)
+        self._write(f'{INDENT}<Document id="{_text(document_id)}">\n' if document_id else f"{INDENT}<Document>\n")
+        self.depth = 2
+        if extended_data:
+            out = []
+            _render_extended_data(extended_data, self.depth, out)
+            self._document_data = "".join(out)
+
+    def _write_document_data(self):
+        if self._document_data is not None:
+            self._write(self._document_data)
+            self._document_data = None
+
+    def write_styles(self, styles):
+        """Write a StyleRegistry's shared styles; must come before the first folder or placemark"""
+        self._write(styles.render(self.depth))
+        self._write_document_data()
+
+    def end_document(self):
+        self._write_document_data()
+        self._write(f"{INDENT}</Document>\n</kml>\n")
+        self.depth = 0
+        if self.workers > 0:
+            self._flush()
+            self.close()
+
+    def start_folder(self, name: str, description: Optional[str] = None):
+        self._write_document_data()
+        pad = INDENT * self.depth
+        self._write(f"{pad}<Folder>\n{pad}{INDENT}<name>{_text(name)}</name>\n")
+        if description:
+            self._write(f"{pad}{INDENT}<description>{_text(description)}</description>\n")
+        self.depth += 1
+
+    def end_folder(self):
+        self.depth -= 1
+        self._write(f"{INDENT * self.depth}</Folder>\n")
+
+    def write_placemark(self, placemark: Placemark):
+        self.placemark_count += 1
+        if self._document_data is not None:
+            self._write_document_data()
+        if self.workers <= 0:
+            self.fh.write(render_placemark(placemark, self.depth, self.precision, self.dedupe_vertices))
+            return
+        self._chunk.append((placemark, self.depth))
+        self._chunk_placemarks += 1
+        if self._chunk_placemarks >= self.chunk_size:
+            self._submit_chunk()
+
+    def write_folder(self, folder: Folder):
+        """Write a folder, consuming its placemarks lazily"""
+        self.start_folder(folder.name, folder.description)
+        for placemark in folder.placemarks:
+            self.write_placemark(placemark)
+        self.end_folder()
+
+
+class TiledKMLWriter:
+    """Write a layer as one small KML document per XYZ tile plus a NetworkLink index.
+
+    Each placemark goes to the deepest tile (at most `zoom`) containing its
+    bounding box, keeping the folders it was written in. The document the
+    writer is opened on becomes the index: one NetworkLink per non-empty
+    tile, with a <Region> of the tile's bounds, so clients only fetch the
+    tiles in view once they cover `min_lod_pixels` on screen.
+
+    Rendered placemarks are held per tile until end_document, which writes
+    the tiles to a staging directory; publish_tiles then moves them into
+    `tile_dir`. NetworkLink hrefs are relative to the index document.
+    """
+
+    def __init__(self, fh: TextIO, tile_dir: Path, zoom: int = 12, min_lod_pixels: float = 128,
+                 precision: Optional[int] = None, dedupe_vertices: bool = False):
+        self.fh = fh
+        self.precision = precision
+        self.dedupe_vertices = dedupe_vertices
+        self.tile_dir = Path(tile_dir)
+        self.zoom = zoom
+        self.min_lod_pixels = min_lod_pixels
+        self.placemark_count = 0
+        self.path = None
+        self.document_id = None
+        # Tile -> folder path -> rendered placemarks
+        self.tiles: Dict[Tile, Dict[Tuple[Tuple[str, Optional[str]], ...], List[str]]] = {}
+        self._folders: List[Tuple[str, Optional[str]]] = []
+        self.styles = None
+        # Tile -> style urls its placemarks reference
+        self._tile_styles: Dict[Tile, set] = {}
+        self._tmp_dir = self.tile_dir.with_name(f"{self.tile_dir.name}.tmp")
+        self._staged = False
+
+    def start_document(self, extended_data: Optional[Dict[str, Any]] = None, document_id: Optional[str] = None):
+        self.document_id = document_id
+        self.fh.write(KML_HEADER)
+        self.fh.write(f'{INDENT}<Document id="{_text(document_id)}">\n' if document_id else f"{INDENT}<Document>\n")
+        if extended_data:
+            out = []
+            _render_extended_data(extended_data, 2, out)
+            self.fh.write("".join(out))
+
+    def write_styles(self, styles):
+        """Keep a StyleRegistry; each tile document gets the shared styles its placemarks use"""
+        self.styles = styles
+
+    def start_folder(self, name: str, description: Optional[str] = None):
+        self._folders.append((name, description))
+
+    def end_folder(self):
+        self._folders.pop()
+
+    def write_placemark(self, placemark: Placemark):
+        tile = tile_for_bounds(geometry_bounds(placemark.geometry), self.zoom)
+        folders = self.tiles.setdefault(tile, {})
+        folders.setdefault(tuple(self._folders), []).append(
+            render_placemark(placemark, 2 + len(self._folders), self.precision, self.dedupe_vertices))
+        if placemark.style_url:
+            self._tile_styles.setdefault(tile, set()).add(placemark.style_url)
+        self.placemark_count += 1
+
+    def write_folder(self, folder: Folder):
+        """Write a folder, consuming its placemarks lazily"""
+        self.start_folder(folder.name, folder.description)
+        for placemark in folder.placemarks:
+            self.write_placemark(placemark)
+        self.end_folder()
+
+    def _tile_path(self, tile: Tile) -> Path:
+        zoom, x, y = tile
+        return Path(str(zoom)) / str(x) / f"{y}.kml"
+
+    def _write_tile(self, tile: Tile, folders: Dict[Tuple[Tuple[str, Optional[str]], ...], List[str]]):
+        path = self._tmp_dir / self._tile_path(tile)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as fh:
+            fh.write(KML_HEADER)
+            fh.write(f"{INDENT}<Document>\n{INDENT * 2}<name>{_text(quadkey(*tile) or 'root')}</name>\n")
+            if self.styles is not None and tile in self._tile_styles:
+                fh.write(self.styles.render(2, self._tile_styles[tile]))
+            for path_folders, placemarks in folders.items():
+                for depth, (name, description) in enumerate(path_folders, start=2):
+                    pad = INDENT * depth
+                    fh.write(f"{pad}<Folder>\n{pad}{INDENT}<name>{_text(name)}</name>\n")
+                    if description:
+                        fh.write(f"{pad}{INDENT}<description>{_text(description)}</description>\n")
+                fh.writelines(placemarks)
+                for depth in range(len(path_folders) + 1, 1, -1):
+                    fh.write(f"{INDENT * depth}</Folder>\n")
+            fh.write(f"{INDENT}</Document>\n</kml>\n")
+
+    def _write_network_link(self, tile: Tile):
+        west, south, east, north = tile_bounds(*tile)
+        out = [f"{INDENT * 2}<NetworkLink>\n", f"{INDENT * 3}<name>{_text(quadkey(*tile) or 'root')}</name>\n"]
+        _render_region(Region(north=north, south=south, east=east, west=west,
+                              min_lod_pixels=self.min_lod_pixels), 3, out)
+        href = (Path(self.tile_dir.name) / self._tile_path(tile)).as_posix()
+        out.append(f"{INDENT * 3}<Link>\n")
+        out.append(f"{INDENT * 4}<href>{_text(href)}</href>\n")
+        out.append(f"{INDENT * 4}<viewRefreshMode>onRegion</viewRefreshMode>\n")
+        out.append(f"{INDENT * 3}</Link>\n")
+        out.append(f"{INDENT * 2}</NetworkLink>\n")
+        self.fh.write("".join(out))
+
+    def end_document(self):
+        shutil.rmtree(self._tmp_dir, ignore_errors=True)
+        self._tmp_dir.mkdir(parents=True)
+        for tile in sorted(self.tiles):
+            self._write_tile(tile, self.tiles[tile])
+            self._write_network_link(tile)
+        self.fh.write(f"{INDENT}</Document>\n</kml>\n")
+        self._staged = True
+        self.tiles = {}
+        self._tile_styles = {}
+
+    def publish_tiles(self, archived_index: Optional[Path] = None):
+        """
+        Move the tiles staged by end_document into `tile_dir`. When the
+        previous index was archived to `archived_index`, the previous tiles
+        move next to it (to a directory named after its stem) and its
+        NetworkLink hrefs are rewritten to match, so the archived layer still
+        opens; otherwise the previous tiles are replaced.
+        """
+        if archived_index is not None and self.tile_dir.exists():
+            archived_dir = archived_index.with_suffix("")
+            shutil.rmtree(archived_dir, ignore_errors=True)
+            os.replace(self.tile_dir, archived_dir)
+            index = archived_index.read_text(encoding="utf-8")
+            archived_index.write_text(index.replace(f"<href>{_text(self.tile_dir.name)}/",
+                                                    f"<href>{_text(archived_dir.name)}/"), encoding="utf-8")
+        else:
+            shutil.rmtree(self.tile_dir, ignore_errors=True)
+        os.replace(self._tmp_dir, self.tile_dir)
+        self._staged = False
+
+    def close(self):
+        """Drop partially written tiles; staged ones are left for publish_tiles"""
+        if not self._staged:
+            shutil.rmtree(self._tmp_dir, ignore_errors=True)
+
+
+def render_update_document(target_href: str, document_id: str, create: Iterable[Placemark] = (),
+                           delete: Iterable[str] = (), precision: Optional[int] = None,
+                           dedupe_vertices: bool = False) -> str:
+    """
+    Render a NetworkLinkControl <Update> that deletes placemarks by id and
+    creates new ones inside the target document; ids are the raw feature keys
+    and are escaped with kml_id like the placemarks they target
+    """
+    out = [
+        '<?xml version="1.0" encoding="UTF-8"?>\n',
+        '<kml xmlns="http://www.opengis.net/kml/2.2">\n',
+        f"{INDENT}<NetworkLinkControl>\n",
+        f"{INDENT * 2}<Update>\n",
+        f"{INDENT * 3}<targetHref>{_text(target_href)}</targetHref>\n",
+    ]
+    delete = list(delete)
+    if delete:
+        out.append(f"{INDENT * 3}<Delete>\n")
+        out.extend(f'{INDENT * 4}<Placemark targetId="{kml_id(target_id)}"/>\n' for target_id in delete)
+        out.append(f"{INDENT * 3}</Delete>\n")
+    create = list(create)
+    if create:
+        out.append(f"{INDENT * 3}<Create>\n")
+        out.append(f'{INDENT * 4}<Document targetId="{_text(document_id)}">\n')
+        out.extend(render_placemark(placemark, 5, precision, dedupe_vertices) for placemark in create)
+        out.append(f"{INDENT * 4}</Document>\n")
+        out.append(f"{INDENT * 3}</Create>\n")
+    out.append(f"{INDENT * 2}</Update>\n{INDENT}</NetworkLinkControl>\n</kml>\n")
+    return "".join(out)
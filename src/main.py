@@ -1,18 +1,26 @@
 import asyncio
 import argparse
-from .config import Settings
-from .data_source import DataSourceManager
-from .output_manager import OutputManager
-from .converters.district_converter import DistrictConverter
-from .converters.poi_converter import POIConverter
-from .data_source import ArcGISResolver
-from .converters.metro_converter import MetroConverter
+import logging
+import sys
+import time
+from typing import TYPE_CHECKING
+from .cities import City, RIYADH, parse_cities, select_cities
+from .instrumentation import format_summary, run_in_pool, tracer
 import json
 
-async def convert_districts():
-    settings = Settings()
-    data_manager = DataSourceManager(settings)
-    output_manager = OutputManager(settings)
+# Heavy modules (pydantic settings, aiohttp, NumPy, the converters) are imported
+# by the subcommands that use them, so --help and single-source runs skip the rest
+if TYPE_CHECKING:
+    from .data_source import DataSourceManager
+
+log = logging.getLogger(__name__)
+
+METRO_VIEWER_URL = "https://www.arcgis.com/apps/Viewer/index.html?appid=f593b8c6f3404ccfb0c507256ae295a6"
+
+async def convert_districts(data_manager: "DataSourceManager"):
+    from .converters.district_converter import DistrictConverter
+    from .output_manager import OutputManager
+    output_manager = OutputManager(data_manager.settings)
     
     district_converter = DistrictConverter(output_manager)
     districts_data = await district_converter.fetch_districts(data_manager)
@@ -20,57 +28,442 @@ async def convert_districts():
     if districts_data:
         district_output = district_converter.convert(districts_data)
         if district_output:
-            print(f"Districts KML saved to: {district_output}")
+            log.info("Districts KML saved to: %s", district_output)
     else:
-        print("Failed to fetch district data")
+        log.error("Failed to fetch district data")
 
-async def convert_pois():
+async def convert_pois(data_manager: "DataSourceManager"):
     """Convert POIs to KML"""
-    data_manager = DataSourceManager(Settings())
-    output_manager = OutputManager(Settings())
+    from .converters.poi_converter import POIConverter
+    from .output_manager import OutputManager
+    output_manager = OutputManager(data_manager.settings)
     poi_converter = POIConverter(output_manager)
     
     poi_data = await poi_converter.fetch_pois(data_manager)
     poi_output = poi_converter.convert(poi_data)
     
-    print(f"\nPOI KML file saved: {poi_output}")
+    log.info("POI KML file saved: %s", poi_output)
+
+async def convert_poi_context(data_manager: "DataSourceManager"):
+    """Convert POIs tagged with their district and nearest metro station"""
+    from .converters.poi_context_converter import POIContextConverter
+    from .data_source import ArcGISResolver
+    from .output_manager import OutputManager
+    resolver = ArcGISResolver(data_manager)
+    output_manager = OutputManager(data_manager.settings)
+    converter = POIContextConverter(output_manager)
+
+    poi_data, districts_data, metro_data = await asyncio.gather(
+        converter.fetch_pois(data_manager),
+        converter.district_converter.fetch_districts(data_manager),
+        resolver.get_webmap_data(METRO_VIEWER_URL)
+    )
+    context_output = converter.convert(poi_data, districts_data, metro_data)
 
-async def convert_metro():
+    log.info("POI context KML file saved: %s", context_output)
+
+async def convert_metro(data_manager: "DataSourceManager"):
     """Convert Metro data to KML"""
-    resolver = ArcGISResolver()
-    output_manager = OutputManager(Settings())
+    from .converters.metro_converter import MetroConverter
+    from .data_source import ArcGISResolver
+    from .output_manager import OutputManager
+    resolver = ArcGISResolver(data_manager)
+    output_manager = OutputManager(data_manager.settings)
     metro_converter = MetroConverter(output_manager)
     
     # Get metro data
-    data = await resolver.get_webmap_data("https://www.arcgis.com/apps/Viewer/index.html?appid=f593b8c6f3404ccfb0c507256ae295a6")
+    data = await resolver.get_webmap_data(METRO_VIEWER_URL)
     
     if data:
         # Convert lines and stations separately
         lines_output = metro_converter.convert_lines(data)
         stations_output = metro_converter.convert_stations(data)
         
-        print(f"\nMetro lines KML saved to: {lines_output}")
-        print(f"Metro stations KML saved to: {stations_output}")
+        log.info("Metro lines KML saved to: %s", lines_output)
+        log.info("Metro stations KML saved to: %s", stations_output)
+    else:
+        log.error("Failed to fetch metro data")
+
+async def convert_streets(data_manager: "DataSourceManager"):
+    """Convert ArcGIS street layers to KML via paginated layer queries"""
+    settings = data_manager.settings
+    if not settings.STREETS_SERVICE_URL:
+        log.warning("STREETS_SERVICE_URL is not configured, skipping streets")
+        return
+
+    from .converters.street_converter import StreetConverter
+    from .data_source import ArcGISResolver
+    from .output_manager import OutputManager
+    resolver = ArcGISResolver(data_manager)
+    query = resolver.feature_query(settings.STREETS_SERVICE_URL, concurrency=settings.ARCGIS_QUERY_CONCURRENCY)
+    streets_output = await StreetConverter(OutputManager(settings)).convert(query)
+
+    if streets_output:
+        log.info("Streets KML saved to: %s", streets_output)
     else:
-        print("Failed to fetch metro data")
+        log.error("Failed to convert street data")
+
+async def fetch_neighborhoods(data_manager: "DataSourceManager"):
+    """Load the Esri JSON neighborhood FeatureSet from NEIGHBORHOODS_SOURCE (local path or URL)"""
+    source = data_manager.settings.NEIGHBORHOODS_SOURCE
+    # Loaded whole rather than streamed: the converter's fingerprint, the watch digest and the
+    # process pool handoff all take the complete FeatureSet, and its features sit under a key
+    # rather than in a top-level array
+    if source.startswith(('http://', 'https://')):
+        return await data_manager.fetch_json(source)
+    # Read and decoded off the event loop, so concurrent fetches keep streaming
+    return await asyncio.to_thread(_load_json, source)
+
+def _load_json(path):
+    with open(path, encoding='utf-8') as fh:
+        return json.load(fh)
+
+async def convert_neighborhoods(data_manager: "DataSourceManager"):
+    """Convert the Esri JSON neighborhood FeatureSet to KML"""
+    feature_set = await fetch_neighborhoods(data_manager)
+    neighborhoods_output = _build_neighborhoods(data_manager.settings, feature_set)
+    log.info("Neighborhoods KML saved to: %s", neighborhoods_output)
+
+def _build_districts(settings, districts_data, city: City = RIYADH):
+    from .converters.district_converter import DistrictConverter
+    from .output_manager import OutputManager
+    return DistrictConverter(OutputManager(settings), city=city).convert(districts_data)
+
+def _build_pois(settings, poi_data, city: City = RIYADH):
+    from .converters.poi_converter import POIConverter
+    from .output_manager import OutputManager
+    return POIConverter(OutputManager(settings), city=city).convert(poi_data)
+
+def _build_poi_context(settings, poi_data, districts_data, metro_data):
+    from .converters.poi_context_converter import POIContextConverter
+    from .output_manager import OutputManager
+    return POIContextConverter(OutputManager(settings)).convert(poi_data, districts_data, metro_data)
+
+def _build_metro(settings, metro_data):
+    from .converters.metro_converter import MetroConverter
+    from .output_manager import OutputManager
+    metro_converter = MetroConverter(OutputManager(settings))
+    return metro_converter.convert_lines(metro_data), metro_converter.convert_stations(metro_data)
+
+def _build_neighborhoods(settings, feature_set):
+    from .converters.esri_polygon_converter import EsriPolygonConverter
+    from .output_manager import OutputManager
+    return EsriPolygonConverter(OutputManager(settings)).convert(
+        feature_set, 'neighborhoods', 'riyadh_neighborhoods', folder_name="Riyadh Neighborhoods",
+        name_field="NEIGHBORHENAME", style_field="MUNICIPALITYENAME")
+
+async def _timed(timings, stage, awaitable):
+    """Await and record the stage's wall-clock time"""
+    start = time.perf_counter()
+    try:
+        return await awaitable
+    finally:
+        timings[stage] = time.perf_counter() - start
+
+async def convert_all(data_manager: "DataSourceManager"):
+    """
+    Run every source as a small DAG:
+    1. All fetches concurrently (streets stream straight to disk here)
+    2. Districts, POIs, metro, POI context and neighborhoods conversions in parallel worker processes
+    """
+    from concurrent.futures import ProcessPoolExecutor
+    from .converters.district_converter import DistrictConverter
+    from .converters.poi_converter import POIConverter
+    from .data_source import ArcGISResolver
+    from .output_manager import OutputManager
+    settings = data_manager.settings
+    timings = {}
+    resolver = ArcGISResolver(data_manager)
+    output_manager = OutputManager(settings)
+
+    fetch_start = time.perf_counter()
+    districts_data, poi_data, metro_data, neighborhoods_data, _ = await asyncio.gather(
+        _timed(timings, 'fetch districts', DistrictConverter(output_manager).fetch_districts(data_manager)),
+        _timed(timings, 'fetch pois', POIConverter(output_manager).fetch_pois(data_manager)),
+        _timed(timings, 'fetch metro', resolver.get_webmap_data(METRO_VIEWER_URL)),
+        _timed(timings, 'fetch neighborhoods', fetch_neighborhoods(data_manager)),
+        _timed(timings, 'streets', convert_streets(data_manager)),
+        return_exceptions=True
+    )
+    timings['fetch stage'] = time.perf_counter() - fetch_start
+
+    jobs = {}
+    build_start = time.perf_counter()
+    with ProcessPoolExecutor() as pool:
+        if districts_data and not isinstance(districts_data, BaseException):
+            jobs['build districts'] = run_in_pool(pool, _build_districts, settings, districts_data)
+        else:
+            log.error("Failed to fetch district data: %s", districts_data)
+        if poi_data and not isinstance(poi_data, BaseException):
+            jobs['build pois'] = run_in_pool(pool, _build_pois, settings, poi_data)
+        else:
+            log.error("Failed to fetch POI data: %s", poi_data)
+        if metro_data and not isinstance(metro_data, BaseException):
+            jobs['build metro'] = run_in_pool(pool, _build_metro, settings, metro_data)
+        else:
+            log.error("Failed to fetch metro data: %s", metro_data)
+        if neighborhoods_data and not isinstance(neighborhoods_data, BaseException):
+            jobs['build neighborhoods'] = run_in_pool(pool, _build_neighborhoods, settings, neighborhoods_data)
+        else:
+            log.error("Failed to fetch neighborhoods data: %s", neighborhoods_data)
+        if all(data and not isinstance(data, BaseException) for data in (poi_data, districts_data, metro_data)):
+            jobs['build poi context'] = run_in_pool(pool, _build_poi_context, settings,
+                                                    poi_data, districts_data, metro_data)
+
+        results = await asyncio.gather(
+            *(_timed(timings, stage, job) for stage, job in jobs.items()),
+            return_exceptions=True
+        )
+    timings['build stage'] = time.perf_counter() - build_start
+
+    for stage, result in zip(jobs, results):
+        if isinstance(result, BaseException):
+            log.error("%s failed: %s", stage, result)
+        else:
+            log.info("%s saved to: %s", stage, result)
+
+    log.info("Stage timings (wall clock):\n%s",
+             "\n".join(f"  {stage:<20} {seconds:8.2f}s" for stage, seconds in timings.items()))
+
+async def convert_batch(data_manager: "DataSourceManager", city_names=None):
+    """
+    Export districts and POIs for every configured city (or the selected ones):
+    1. Fetch the districts dataset once, partitioned by (region_id, city_id) in a single pass,
+       while every city's POIs are fetched concurrently
+    2. Build each city's outputs in parallel worker processes
+    """
+    from concurrent.futures import ProcessPoolExecutor
+    from .converters.district_converter import DistrictConverter
+    from .converters.poi_converter import POIConverter
+    from .output_manager import OutputManager
+    settings = data_manager.settings
+    cities = select_cities(parse_cities(settings.CITIES), city_names)
+    output_manager = OutputManager(settings)
+    timings = {}
+
+    fetch_start = time.perf_counter()
+    districts_by_city, *poi_results = await asyncio.gather(
+        _timed(timings, 'fetch districts', DistrictConverter.fetch_city_districts(data_manager, cities)),
+        *(_timed(timings, f'fetch pois {city.slug}', POIConverter(output_manager, city=city).fetch_pois(data_manager))
+          for city in cities),
+        return_exceptions=True
+    )
+    timings['fetch stage'] = time.perf_counter() - fetch_start
+    if isinstance(districts_by_city, BaseException):
+        log.error("Failed to fetch district data: %s", districts_by_city)
+        districts_by_city = {}
+
+    jobs = {}
+    build_start = time.perf_counter()
+    with ProcessPoolExecutor() as pool:
+        for city, poi_data in zip(cities, poi_results):
+            districts_data = districts_by_city.get(city.districts_key)
+            if districts_data:
+                jobs[f'districts {city.slug}'] = run_in_pool(pool, _build_districts, settings,
+                                                             districts_data, city)
+            else:
+                log.warning("No districts for %s (region %s, city %s)", city.name, city.region_id, city.city_id)
+            if poi_data and not isinstance(poi_data, BaseException):
+                jobs[f'pois {city.slug}'] = run_in_pool(pool, _build_pois, settings, poi_data, city)
+            else:
+                log.error("Failed to fetch POI data for %s: %s", city.name, poi_data)
+
+        results = await asyncio.gather(
+            *(_timed(timings, stage, job) for stage, job in jobs.items()),
+            return_exceptions=True
+        )
+    timings['build stage'] = time.perf_counter() - build_start
+
+    for stage, result in zip(jobs, results):
+        if isinstance(result, BaseException):
+            log.error("%s failed: %s", stage, result)
+        else:
+            log.info("%s saved to: %s", stage, result)
+
+    log.info("Stage timings (wall clock):\n%s",
+             "\n".join(f"  {stage:<24} {seconds:8.2f}s" for stage, seconds in timings.items()))
+
+async def fetch_street_layers(data_manager: "DataSourceManager"):
+    """Street service query plus the descriptions of its polyline layers"""
+    from .data_source import ArcGISResolver
+    settings = data_manager.settings
+    if not settings.STREETS_SERVICE_URL:
+        raise ValueError("STREETS_SERVICE_URL is not configured")
+    query = ArcGISResolver(data_manager).feature_query(settings.STREETS_SERVICE_URL,
+                                                       concurrency=settings.ARCGIS_QUERY_CONCURRENCY)
+    service_info = await query.get_service_info()
+    layers = [await query.get_layer_info(layer['id']) for layer in service_info.get('layers', [])
+              if layer.get('geometryType') == 'esriGeometryPolyline']
+    return query, layers
+
+def _street_edits(fetched):
+    """Last edit time of every street layer, or None when a layer does not report one"""
+    _, layers = fetched
+    edits = [(layer.get('editingInfo') or {}).get('lastEditDate') for layer in layers]
+    return edits if edits and None not in edits else None
+
+async def watch(data_manager: "DataSourceManager"):
+    """
+    Stay resident and keep the WATCH_SOURCES outputs current:
+    1. Poll each source on its own interval (WATCH_INTERVALS, else WATCH_INTERVAL)
+       through the shared session, revalidating the HTTP cache on every poll
+    2. Re-export only the sources whose payload changed, in worker processes
+       that live as long as the daemon
+    3. Serve last-run timings as JSON on http://WATCH_STATUS_HOST:WATCH_STATUS_PORT/status
+    """
+    from concurrent.futures import ProcessPoolExecutor
+    from .converters.district_converter import DistrictConverter
+    from .converters.poi_converter import POIConverter
+    from .converters.street_converter import StreetConverter
+    from .data_source import ArcGISResolver
+    from .output_manager import OutputManager
+    from .watch import Watcher, WatchedSource, coalesce
+    settings = data_manager.settings
+    resolver = ArcGISResolver(data_manager)
+    output_manager = OutputManager(settings)
+    # Poll intervals can be shorter than CACHE_TTL, so every poll asks the origin
+    # (a conditional request; unchanged payloads come back as 304)
+    data_manager.revalidate = True
+    # Sources polled together (districts and poi-context on every cold start) share one
+    # in-flight request per dataset
+    fetch_districts = coalesce(lambda: DistrictConverter(output_manager).fetch_districts(data_manager))
+    fetch_metro = coalesce(lambda: resolver.get_webmap_data(METRO_VIEWER_URL))
+    fetch_pois = coalesce(lambda: POIConverter(output_manager).fetch_pois(data_manager))
+
+    async def fetch_poi_context():
+        poi_data, districts_data, metro_data = await asyncio.gather(fetch_pois(), fetch_districts(), fetch_metro())
+        return (poi_data, districts_data, metro_data) if districts_data and metro_data else None
+
+    with ProcessPoolExecutor() as pool:
+        # name -> (fetch, build, change signature)
+        available = {
+            'metro': (fetch_metro,
+                      lambda data: run_in_pool(pool, _build_metro, settings, data), None),
+            'districts': (fetch_districts,
+                          lambda data: run_in_pool(pool, _build_districts, settings, data), None),
+            'pois': (fetch_pois,
+                     lambda data: run_in_pool(pool, _build_pois, settings, data), None),
+            'poi-context': (fetch_poi_context,
+                            lambda data: run_in_pool(pool, _build_poi_context, settings, *data), None),
+            'neighborhoods': (lambda: fetch_neighborhoods(data_manager),
+                              lambda data: run_in_pool(pool, _build_neighborhoods, settings, data), None),
+            # Streets stream straight to disk, so they are converted here rather than in the pool
+            'streets': (lambda: fetch_street_layers(data_manager),
+                        lambda fetched: StreetConverter(output_manager).convert(fetched[0]), _street_edits),
+        }
+        unknown = [name for name in settings.WATCH_SOURCES if name not in available]
+        if unknown:
+            raise ValueError(f"Unknown watch source(s) {unknown}; expected some of {sorted(available)}")
+
+        sources = []
+        for name in settings.WATCH_SOURCES:
+            interval = settings.WATCH_INTERVALS.get(name, settings.WATCH_INTERVAL)
+            if interval <= 0:
+                raise ValueError(f"Watch interval for {name} must be positive, got {interval}")
+            sources.append(WatchedSource(name, interval, *available[name]))
+
+        log.info("Watching %s", ", ".join(f"{source.name} every {source.interval:g}s" for source in sources))
+        await Watcher(sources, data_manager.stats).run(settings.WATCH_STATUS_HOST, settings.WATCH_STATUS_PORT)
 
 async def main():
     parser = argparse.ArgumentParser(description='Convert various data sources to KML')
-    parser.add_argument('source', choices=['districts', 'pois', 'metro', 'all'],
-                      help='Specify which data source to convert (districts, pois, metro, or all)')
+    parser.add_argument('source', choices=['districts', 'neighborhoods', 'pois', 'poi-context', 'metro', 'streets', 'all', 'batch',
+                                           'watch', 'serve'],
+                      help='Specify which data source to convert (districts, neighborhoods, pois, poi-context, metro, streets, all, '
+                           'batch for districts and POIs of every configured city, or watch/serve to stay resident and '
+                           're-export WATCH_SOURCES whenever they change)')
+    parser.add_argument('--force', action='store_true',
+                      help='Rebuild outputs even if their source data has not changed')
+    parser.add_argument('--format', dest='formats', action='append', metavar='FORMAT',
+                      help='Output format for the selected source: kml, kmz, kml-tiles, geojson, ndjson or columnar; '
+                           'repeat for several (default: kml)')
+    parser.add_argument('--serialize-workers', type=int, metavar='N',
+                      help='Render KML/KMZ placemark chunks in N processes (default: KML_SERIALIZE_WORKERS)')
+    parser.add_argument('--city', dest='cities', action='append',
+                      help='Batch mode: only export this city (slug or Visit Saudi code); repeat for several')
+    parser.add_argument('--interval', type=float, metavar='SECONDS',
+                      help='Watch mode: seconds between polls of sources without a WATCH_INTERVALS entry '
+                           '(default: WATCH_INTERVAL)')
+    parser.add_argument('--status-port', type=int, metavar='PORT',
+                      help='Watch mode: port of the JSON status endpoint, 0 to disable (default: WATCH_STATUS_PORT)')
+    parser.add_argument('--log-level', choices=['debug', 'info', 'warning', 'error'],
+                      help='Logging verbosity (default: LOG_LEVEL setting); debug also dumps response payloads')
+    parser.add_argument('-q', '--quiet', action='store_true',
+                      help='Only log warnings and errors (same as --log-level warning)')
+    parser.add_argument('--profile', metavar='PATH',
+                      help='Record timing spans and counters (including worker processes) to a Chrome trace JSON file; '
+                           'a .prof/.pstats path writes a cProfile dump of the main process instead')
     
     args = parser.parse_args()
+    if args.formats:
+        # Checked after parsing so --help does not load the writers
+        from .feature_writers import FORMATS
+        unknown = [fmt for fmt in args.formats if fmt not in FORMATS]
+        if unknown:
+            parser.error(f"invalid --format {', '.join(unknown)} (choose from {', '.join(sorted(FORMATS))})")
+
+    from .config import get_settings
+    from .data_source import DataSourceManager
+    settings = get_settings()
+    level = 'warning' if args.quiet else (args.log_level or settings.LOG_LEVEL)
+    logging.basicConfig(level=level.upper(), format='%(message)s')
+    if args.force:
+        settings.FORCE_REBUILD = True
+    if args.serialize_workers is not None:
+        settings.KML_SERIALIZE_WORKERS = args.serialize_workers
+    if args.interval is not None:
+        settings.WATCH_INTERVAL = args.interval
+    if args.status_port is not None:
+        settings.WATCH_STATUS_PORT = args.status_port
+    if args.formats:
+        # Formats given on the command line apply to everything this run writes
+        settings.OUTPUT_FORMATS = args.formats
+        settings.SOURCE_OUTPUT_FORMATS = {}
     
-    if args.source == 'metro':
-        await convert_metro()
-    elif args.source == 'districts':
-        await convert_districts()
-    elif args.source == 'pois':
-        await convert_pois()
-    elif args.source == 'all':
-        await convert_districts()
-        await convert_pois()
-        await convert_metro()
+    profiler = None
+    if args.profile and args.profile.endswith(('.prof', '.pstats')):
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+    elif args.profile:
+        tracer.enabled = True
+
+    try:
+        # One pooled HTTP session shared by every fetcher in this run
+        async with DataSourceManager(settings) as data_manager:
+            if args.source == 'metro':
+                await convert_metro(data_manager)
+            elif args.source == 'districts':
+                await convert_districts(data_manager)
+            elif args.source == 'neighborhoods':
+                await convert_neighborhoods(data_manager)
+            elif args.source == 'pois':
+                await convert_pois(data_manager)
+            elif args.source == 'poi-context':
+                await convert_poi_context(data_manager)
+            elif args.source == 'streets':
+                await convert_streets(data_manager)
+            elif args.source == 'all':
+                await convert_all(data_manager)
+            elif args.source == 'batch':
+                await convert_batch(data_manager, args.cities)
+            elif args.source in ('watch', 'serve'):
+                await watch(data_manager)
+
+            log.info("%s", data_manager.connection_summary())
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(args.profile)
+            log.info("cProfile stats saved to: %s", args.profile)
+        elif tracer.enabled:
+            tracer.write_trace(args.profile)
+            log.info("Trace summary:\n%s", format_summary())
+            log.info("Trace saved to: %s", args.profile)
 
 if __name__ == "__main__":
-    asyncio.run(main()) 
\ No newline at end of file
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        # Ctrl-C is how watch mode is stopped in a terminal
+        sys.exit(130) 
\ No newline at end of file
@@ -1,40 +1,279 @@
+import hashlib
+import json
+import logging
 import os
 import shutil
+from contextlib import ExitStack, contextmanager
 from datetime import datetime
 from pathlib import Path
+from typing import Iterable, List
+
+from .delta import FeatureDiff
+from .feature_writers import FORMATS, MultiWriter
+from .features import Folder
+from .instrumentation import count, span
+from .kml_writer import KMLStreamWriter, render_update_document
+
+log = logging.getLogger(__name__)
+
+# Writer options that do not change the written output, left out of the manifest fingerprint
+UNHASHED_WRITER_OPTIONS = ('tile_dir', 'workers', 'chunk_size')
 
 class OutputManager:
     def __init__(self, settings=None):
         self.base_dir = Path('output')
         self.settings = settings
 
-    def save_kml(self, kml_object, subdir, filename):
+    def fingerprint(self, payload, version) -> str:
+        """Hash a normalized source payload together with the converter version and coordinate options"""
+        coordinates = self._coordinate_options()
+        digest = hashlib.sha256(f"v{version}:p{coordinates['precision']}:d{coordinates['dedupe_vertices']:d}:"
+                                .encode('utf-8'))
+        normalized = json.dumps(payload, sort_keys=True, separators=(',', ':'), ensure_ascii=False, default=str)
+        digest.update(normalized.encode('utf-8'))
+        return digest.hexdigest()
+
+    def _output_fingerprint(self, subdir, filename, fingerprint) -> str:
+        """A source fingerprint combined with the configured formats and the writer options shaping each one"""
+        output_dir = self.base_dir / subdir
+        options = {
+            fmt: {name: value for name, value in self._writer_options(fmt, output_dir, filename).items()
+                  if name not in UNHASHED_WRITER_OPTIONS}
+            for fmt in self.formats_for(subdir)
+        }
+        digest = hashlib.sha256(fingerprint.encode('utf-8'))
+        digest.update(json.dumps(options, sort_keys=True, separators=(',', ':'), default=str).encode('utf-8'))
+        return digest.hexdigest()
+
+    def _manifest_path(self, subdir, filename):
+        return self.base_dir / subdir / f'.{filename}.manifest.json'
+
+    def formats_for(self, subdir) -> List[str]:
+        """Output formats for a source: SOURCE_OUTPUT_FORMATS[subdir], else OUTPUT_FORMATS"""
+        per_source = getattr(self.settings, 'SOURCE_OUTPUT_FORMATS', None) or {}
+        formats = per_source.get(subdir) or getattr(self.settings, 'OUTPUT_FORMATS', None) or ['kml']
+        unknown = [fmt for fmt in formats if fmt not in FORMATS]
+        if unknown:
+            raise ValueError(f"Unknown output format(s) {unknown}; expected one of {sorted(FORMATS)}")
+        return list(formats)
+
+    def current_path(self, subdir, filename):
+        """Path of the output in its first configured format"""
+        extension, _ = FORMATS[self.formats_for(subdir)[0]]
+        return self.base_dir / subdir / f'{filename}{extension}'
+
+    def is_current(self, subdir, filename, fingerprint) -> bool:
         """
-        Save KML file with versioning:
-        1. If current file exists, rename it with timestamp
-        2. Save new file without timestamp
-        3. Add updated_at property to KML
+        True when every configured format exists and was built from the same
+        fingerprint with the same formats and writer options (e.g. TILE_ZOOM)
         """
-        # Create output directory if it doesn't exist
+        if getattr(self.settings, 'FORCE_REBUILD', False):
+            return False
+        for fmt in self.formats_for(subdir):
+            if not (self.base_dir / subdir / f'{filename}{FORMATS[fmt][0]}').exists():
+                return False
+        try:
+            manifest = json.loads(self._manifest_path(subdir, filename).read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return False
+        return manifest.get('fingerprint') == self._output_fingerprint(subdir, filename, fingerprint)
+
+    def _write_manifest(self, subdir, filename, fingerprint):
+        self._manifest_path(subdir, filename).write_text(json.dumps({
+            'fingerprint': self._output_fingerprint(subdir, filename, fingerprint),
+            'built_at': datetime.now().isoformat(),
+        }, indent=2), encoding='utf-8')
+
+    def save_json(self, payload, subdir, filename):
+        """Write a JSON report next to the outputs (overwritten each run)"""
         output_dir = self.base_dir / subdir
         output_dir.mkdir(parents=True, exist_ok=True)
+        path = output_dir / f'{filename}.json'
+        path.write_text(json.dumps(payload, ensure_ascii=False, indent=2), encoding='utf-8')
+        return path
 
-        # Current file path (without timestamp)
-        current_path = output_dir / f'{filename}.kml'
-        
-        # If file exists, rename it with timestamp
+    def _archive_current(self, current_path, output_dir, filename):
+        """Rename an existing output file with its modification timestamp; return the archived path, if any"""
         if current_path.exists():
             timestamp = datetime.fromtimestamp(current_path.stat().st_mtime).strftime('%Y%m%d_%H%M%S')
-            archived_path = output_dir / f'{filename}_{timestamp}.kml'
+            archived_path = output_dir / f'{filename}_{timestamp}{current_path.suffix}'
             shutil.move(str(current_path), str(archived_path))
-            print(f"Archived previous version to: {archived_path}")
+            log.info("Archived previous version to: %s", archived_path)
+            return archived_path
+        return None
+
+    def _coordinate_options(self):
+        """Coordinate precision (None for full) and duplicate vertex removal for every text writer"""
+        precision = getattr(self.settings, 'COORDINATE_PRECISION', -1)
+        return {
+            'precision': precision if precision >= 0 else None,
+            'dedupe_vertices': getattr(self.settings, 'DEDUPE_VERTICES', False),
+        }
+
+    def _writer_options(self, fmt, output_dir, filename):
+        """
+        Writer options for the text formats: coordinate precision and duplicate
+        vertex removal (COORDINATE_PRECISION/DEDUPE_VERTICES), plus parallel
+        rendering for kml/kmz (KML_SERIALIZE_WORKERS/KML_SERIALIZE_CHUNK) and
+        tiling for kml-tiles (TILE_ZOOM/TILE_MIN_LOD_PIXELS, tiles under <filename>_tiles/)
+        """
+        if fmt == 'columnar':
+            return {}
+        options = self._coordinate_options()
+        if fmt == 'kml-tiles':
+            options.update({
+                'tile_dir': output_dir / f'{filename}_tiles',
+                'zoom': getattr(self.settings, 'TILE_ZOOM', 12),
+                'min_lod_pixels': getattr(self.settings, 'TILE_MIN_LOD_PIXELS', 128),
+            })
+        elif fmt in ('kml', 'kmz'):
+            options.update({
+                'workers': getattr(self.settings, 'KML_SERIALIZE_WORKERS', 0),
+                'chunk_size': getattr(self.settings, 'KML_SERIALIZE_CHUNK', 500),
+            })
+        return options
+
+    @contextmanager
+    def open_writer(self, subdir, filename, fmt='kml', styles=None):
+        """
+        Open a streaming writer for one output file in the given format:
+        1. Write the header (and a StyleRegistry's shared styles, for the KML formats)
+           to a temporary file while the caller adds folders/placemarks
+        2. Archive the current file with its timestamp (and, for kml-tiles, its tiles directory)
+        3. Move the new file into place
+        """
+        extension, open_format = FORMATS[fmt]
+        output_dir = self.base_dir / subdir
+        output_dir.mkdir(parents=True, exist_ok=True)
+
+        current_path = output_dir / f'{filename}{extension}'
+        tmp_path = output_dir / f'{filename}{extension}.tmp'
+
+        try:
+            with open(tmp_path, 'wb') as fh, open_format(fh, **self._writer_options(fmt, output_dir, filename)) as writer:
+                writer.start_document({'updated_at': datetime.now().isoformat()}, document_id=filename)
+                if styles is not None and hasattr(writer, 'write_styles'):
+                    writer.write_styles(styles)
+                yield writer
+                # Buffered formats (columnar) serialize everything here
+                with span("write", output=filename, format=fmt):
+                    writer.end_document()
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+
+        with span("write", output=filename, format=fmt):
+            # Archived under the file's own stem, so kml and kml-tiles outputs never collide
+            archived_path = self._archive_current(current_path, output_dir, current_path.stem)
+            if hasattr(writer, 'publish_tiles'):
+                # A kml-tiles index is archived together with the tiles its NetworkLinks point at
+                writer.publish_tiles(archived_path)
+            os.replace(tmp_path, current_path)
+        count("bytes_written", current_path.stat().st_size)
+        writer.path = current_path
+
+    @contextmanager
+    def open_writers(self, subdir, filename, styles=None):
+        """Open one writer per configured format and fan every folder/placemark out to all of them"""
+        with ExitStack() as stack:
+            yield MultiWriter([stack.enter_context(self.open_writer(subdir, filename, fmt, styles))
+                               for fmt in self.formats_for(subdir)])
+
+    def _snapshot_path(self, subdir, filename):
+        return self.base_dir / subdir / f'.{filename}.features.json'
+
+    def _load_snapshot(self, subdir, filename):
+        """Feature key -> content hash from the previous run, or None on the first run"""
+        try:
+            return json.loads(self._snapshot_path(subdir, filename).read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return None
+
+    def save_delta(self, diff: FeatureDiff, subdir, filename, styles=None, target=None):
+        """
+        Write what changed since the previous run against `target`, the KML or
+        KMZ output just written:
+        1. <filename>_delta.json with added/modified/removed feature ids
+        2. <filename>_delta.kml with the added and modified placemarks
+        3. Optionally <filename>_update.kml, a NetworkLinkControl Update for clients
+           that already loaded the target
+        Without a KML/KMZ target (e.g. geojson or kml-tiles only) only the JSON is written.
+        """
+        output_dir = self.base_dir / subdir
+        generated_at = datetime.now().isoformat()
+        summary = diff.summary()
+
+        with open(output_dir / f'{filename}_delta.json', 'w', encoding='utf-8') as fh:
+            json.dump({
+                'target': target.name if target is not None else None,
+                'generated_at': generated_at,
+                'summary': summary,
+                'added': [p.id for p in diff.added],
+                'modified': [p.id for p in diff.modified],
+                'removed': diff.removed,
+            }, fh, ensure_ascii=False, indent=2)
+        log.info("Delta for %s: %d added, %d modified, %d removed",
+                 filename, summary['added'], summary['modified'], summary['removed'])
+        if target is None:
+            # Drop KML deltas left by an earlier run that did write KML, so none go stale
+            for name in (f'{filename}_delta.kml', f'{filename}_update.kml'):
+                (output_dir / name).unlink(missing_ok=True)
+            return
+
+        with open(output_dir / f'{filename}_delta.kml', 'w', encoding='utf-8') as fh:
+            writer = KMLStreamWriter(fh, **self._coordinate_options())
+            writer.start_document({'generated_at': generated_at, 'removed': ','.join(diff.removed)})
+            if styles is not None:
+                writer.write_styles(styles)
+            writer.write_folder(Folder(name='Added', placemarks=diff.added))
+            writer.write_folder(Folder(name='Modified', placemarks=diff.modified))
+            writer.end_document()
+
+        if getattr(self.settings, 'WRITE_NETWORKLINK_UPDATE', False):
+            # Modified placemarks are replaced: deleted by id, then created again
+            update = render_update_document(
+                target_href=target.name,
+                document_id=filename,
+                create=diff.added + diff.modified,
+                delete=diff.removed + [p.id for p in diff.modified],
+                **self._coordinate_options()
+            )
+            (output_dir / f'{filename}_update.kml').write_text(update, encoding='utf-8')
+
+    def save_features(self, folders: Iterable[Folder], subdir, filename, fingerprint=None, styles=None):
+        """
+        Stream folders of placemarks straight to the configured output formats
+        and, when a fingerprint is given, record it in the output's manifest.
+        Placemarks with ids are diffed against the previous run. A StyleRegistry
+        puts its shared styles at the top of every KML document the placemarks
+        reference by styleUrl.
+        """
+        write_deltas = getattr(self.settings, 'WRITE_DELTAS', True)
+        diff = FeatureDiff(self._load_snapshot(subdir, filename)) if write_deltas else None
+
+        with self.open_writers(subdir, filename, styles) as writer:
+            # Placemarks are produced lazily, so this span covers building them as well as serializing
+            with span("serialize", output=filename):
+                for folder in folders:
+                    if diff is not None:
+                        folder = folder._replace(placemarks=diff.track(folder.placemarks))
+                    if styles is not None:
+                        folder = folder._replace(placemarks=styles.track(folder.placemarks))
+                    writer.write_folder(folder)
+            count("placemarks", writer.placemark_count)
 
-        # Add updated_at to KML metadata
-        if hasattr(kml_object, 'document'):
-            timestamp = datetime.now().isoformat()
-            extdata = kml_object.document.extendeddata
-            extdata.newdata(name='updated_at', value=timestamp)
+        if styles is not None and styles.uses:
+            saved = styles.bytes_saved()
+            count("style_bytes_saved", saved)
+            log.info("Shared styles for %s: %d styles for %d placemarks, %s bytes saved vs inline styles",
+                     filename, len(styles.style_maps), sum(styles.uses.values()), f"{saved:,}")
 
-        # Save new file without timestamp
-        kml_object.save(str(current_path))
-        return current_path 
\ No newline at end of file
+        if diff is not None and diff.current:
+            if diff.has_baseline:
+                # Placemark deltas apply to a single KML document; kml-tiles spreads them over tiles
+                written = dict(zip(self.formats_for(subdir), writer.paths))
+                self.save_delta(diff, subdir, filename, styles, target=written.get('kml') or written.get('kmz'))
+            self._snapshot_path(subdir, filename).write_text(json.dumps(diff.current), encoding='utf-8')
+        if fingerprint:
+            self._write_manifest(subdir, filename, fingerprint)
+        return writer.path
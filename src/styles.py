@@ -0,0 +1,119 @@
+import re
+from collections import Counter
+from typing import Any, Dict, Iterable, Iterator, NamedTuple, Optional, Tuple
+
+from .features import Placemark
+from .kml_writer import INDENT, render_style, render_style_map
+
+# Colors handed out to categorical keys (POI categories, municipalities) in sorted key order
+PALETTE = [
+    "#1F77B4", "#FF7F0E", "#2CA02C", "#D62728", "#9467BD", "#8C564B",
+    "#E377C2", "#7F7F7F", "#BCBD22", "#17BECF", "#AEC7E8", "#FFBB78",
+]
+HIGHLIGHT_SCALE = 1.4
+
+
+def kml_color(rgb: str, alpha: int = 0xFF) -> str:
+    """Convert "#RRGGBB" to KML's aabbggrr"""
+    rgb = rgb.lstrip("#")
+    return f"{alpha:02x}{rgb[4:6]}{rgb[2:4]}{rgb[0:2]}".lower()
+
+
+def palette_color(index: int) -> str:
+    return PALETTE[index % len(PALETTE)]
+
+
+class Style(NamedTuple):
+    """KML style properties; colors are aabbggrr"""
+    line_color: Optional[str] = None
+    line_width: Optional[float] = None
+    poly_color: Optional[str] = None
+    icon_href: Optional[str] = None
+    icon_color: Optional[str] = None
+    icon_scale: Optional[float] = None
+    label_scale: Optional[float] = None
+
+    def highlighted(self) -> "Style":
+        """The same style drawn larger, shown while the feature is hovered or selected"""
+        return self._replace(
+            line_width=self.line_width * HIGHLIGHT_SCALE if self.line_width is not None else None,
+            icon_scale=(self.icon_scale or 1.0) * HIGHLIGHT_SCALE if self.icon_href else self.icon_scale,
+            label_scale=HIGHLIGHT_SCALE,
+        )
+
+
+class StyleRegistry:
+    """Shared styles of one output, each distinct style built once.
+
+    Converters register a style per key (metro line, POI category,
+    municipality) before writing and set the returned url as the
+    placemark's style_url. Every distinct style becomes one normal and one
+    highlight <Style> plus a <StyleMap> at the top of the document, instead
+    of an inline <Style> in every placemark. Keys with identical styles
+    share one StyleMap.
+    """
+
+    def __init__(self):
+        self.styles: Dict[str, Style] = {}
+        # StyleMap id -> (normal style url, highlight style url)
+        self.style_maps: Dict[str, Tuple[str, str]] = {}
+        self.uses: Counter = Counter()
+        self._urls: Dict[Tuple[str, Any], str] = {}
+        self._by_style: Dict[Style, str] = {}
+
+    def _unique_id(self, kind: str, key: Any) -> str:
+        base = f"{kind}-{re.sub(r'[^A-Za-z0-9_.-]+', '-', str(key)).strip('-').lower() or 'default'}"
+        style_id, n = base, 1
+        while style_id in self.style_maps:
+            n += 1
+            style_id = f"{base}-{n}"
+        return style_id
+
+    def add(self, kind: str, key: Any, style: Style) -> str:
+        """styleUrl of the style for (kind, key), registering it on first use"""
+        url = self._urls.get((kind, key))
+        if url is not None:
+            return url
+        url = self._by_style.get(style)
+        if url is None:
+            style_id = self._unique_id(kind, key)
+            self.styles[f"{style_id}-normal"] = style
+            self.styles[f"{style_id}-highlight"] = style.highlighted()
+            self.style_maps[style_id] = (f"#{style_id}-normal", f"#{style_id}-highlight")
+            url = self._by_style[style] = f"#{style_id}"
+        self._urls[(kind, key)] = url
+        return url
+
+    def url(self, kind: str, key: Any) -> Optional[str]:
+        return self._urls.get((kind, key))
+
+    def render(self, depth: int = 2, urls: Optional[Iterable[str]] = None) -> str:
+        """Styles and StyleMaps as KML, optionally only those behind the given urls"""
+        wanted = None if urls is None else {url.lstrip("#") for url in urls}
+        out = []
+        for map_id, (normal, highlight) in self.style_maps.items():
+            if wanted is not None and map_id not in wanted:
+                continue
+            for url in (normal, highlight):
+                out.append(render_style(self.styles[url[1:]], depth, url[1:]))
+            out.append(render_style_map(map_id, normal, highlight, depth))
+        return "".join(out)
+
+    def track(self, placemarks: Iterable[Placemark]) -> Iterator[Placemark]:
+        """Pass placemarks through unchanged while counting the styles they use"""
+        for placemark in placemarks:
+            if placemark.style_url:
+                self.uses[placemark.style_url] += 1
+            yield placemark
+
+    def bytes_saved(self, depth: int = 3) -> int:
+        """
+        Bytes saved by the tracked placemarks over an inline <Style> in each
+        placemark (at `depth`) in place of its styleUrl, net of the shared styles
+        """
+        saved = -len(self.render().encode("utf-8"))
+        for url, uses in self.uses.items():
+            inline = len(render_style(self.styles[f"{url[1:]}-normal"], depth + 1).encode("utf-8"))
+            reference = len(f"{INDENT * (depth + 1)}<styleUrl>{url}</styleUrl>\n".encode("utf-8"))
+            saved += uses * (inline - reference)
+        return saved
@@ -0,0 +1,197 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import signal
+import time
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, NamedTuple, Optional
+
+from aiohttp import web
+
+from .instrumentation import span
+
+log = logging.getLogger(__name__)
+
+
+class WatchedSource(NamedTuple):
+    """A source kept current by the watcher: `fetch` gets its payload, `build` exports it"""
+    name: str
+    interval: float
+    fetch: Callable[[], Awaitable[Any]]
+    build: Callable[[Any], Awaitable[Any]]
+    # Part of the payload that identifies a change (the whole payload by default);
+    # returning None means changes cannot be detected and every poll exports
+    signature: Optional[Callable[[Any], Any]] = None
+
+
+def coalesce(fetch: Callable[[], Awaitable[Any]]) -> Callable[[], Awaitable[Any]]:
+    """
+    Wrap a fetch so callers overlapping in time await one in-flight call
+    instead of each starting their own; a later call fetches again
+    """
+    running: Optional[asyncio.Future] = None
+
+    def finished(future: asyncio.Future):
+        nonlocal running
+        if running is future:
+            running = None
+
+    async def shared_fetch():
+        nonlocal running
+        if running is None:
+            running = asyncio.ensure_future(fetch())
+            running.add_done_callback(finished)
+        # Shielded so one cancelled caller does not cancel the fetch for the others
+        return await asyncio.shield(running)
+
+    return shared_fetch
+
+
+def payload_digest(payload: Any) -> str:
+    normalized = json.dumps(payload, sort_keys=True, separators=(',', ':'), ensure_ascii=False, default=str)
+    return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+
+class SourceStatus:
+    """Counters and last-poll timings of one watched source, as served on /status"""
+
+    def __init__(self, source: WatchedSource):
+        self.name = source.name
+        self.interval = source.interval
+        self.running = False
+        self.polls = 0
+        self.exports = 0
+        self.unchanged = 0
+        self.failures = 0
+        # exported, unchanged or failed
+        self.last_result: Optional[str] = None
+        self.last_error: Optional[str] = None
+        self.last_started: Optional[str] = None
+        self.last_exported: Optional[str] = None
+        self.fetch_seconds: Optional[float] = None
+        self.build_seconds: Optional[float] = None
+        self.output: Any = None
+        self.next_poll: Optional[str] = None
+        self.digest: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(vars(self))
+
+
+class Watcher:
+    """Keep sources exported from one resident process.
+
+    Every source is polled on its own interval through the caller's shared
+    session (which should revalidate its HTTP cache on every poll), and only rebuilt when the digest of its payload
+    differs from the last successful export. The first poll after startup
+    always builds; converters still skip outputs whose manifest fingerprint
+    matches. A failed fetch or build is retried on the next poll.
+    """
+
+    def __init__(self, sources: List[WatchedSource], http_stats: Optional[Dict[str, Any]] = None):
+        self.sources = sources
+        self.status = {source.name: SourceStatus(source) for source in sources}
+        self.http_stats = http_stats
+        self.started_at = datetime.now()
+
+    async def poll(self, source: WatchedSource):
+        """Fetch one source and export it if its payload changed"""
+        status = self.status[source.name]
+        status.polls += 1
+        status.running = True
+        status.last_started = datetime.now().isoformat()
+        status.fetch_seconds = status.build_seconds = None
+        try:
+            start = time.perf_counter()
+            with span("watch fetch", source=source.name):
+                payload = await source.fetch()
+            status.fetch_seconds = round(time.perf_counter() - start, 3)
+            if not payload:
+                raise ValueError("no data fetched")
+
+            signature = source.signature(payload) if source.signature is not None else payload
+            digest = payload_digest(signature) if signature is not None else None
+            if digest is not None and digest == status.digest:
+                status.unchanged += 1
+                status.last_result = 'unchanged'
+                log.info("%s unchanged, next poll in %ds", source.name, source.interval)
+                return
+
+            start = time.perf_counter()
+            status.output = await source.build(payload)
+            status.build_seconds = round(time.perf_counter() - start, 3)
+            status.digest = digest
+            status.exports += 1
+            status.last_result = 'exported'
+            status.last_error = None
+            status.last_exported = datetime.now().isoformat()
+            log.info("%s exported in %.2fs (fetch %.2fs): %s",
+                     source.name, status.build_seconds, status.fetch_seconds, status.output)
+        except Exception as e:
+            status.failures += 1
+            status.last_result = 'failed'
+            status.last_error = f"{type(e).__name__}: {e}"
+            log.error("%s failed: %s", source.name, status.last_error)
+        finally:
+            status.running = False
+
+    async def _watch_source(self, source: WatchedSource):
+        status = self.status[source.name]
+        next_poll = time.monotonic()
+        while True:
+            await self.poll(source)
+            # Fixed-rate schedule; a poll that overran its interval starts the next one right away
+            next_poll = max(next_poll + source.interval, time.monotonic())
+            delay = next_poll - time.monotonic()
+            status.next_poll = (datetime.now() + timedelta(seconds=delay)).isoformat()
+            await asyncio.sleep(delay)
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            'pid': os.getpid(),
+            'started_at': self.started_at.isoformat(),
+            'uptime_seconds': round((datetime.now() - self.started_at).total_seconds(), 1),
+            'sources': {name: status.to_dict() for name, status in self.status.items()},
+            'http': self.http_stats,
+        }
+
+    async def _handle_status(self, request: web.Request) -> web.Response:
+        return web.json_response(self.report(), dumps=lambda payload: json.dumps(payload, indent=2, default=str))
+
+    async def start_status_server(self, host: str, port: int) -> web.AppRunner:
+        """Serve report() as JSON on http://host:port/status"""
+        app = web.Application()
+        app.router.add_get('/', self._handle_status)
+        app.router.add_get('/status', self._handle_status)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, host, port).start()
+        log.info("Status endpoint: http://%s:%d/status", host, port)
+        return runner
+
+    async def run(self, host: str = '127.0.0.1', port: int = 0):
+        """Poll every source until cancelled (Ctrl-C) or sent SIGTERM; port 0 serves no status endpoint"""
+        runner = await self.start_status_server(host, port) if port else None
+        tasks = [asyncio.create_task(self._watch_source(source)) for source in self.sources]
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        try:
+            loop.add_signal_handler(signal.SIGTERM, stop.set)
+        except (NotImplementedError, RuntimeError):
+            # No signal handlers on Windows event loops
+            pass
+        try:
+            await stop.wait()
+            log.info("SIGTERM received, stopping")
+        finally:
+            try:
+                loop.remove_signal_handler(signal.SIGTERM)
+            except (NotImplementedError, RuntimeError):
+                pass
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            if runner is not None:
+                await runner.cleanup()
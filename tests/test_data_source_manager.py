@@ -0,0 +1,100 @@
+"""DataSourceManager caching against a local server"""
+import asyncio
+import json
+import tempfile
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from src.config import Settings
+from src.data_source import DataSourceManager
+
+RECORDS = [{"id": i, "name": f"record {i}"} for i in range(300)]
+
+
+class ArrayServer:
+    """Streams RECORDS as a JSON array in small, delayed chunks; answers 304 to a matching If-None-Match"""
+
+    def __init__(self):
+        self.hits = 0
+        self.not_modified = 0
+
+    async def handle(self, request: web.Request) -> web.StreamResponse:
+        self.hits += 1
+        if request.headers.get("If-None-Match") == '"v1"':
+            self.not_modified += 1
+            return web.Response(status=304, headers={"ETag": '"v1"'})
+        response = web.StreamResponse(headers={"Content-Type": "application/json", "ETag": '"v1"'})
+        await response.prepare(request)
+        body = json.dumps(RECORDS).encode("utf-8")
+        for start in range(0, len(body), 512):
+            await response.write(body[start:start + 512])
+            await asyncio.sleep(0.001)
+        await response.write_eof()
+        return response
+
+
+async def run_with_manager(server: ArrayServer, scenario, **settings):
+    app = web.Application()
+    app.router.add_get("/records", server.handle)
+    test_server = TestServer(app)
+    await test_server.start_server()
+    try:
+        options = dict(CACHE_DIR=tempfile.mkdtemp(), HTTP_RATE_LIMIT=0)
+        options.update(settings)
+        async with DataSourceManager(Settings(**options)) as data_manager:
+            return await scenario(data_manager, str(test_server.make_url("/records")))
+    finally:
+        await test_server.close()
+
+
+def test_concurrent_streams_of_one_url_download_once():
+    server = ArrayServer()
+
+    async def scenario(data_manager, url):
+        async def stream():
+            return [record async for record in data_manager.stream_json_array(url)]
+        first, second = await asyncio.gather(stream(), stream())
+        # The waiting stream and a later fetch are both cache hits
+        third = await data_manager.fetch_json(url)
+        return first, second, third, dict(data_manager.stats)
+
+    first, second, third, stats = asyncio.run(run_with_manager(server, scenario))
+
+    assert first == second == third == RECORDS
+    assert server.hits == 1
+    assert stats["cache_misses"] == 1
+    assert stats["cache_hits"] == 2
+
+
+def test_concurrent_revalidating_fetches_share_one_request():
+    server = ArrayServer()
+
+    async def scenario(data_manager, url):
+        data_manager.revalidate = True
+        return await asyncio.gather(*(data_manager.fetch_json(url) for _ in range(3)))
+
+    results = asyncio.run(run_with_manager(server, scenario))
+
+    assert all(result == RECORDS for result in results)
+    assert server.hits == 1
+
+
+def test_stale_entries_are_revalidated_with_their_etag():
+    server = ArrayServer()
+
+    async def scenario(data_manager, url):
+        await data_manager.fetch_json(url)
+        # CACHE_TTL=0: every later request has to revalidate, and the 304 reuses the cached body
+        fetched = await data_manager.fetch_json(url)
+        streamed = [record async for record in data_manager.stream_json_array(url)]
+        return fetched, streamed, dict(data_manager.stats)
+
+    fetched, streamed, stats = asyncio.run(run_with_manager(server, scenario, CACHE_TTL=0))
+
+    assert fetched == streamed == RECORDS
+    assert server.hits == 3
+    assert server.not_modified == 2
+    assert stats["cache_misses"] == 1
+    assert stats["cache_revalidated"] == 2
+    assert stats["cache_hits"] == 0
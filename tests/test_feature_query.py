@@ -0,0 +1,109 @@
+"""FeatureLayerQuery paging and exceededTransferLimit handling against a local layer server"""
+import asyncio
+from typing import Any, Dict, List
+
+import aiohttp
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from src.data_source.feature_query import FeatureLayerQuery
+
+
+class LayerServer:
+    """A MapServer with one layer of `total` features that returns at most `transfer_limit` per response.
+
+    Without orderByFields the rows come back in an order that shifts on every
+    request, the way an unordered database query may.
+    """
+
+    def __init__(self, total: int, transfer_limit: int, pagination: bool = True, oid_field: str = "FID"):
+        self.total = total
+        self.transfer_limit = transfer_limit
+        self.pagination = pagination
+        self.oid_field = oid_field
+        self.queries: List[Dict[str, str]] = []
+
+    def feature(self, oid: int) -> Dict[str, Any]:
+        return {"attributes": {self.oid_field: oid, "name": f"street {oid}"},
+                "geometry": {"paths": [[[46.0, 24.0], [46.0 + oid / 1000, 24.0]]]}}
+
+    async def layer(self, request: web.Request) -> web.Response:
+        return web.json_response({
+            "id": 0,
+            "maxRecordCount": 1000,
+            "fields": [{"name": self.oid_field, "type": "esriFieldTypeOID"},
+                       {"name": "name", "type": "esriFieldTypeString"}],
+            "advancedQueryCapabilities": {"supportsPagination": self.pagination},
+        })
+
+    async def query(self, request: web.Request) -> web.Response:
+        params = dict(await request.post())
+        self.queries.append(params)
+        oids = list(range(1, self.total + 1))
+        if params.get("returnCountOnly") == "true":
+            return web.json_response({"count": self.total})
+        if params.get("returnIdsOnly") == "true":
+            return web.json_response({"objectIdFieldName": self.oid_field, "objectIds": oids[::-1]})
+
+        if "objectIds" in params:
+            selected = [int(oid) for oid in params["objectIds"].split(",")]
+        else:
+            if params.get("orderByFields") != self.oid_field:
+                shift = len(self.queries) % self.total
+                oids = oids[shift:] + oids[:shift]
+            offset, count = int(params["resultOffset"]), int(params["resultRecordCount"])
+            selected = oids[offset:offset + count]
+        returned = selected[:self.transfer_limit]
+        return web.json_response({
+            "features": [self.feature(oid) for oid in returned],
+            "exceededTransferLimit": len(returned) < len(selected),
+        })
+
+
+def collect(server: LayerServer, **options) -> List[int]:
+    async def main():
+        app = web.Application()
+        app.router.add_route("*", "/MapServer/0", server.layer)
+        app.router.add_post("/MapServer/0/query", server.query)
+        test_server = TestServer(app)
+        await test_server.start_server()
+        try:
+            async with aiohttp.ClientSession() as session:
+                query = FeatureLayerQuery(str(test_server.make_url("/MapServer")), session=session, **options)
+                return [feature["attributes"][server.oid_field] async for feature in query.iter_features(0)]
+        finally:
+            await test_server.close()
+    return asyncio.run(main())
+
+
+def test_offset_paging_orders_by_object_id():
+    server = LayerServer(total=23, transfer_limit=3)
+
+    oids = collect(server, page_size=5, concurrency=2)
+
+    assert oids == list(range(1, 24))
+    paged = [params for params in server.queries if "resultOffset" in params]
+    assert paged and all(params["orderByFields"] == "FID" for params in paged)
+
+
+def test_offset_pages_cut_short_are_completed():
+    server = LayerServer(total=12, transfer_limit=3)
+
+    oids = collect(server, page_size=5)
+
+    assert oids == list(range(1, 13))
+    # Pages of 5 come back as 3 + 2 (the last page 2), each follow-up resuming where the server stopped
+    offsets = sorted((int(params["resultOffset"]), int(params["resultRecordCount"]))
+                     for params in server.queries if "resultOffset" in params)
+    assert offsets == [(0, 5), (3, 2), (5, 5), (8, 2), (10, 2)]
+
+
+def test_object_id_paging_completes_pages_cut_short():
+    server = LayerServer(total=11, transfer_limit=3, pagination=False)
+
+    oids = collect(server, page_size=4)
+
+    assert oids == list(range(1, 12))
+    # Pages are fetched concurrently, so compare the requests regardless of their order
+    chunks = sorted(params["objectIds"] for params in server.queries if "objectIds" in params)
+    assert chunks == ["1,2,3,4", "4", "5,6,7,8", "8", "9,10,11"]
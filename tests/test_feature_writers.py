@@ -0,0 +1,114 @@
+"""GeoJSON geometry output and the columnar format"""
+import numpy as np
+
+from src.feature_writers import ColumnarWriter, geometry_to_geojson, placemark_to_geojson, read_columnar
+from src.features import LineString, MultiGeometry, Placemark, Point, Polygon
+from src.geometry import ring_signed_areas
+
+# Esri winding: clockwise exterior, counter-clockwise hole
+OUTER_CW = [(0.0, 0.0), (0.0, 10.0), (10.0, 10.0), (10.0, 0.0), (0.0, 0.0)]
+HOLE_CCW = [(2.0, 2.0), (4.0, 2.0), (4.0, 4.0), (2.0, 4.0), (2.0, 2.0)]
+
+
+def signed_area(ring) -> float:
+    return ring_signed_areas(np.asarray(ring, dtype=np.float64), np.array([0, len(ring)]))[0]
+
+
+def test_polygon_rings_follow_right_hand_rule():
+    for precision, dedupe in ((None, False), (7, True)):
+        rings = geometry_to_geojson(Polygon(outer=OUTER_CW, inner=(HOLE_CCW,)), precision, dedupe)["coordinates"]
+
+        assert signed_area(rings[0]) > 0
+        assert signed_area(rings[1]) < 0
+        assert rings[0][0] == rings[0][-1] and rings[1][0] == rings[1][-1]
+
+
+def test_correctly_wound_rings_are_kept():
+    outer = np.asarray(OUTER_CW[::-1])
+    hole = np.asarray(HOLE_CCW[::-1])
+
+    rings = geometry_to_geojson(Polygon(outer=outer, inner=(hole,)))["coordinates"]
+
+    assert rings == [outer.tolist(), hole.tolist()]
+
+
+def test_multipolygon_parts_are_rewound():
+    shifted = [(x + 20, y) for x, y in OUTER_CW]
+    geometry = geometry_to_geojson(MultiGeometry(geometries=[Polygon(outer=OUTER_CW), Polygon(outer=shifted)]))
+
+    assert geometry["type"] == "MultiPolygon"
+    assert all(signed_area(polygon[0]) > 0 for polygon in geometry["coordinates"])
+
+
+def columnar_placemarks():
+    """A grid of points, lines, holed polygons and multi-geometries, with their folder"""
+    placemarks = []
+    for i in range(40):
+        x, y = 46.0 + (i % 8) * 0.1, 24.0 + (i // 8) * 0.1
+        square = [(x, y), (x, y + 0.05), (x + 0.05, y + 0.05), (x + 0.05, y), (x, y)]
+        geometry = [
+            Point(x, y),
+            LineString(coords=[(x, y), (x + 0.02, y + 0.03), (x + 0.04, y)]),
+            Polygon(outer=square, inner=([(x + 0.01, y + 0.01), (x + 0.02, y + 0.01), (x + 0.02, y + 0.02),
+                                          (x + 0.01, y + 0.01)],)),
+            MultiGeometry(geometries=[Point(x, y), Polygon(outer=square)]),
+        ][i % 4]
+        extended_data = {"rank": i, "label": f"تجربة {i}"} if i % 3 else None
+        placemark = Placemark(name=f"feature {i}", geometry=geometry, id=f"f{i}", extended_data=extended_data,
+                              description="even" if i % 2 == 0 else None)
+        placemarks.append((["North", "East"][i % 2] if i % 5 else None, placemark))
+    return placemarks
+
+
+def write_columnar(path, placemarks):
+    with open(path, "wb") as fh:
+        writer = ColumnarWriter(fh)
+        writer.start_document({"source": "test"}, "places")
+        for folder, placemark in placemarks:
+            if folder:
+                writer.start_folder(folder)
+            writer.write_placemark(placemark)
+            if folder:
+                writer.end_folder()
+        writer.end_document()
+
+
+def test_columnar_round_trip(tmp_path):
+    path = tmp_path / "places.columnar"
+    placemarks = columnar_placemarks()
+    write_columnar(path, placemarks)
+
+    expected = {placemark.id: placemark_to_geojson(placemark, folder) for folder, placemark in placemarks}
+    features = list(read_columnar(path))
+
+    # Features come back in Hilbert order, not input order
+    assert len(features) == len(expected)
+    assert {feature["id"]: feature for feature in features} == expected
+
+
+def test_columnar_bbox_query(tmp_path):
+    path = tmp_path / "places.columnar"
+    placemarks = columnar_placemarks()
+    write_columnar(path, placemarks)
+    west, south, east, north = 46.12, 24.12, 46.33, 24.27
+
+    def positions(coordinates):
+        if isinstance(coordinates[0], float):
+            yield coordinates
+        else:
+            for nested in coordinates:
+                yield from positions(nested)
+
+    def intersects(feature):
+        geometry = feature["geometry"]
+        parts = geometry["geometries"] if geometry["type"] == "GeometryCollection" else [geometry]
+        coords = np.asarray([p for part in parts for p in positions(part["coordinates"])])
+        return (coords[:, 0].min() <= east and coords[:, 0].max() >= west
+                and coords[:, 1].min() <= north and coords[:, 1].max() >= south)
+
+    expected = {placemark.id: placemark_to_geojson(placemark, folder) for folder, placemark in placemarks}
+    expected = {key: feature for key, feature in expected.items() if intersects(feature)}
+    found = {feature["id"]: feature for feature in read_columnar(path, bbox=(west, south, east, north))}
+
+    assert 0 < len(found) < len(placemarks)
+    assert found == expected
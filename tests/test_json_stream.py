@@ -0,0 +1,104 @@
+"""JSONArrayScanner splitting and the where prefilter"""
+import asyncio
+import json
+
+import pytest
+
+from src.data_source.json_stream import JSONArrayScanner, compile_prefilter, iter_json_array, matches
+
+RECORDS = [
+    {"id": 1, "name": "plain", "boundaries": [[24.1, 46.2], [24.3, 46.4]]},
+    {"id": 2, "name": "brackets ] } [ { and , commas", "nested": {"a": [1, {"b": []}]}},
+    {"id": 3, "name": "quote \" backslash \\ and \\\" mixed", "tail": "\\"},
+    {"id": 4, "name": "unicode العليا é 🚀", "empty": {}},
+    [],
+    "a bare string with ] inside",
+    12.5e-3,
+    None,
+]
+
+
+def scan(chunks):
+    scanner = JSONArrayScanner()
+    elements = []
+    for chunk in chunks:
+        elements.extend(scanner.feed(chunk))
+    scanner.close()
+    return [json.loads(element) for element in elements]
+
+
+@pytest.mark.parametrize("ensure_ascii", [True, False])
+def test_every_chunk_boundary_gives_the_same_elements(ensure_ascii):
+    body = json.dumps(RECORDS, ensure_ascii=ensure_ascii, indent=1).encode("utf-8")
+    for split in range(1, len(body)):
+        assert scan([body[:split], body[split:]]) == RECORDS, f"split at byte {split}"
+
+
+def test_byte_by_byte_feed():
+    body = json.dumps(RECORDS, separators=(",", ":")).encode("utf-8")
+    assert scan(body[i:i + 1] for i in range(len(body))) == RECORDS
+
+
+def test_empty_and_whitespace_arrays():
+    assert scan([b"  \n", b"[", b" ]  "]) == []
+
+
+def test_truncated_array_is_rejected():
+    scanner = JSONArrayScanner()
+    scanner.feed(b'[{"id": 1}, {"id": ')
+    with pytest.raises(ValueError, match="Truncated"):
+        scanner.close()
+
+
+def test_non_array_is_rejected():
+    with pytest.raises(ValueError, match="Expected a JSON array"):
+        JSONArrayScanner().feed(b'{"features": []}')
+
+
+# (where, raw records that matches() accepts or rejects once decoded)
+AGREEMENT_CASES = [
+    ({"region_id": 1}, [b'{"region_id":1}', b'{"region_id": 1.0}', b'{"region_id":1.000}', b'{"region_id":1e0}',
+                        b'{"region_id":10e-1}', b'{"region_id":10}', b'{"region_id":11}', b'{"region_id":1.5}',
+                        b'{"region_id":-1}', b'{"region_id":true}', b'{"region_id":"1"}', b'{"other":1}']),
+    ({"city_id": {3, 7}}, [b'{"city_id":3}', b'{"city_id":7.0}', b'{"city_id":37}', b'{"city_id":0.3}']),
+    ({"score": 0.25}, [b'{"score":0.25}', b'{"score":0.250}', b'{"score":2.5e-1}', b'{"score":0.2}', b'{"score":0.255}']),
+    ({"zero": 0}, [b'{"zero":0}', b'{"zero":-0}', b'{"zero":0.0}', b'{"zero":-0.0e5}', b'{"zero":false}']),
+    ({"flag": True}, [b'{"flag":true}', b'{"flag":1}', b'{"flag":false}']),
+    ({"name": "Al Olaya/East"}, [b'{"name":"Al Olaya/East"}', b'{"name":"Al Olaya\\/East"}',
+                                 b'{"name":"\\u0041l Olaya/East"}', b'{"name":"Al Olaya"}']),
+    ({"missing": None}, [b'{"missing":null}', b'{"other":null}']),
+    ({"region_id": 1, "name": "x"}, [b'{"name":"x","region_id":1.0}', b'{"name":"y","region_id":1}']),
+]
+
+
+@pytest.mark.parametrize("where, raws", AGREEMENT_CASES)
+def test_prefilter_never_rejects_what_matches_accepts(where, raws):
+    prefilter = compile_prefilter(where)
+    for raw in raws:
+        if matches(json.loads(raw), where):
+            assert prefilter(raw), raw
+
+
+def test_prefilter_still_rejects_other_values():
+    prefilter = compile_prefilter({"region_id": 1, "city_id": 3})
+    assert prefilter(b'{"region_id": 1, "city_id": 3}')
+    assert not prefilter(b'{"region_id": 1, "city_id": 30}')
+    assert not prefilter(b'{"region_id": 2, "city_id": 3}')
+
+
+def test_iter_json_array_filters_and_counts():
+    records = [{"region_id": region, "city_id": 3.0, "name": f"d{i}"} for i, region in enumerate([1, 2, 1, 1.0, 3])]
+    body = json.dumps(records).encode("utf-8")
+
+    async def chunks():
+        for start in range(0, len(body), 7):
+            yield body[start:start + 7]
+
+    async def collect(stats):
+        return [record async for record in iter_json_array(chunks(), {"region_id": 1, "city_id": 3}, stats)]
+
+    stats = {}
+    found = asyncio.run(collect(stats))
+
+    assert [record["name"] for record in found] == ["d0", "d2", "d3"]
+    assert stats == {"records_scanned": 5, "records_decoded": 3}
@@ -0,0 +1,41 @@
+"""KML document structure"""
+import io
+import xml.etree.ElementTree as ET
+
+import pytest
+
+from src.features import Folder, Placemark, Point
+from src.kml_writer import KMLStreamWriter
+from src.styles import Style, StyleRegistry, kml_color
+
+KML = "{http://www.opengis.net/kml/2.2}"
+
+
+@pytest.mark.parametrize("workers", [0, 1])
+def test_styles_precede_document_extended_data(workers):
+    styles = StyleRegistry()
+    styles.add("kind", "a", Style(line_color=kml_color("#ff0000"), line_width=2))
+    placemarks = [Placemark(name=f"p{i}", geometry=Point(46.0, 24.0 + i), id=str(i),
+                            style_url=styles.url("kind", "a")) for i in range(5)]
+
+    fh = io.StringIO()
+    writer = KMLStreamWriter(fh, workers=workers, chunk_size=2)
+    writer.start_document({"updated_at": "2026-01-01T00:00:00"}, document_id="layer")
+    writer.write_styles(styles)
+    writer.write_folder(Folder(name="Places", placemarks=styles.track(placemarks)))
+    writer.end_document()
+
+    document = ET.fromstring(fh.getvalue()).find(f"{KML}Document")
+    children = [child.tag.replace(KML, "") for child in document]
+    assert children.index("Style") < children.index("ExtendedData") < children.index("Folder")
+    assert len(document.find(f"{KML}Folder").findall(f"{KML}Placemark")) == 5
+
+
+def test_extended_data_written_without_styles():
+    fh = io.StringIO()
+    writer = KMLStreamWriter(fh)
+    writer.start_document({"updated_at": "2026-01-01T00:00:00"})
+    writer.end_document()
+
+    document = ET.fromstring(fh.getvalue()).find(f"{KML}Document")
+    assert [child.tag.replace(KML, "") for child in document] == ["ExtendedData"]
@@ -0,0 +1,127 @@
+"""OutputManager archiving and deltas"""
+import json
+import os
+import re
+
+import pytest
+
+from src.config import Settings
+from src.features import Folder, Placemark, Point
+from src.output_manager import OutputManager
+
+
+def write_tiles(manager: OutputManager, *points: Point):
+    with manager.open_writer("layer", "places", "kml-tiles") as writer:
+        writer.write_folder(Folder(name="Places", placemarks=[
+            Placemark(name=f"p{i}", geometry=point, id=str(i)) for i, point in enumerate(points)]))
+
+
+def broken_links(index) -> list:
+    hrefs = re.findall(r"<href>(.*?)</href>", index.read_text(encoding="utf-8"))
+    assert hrefs
+    return [href for href in hrefs if not (index.parent / href).exists()]
+
+
+def test_rerun_archives_tiles_with_their_index(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    manager = OutputManager(Settings(TILE_ZOOM=10))
+    output_dir = tmp_path / "output" / "layer"
+
+    write_tiles(manager, Point(46.7, 24.7))
+    # A fixed mtime gives the archive a known timestamp
+    os.utime(output_dir / "places_tiles.kml", (1_600_000_000, 1_600_000_000))
+    write_tiles(manager, Point(39.2, 21.5))
+
+    (archived_index,) = output_dir.glob("places_tiles_*.kml")
+    archived_tiles = output_dir / archived_index.stem
+    assert archived_tiles.is_dir()
+    assert broken_links(archived_index) == []
+    assert broken_links(output_dir / "places_tiles.kml") == []
+    # Each index still points at its own run's tile
+    assert "46.7" in "".join(path.read_text() for path in archived_tiles.rglob("*.kml"))
+    assert "39.2" in "".join(path.read_text() for path in (output_dir / "places_tiles").rglob("*.kml"))
+
+
+def test_failed_run_keeps_previous_tiles(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    manager = OutputManager(Settings(TILE_ZOOM=10))
+    output_dir = tmp_path / "output" / "layer"
+    write_tiles(manager, Point(46.7, 24.7))
+
+    with pytest.raises(RuntimeError):
+        with manager.open_writer("layer", "places", "kml-tiles") as writer:
+            writer.write_placemark(Placemark(name="p", geometry=Point(39.2, 21.5)))
+            raise RuntimeError("conversion failed")
+
+    assert sorted(path.name for path in output_dir.iterdir()) == ["places_tiles", "places_tiles.kml"]
+    assert broken_links(output_dir / "places_tiles.kml") == []
+
+
+def save_points(manager: OutputManager, *lats: float):
+    return manager.save_features([Folder(name="Places", placemarks=[
+        Placemark(name=f"p{lat}", geometry=Point(46.0, lat), id=f"p{lat}") for lat in lats])], "layer", "places")
+
+
+@pytest.mark.parametrize("formats, target", [
+    (["geojson", "kmz"], "places.kmz"),
+    (["kml-tiles", "kml"], "places.kml"),
+])
+def test_delta_targets_the_written_kml(tmp_path, monkeypatch, formats, target):
+    monkeypatch.chdir(tmp_path)
+    manager = OutputManager(Settings(OUTPUT_FORMATS=formats, WRITE_NETWORKLINK_UPDATE=True))
+    save_points(manager, 24.0)
+    save_points(manager, 24.0, 25.0)
+
+    output_dir = tmp_path / "output" / "layer"
+    delta = json.loads((output_dir / "places_delta.json").read_text(encoding="utf-8"))
+    assert delta["target"] == target
+    assert delta["added"] == ["p25.0"]
+    assert (output_dir / target).exists()
+    assert f"<targetHref>{target}</targetHref>" in (output_dir / "places_update.kml").read_text(encoding="utf-8")
+
+
+def test_delta_without_kml_output_writes_only_json(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    output_dir = tmp_path / "output" / "layer"
+    save_points(OutputManager(Settings(OUTPUT_FORMATS=["kml"], WRITE_NETWORKLINK_UPDATE=True)), 24.0)
+    save_points(OutputManager(Settings(OUTPUT_FORMATS=["kml"], WRITE_NETWORKLINK_UPDATE=True)), 24.0, 25.0)
+    assert (output_dir / "places_delta.kml").exists()
+
+    save_points(OutputManager(Settings(OUTPUT_FORMATS=["geojson", "kml-tiles"], WRITE_NETWORKLINK_UPDATE=True)),
+                24.0, 25.0, 26.0)
+
+    delta = json.loads((output_dir / "places_delta.json").read_text(encoding="utf-8"))
+    assert delta["target"] is None
+    assert delta["added"] == ["p26.0"]
+    assert not (output_dir / "places_delta.kml").exists()
+    assert not (output_dir / "places_update.kml").exists()
+
+
+@pytest.mark.parametrize("change", [
+    {"TILE_ZOOM": 12},
+    {"TILE_MIN_LOD_PIXELS": 256},
+    {"OUTPUT_FORMATS": ["kml-tiles"]},
+    {"COORDINATE_PRECISION": 5},
+])
+def test_writer_option_changes_invalidate_outputs(tmp_path, monkeypatch, change):
+    monkeypatch.chdir(tmp_path)
+    base = dict(OUTPUT_FORMATS=["kml-tiles", "geojson"], TILE_ZOOM=10)
+    manager = OutputManager(Settings(**base))
+    fingerprint = manager.fingerprint({"source": 1}, 1)
+    save_points(manager, 24.0)
+    manager._write_manifest("layer", "places", fingerprint)
+    assert manager.is_current("layer", "places", fingerprint)
+
+    changed = OutputManager(Settings(**{**base, **change}))
+    assert not changed.is_current("layer", "places", changed.fingerprint({"source": 1}, 1))
+
+
+def test_worker_settings_do_not_invalidate_outputs(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    manager = OutputManager(Settings(OUTPUT_FORMATS=["kml"]))
+    fingerprint = manager.fingerprint({"source": 1}, 1)
+    save_points(manager, 24.0)
+    manager._write_manifest("layer", "places", fingerprint)
+
+    tuned = OutputManager(Settings(OUTPUT_FORMATS=["kml"], KML_SERIALIZE_WORKERS=4, KML_SERIALIZE_CHUNK=50))
+    assert tuned.is_current("layer", "places", fingerprint)
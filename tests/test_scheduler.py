@@ -0,0 +1,185 @@
+"""RequestScheduler retries, Retry-After and circuit breaking against a local fault server"""
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import List, Tuple
+
+import aiohttp
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from src.config import Settings
+from src.data_source.scheduler import CircuitOpenError, RequestScheduler
+
+
+class FaultServer:
+    """Answers GET /data with scripted (status, headers) responses, then 200 once the script runs out"""
+
+    def __init__(self, script: List[Tuple[int, dict]]):
+        self.script = list(script)
+        self.hits: List[float] = []
+
+    async def handle(self, request: web.Request) -> web.Response:
+        self.hits.append(time.monotonic())
+        status, headers = self.script.pop(0) if self.script else (200, {})
+        return web.Response(status=status, headers=headers, text="ok" if status == 200 else "fault")
+
+    @asynccontextmanager
+    async def running(self):
+        app = web.Application()
+        app.router.add_get("/data", self.handle)
+        server = TestServer(app)
+        await server.start_server()
+        try:
+            yield str(server.make_url("/data"))
+        finally:
+            await server.close()
+
+
+def make_scheduler(**overrides) -> RequestScheduler:
+    options = dict(HTTP_RATE_LIMIT=0, HTTP_MAX_RETRIES=3, HTTP_RETRY_BACKOFF=0.01,
+                   HTTP_RETRY_MAX_DELAY=5.0, HTTP_CIRCUIT_FAILURES=0, HTTP_CIRCUIT_RESET=30.0)
+    options.update(overrides)
+    return RequestScheduler(Settings(**options))
+
+
+async def fetch(scheduler: RequestScheduler, session: aiohttp.ClientSession, url: str) -> str:
+    async with scheduler.request(session, "GET", url) as response:
+        response.raise_for_status()
+        return await response.text()
+
+
+def server_host(scheduler: RequestScheduler) -> str:
+    (host,) = scheduler._breakers
+    return host
+
+
+def run_against(server: FaultServer, scenario):
+    async def main():
+        async with server.running() as url, aiohttp.ClientSession() as session:
+            return await scenario(session, url)
+    return asyncio.run(main())
+
+
+def test_429_waits_for_retry_after():
+    server = FaultServer([(429, {"Retry-After": "1"})])
+    scheduler = make_scheduler()
+
+    body = run_against(server, lambda session, url: fetch(scheduler, session, url))
+
+    assert body == "ok"
+    assert len(server.hits) == 2
+    assert server.hits[1] - server.hits[0] >= 0.9
+    assert scheduler.stats["retries"] == 1
+    assert scheduler.stats["retry_after_waits"] == 1
+
+
+def test_retry_after_is_capped_by_max_delay():
+    server = FaultServer([(503, {"Retry-After": "120"})])
+    scheduler = make_scheduler(HTTP_RETRY_MAX_DELAY=0.2)
+
+    start = time.monotonic()
+    body = run_against(server, lambda session, url: fetch(scheduler, session, url))
+
+    assert body == "ok"
+    assert time.monotonic() - start < 5
+    assert scheduler.stats["retry_after_waits"] == 1
+
+
+def test_5xx_is_retried_until_success():
+    server = FaultServer([(503, {}), (502, {}), (500, {})])
+    scheduler = make_scheduler()
+
+    body = run_against(server, lambda session, url: fetch(scheduler, session, url))
+
+    assert body == "ok"
+    assert len(server.hits) == 4
+    assert scheduler.stats["retries"] == 3
+    assert scheduler.stats["gave_up"] == 0
+
+
+def test_gives_up_after_max_retries():
+    server = FaultServer([(500, {})] * 10)
+    scheduler = make_scheduler(HTTP_MAX_RETRIES=2)
+
+    with pytest.raises(aiohttp.ClientResponseError) as raised:
+        run_against(server, lambda session, url: fetch(scheduler, session, url))
+
+    assert raised.value.status == 500
+    assert len(server.hits) == 3
+    assert scheduler.stats["retries"] == 2
+    assert scheduler.stats["gave_up"] == 1
+
+
+def test_client_errors_are_not_retried():
+    server = FaultServer([(404, {})])
+    scheduler = make_scheduler(HTTP_CIRCUIT_FAILURES=1)
+
+    with pytest.raises(aiohttp.ClientResponseError) as raised:
+        run_against(server, lambda session, url: fetch(scheduler, session, url))
+
+    assert raised.value.status == 404
+    assert len(server.hits) == 1
+    assert scheduler.stats["retries"] == 0
+    assert scheduler.breaker(server_host(scheduler)).state == "closed"
+
+
+def test_circuit_opens_then_half_open_trial_closes_it():
+    server = FaultServer([(503, {})] * 2)
+    scheduler = make_scheduler(HTTP_MAX_RETRIES=0, HTTP_CIRCUIT_FAILURES=2, HTTP_CIRCUIT_RESET=0.3)
+
+    async def scenario(session, url):
+        for _ in range(2):
+            with pytest.raises(aiohttp.ClientResponseError):
+                await fetch(scheduler, session, url)
+        breaker = scheduler.breaker(server_host(scheduler))
+        assert breaker.state == "open"
+
+        # Rejected without reaching the server
+        with pytest.raises(CircuitOpenError):
+            await fetch(scheduler, session, url)
+        assert len(server.hits) == 2
+
+        await asyncio.sleep(0.35)
+        assert breaker.state == "half-open"
+        assert await fetch(scheduler, session, url) == "ok"
+        assert breaker.state == "closed"
+
+    run_against(server, scenario)
+    assert len(server.hits) == 3
+    assert scheduler.stats["circuit_rejections"] == 1
+
+
+def test_failed_half_open_trial_reopens_circuit():
+    server = FaultServer([(503, {})] * 2)
+    scheduler = make_scheduler(HTTP_MAX_RETRIES=0, HTTP_CIRCUIT_FAILURES=1, HTTP_CIRCUIT_RESET=0.3)
+
+    async def scenario(session, url):
+        with pytest.raises(aiohttp.ClientResponseError):
+            await fetch(scheduler, session, url)
+        breaker = scheduler.breaker(server_host(scheduler))
+
+        await asyncio.sleep(0.35)
+        assert breaker.state == "half-open"
+        with pytest.raises(aiohttp.ClientResponseError):
+            await fetch(scheduler, session, url)
+        assert breaker.state == "open"
+        with pytest.raises(CircuitOpenError):
+            await fetch(scheduler, session, url)
+
+    run_against(server, scenario)
+    assert len(server.hits) == 2
+
+
+def test_own_failures_opening_circuit_report_last_error():
+    server = FaultServer([(502, {})] * 10)
+    scheduler = make_scheduler(HTTP_MAX_RETRIES=5, HTTP_CIRCUIT_FAILURES=2)
+
+    with pytest.raises(aiohttp.ClientResponseError) as raised:
+        run_against(server, lambda session, url: fetch(scheduler, session, url))
+
+    assert raised.value.status == 502
+    assert len(server.hits) == 2
+    assert scheduler.stats["gave_up"] == 1
+    assert scheduler.stats["circuit_rejections"] == 0
@@ -0,0 +1,41 @@
+"""Watch mode helpers"""
+import asyncio
+
+from src.watch import coalesce
+
+
+def test_coalesce_shares_one_in_flight_fetch():
+    calls = []
+
+    async def fetch():
+        calls.append(len(calls))
+        await asyncio.sleep(0.01)
+        return {"call": len(calls)}
+
+    async def main():
+        shared = coalesce(fetch)
+        together = await asyncio.gather(shared(), shared(), shared())
+        later = await shared()
+        return together, later
+
+    together, later = asyncio.run(main())
+
+    assert together == [{"call": 1}] * 3
+    assert later == {"call": 2}
+    assert len(calls) == 2
+
+
+def test_coalesce_survives_a_cancelled_caller():
+    async def fetch():
+        await asyncio.sleep(0.02)
+        return "payload"
+
+    async def main():
+        shared = coalesce(fetch)
+        cancelled = asyncio.ensure_future(shared())
+        waiting = asyncio.ensure_future(shared())
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        return await waiting
+
+    assert asyncio.run(main()) == "payload"